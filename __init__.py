@@ -1,9 +1,10 @@
 from flask import Flask
-from flask_mysqldb import MySQL
 from flask_mail import Mail
 from itsdangerous import URLSafeTimedSerializer
 
-mysql = MySQL()
+from services.db_pool import PooledMySQL
+
+mysql = PooledMySQL()
 mail = Mail()
 serializer = URLSafeTimedSerializer("pinchellave")
 
@@ -19,8 +20,17 @@ def create_app():
     app.config['MYSQL_DB'] = 'parrilla51'
     app.config['MYSQL_CURSORCLASS'] = 'DictCursor'
 
+    # Pool compartido por todos los blueprints (conexiones por worker)
+    app.config['MYSQL_POOL_SIZE'] = 10
+    app.config['MYSQL_POOL_TIMEOUT'] = 10
+    app.config['MYSQL_POOL_PING_INTERVAL'] = 30
+
     mysql.init_app(app)
 
+    # ------------------ Sesiones en el servidor ------------------
+    from services import sesiones
+    sesiones.init_app(app)  # la cookie solo lleva el id; flask --app app sesiones limpiar
+
     # ------------------ Configuración Correo ------------------
     app.config['MAIL_SERVER'] = 'smtp.gmail.com'
     app.config['MAIL_PORT'] = 587
@@ -40,5 +50,20 @@ def create_app():
     admin_routes.init_app(app)
     empleado_routes.init_app(app)
     app.register_blueprint(reportes_bp, url_prefix='/reportes')  # ✅ Registrar el blueprint
+
+    # ------------------ Comandos CLI ------------------
+    from services import migraciones, ventas_diarias, hechos_venta, trabajos
+    migraciones.init_app(app)  # flask --app app db migrar
+    ventas_diarias.init_app(app)  # flask --app app ventas reconstruir / verificar
+    hechos_venta.init_app(app)  # flask --app app ventas cargar-hechos
+    trabajos.init_app(app)  # exportaciones en segundo plano; flask --app app reportes limpiar
+
+    # ------------------ Imágenes responsivas ------------------
+    from services import imagenes
+    imagenes.init_app(app)  # imagen_responsive() en plantillas; flask --app app imagenes generar
+
+    # ------------------ Estáticos con huella ------------------
+    from services import estaticos
+    estaticos.init_app(app)  # url_for('static') con huella + caché inmutable; flask --app app estaticos construir
     
     return app
\ No newline at end of file
@@ -0,0 +1,9 @@
+-- Tablero de órdenes, historial y "Mis pedidos"
+ALTER TABLE `pedidos`
+  ADD KEY `idx_pedidos_estado_fecha` (`estado`, `fecha`, `hora`);
+
+ALTER TABLE `pedidos`
+  ADD KEY `idx_pedidos_fecha_hora` (`fecha`, `hora`);
+
+ALTER TABLE `pedidos`
+  ADD KEY `idx_pedidos_usuario` (`cod_usuario`, `id_pedido`);
@@ -0,0 +1,6 @@
+-- Búsquedas de reservas por fecha y listados por estado
+ALTER TABLE `reservas`
+  ADD KEY `idx_reservas_fecha` (`fecha`);
+
+ALTER TABLE `reservas`
+  ADD KEY `idx_reservas_estado_fecha` (`estado`, `fecha`, `hora`);
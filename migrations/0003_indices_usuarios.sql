@@ -0,0 +1,7 @@
+-- Login, registro y activación de cuenta
+-- (la unicidad del correo va aparte, en 0011: requiere limpiar duplicados antes)
+ALTER TABLE `usuarios`
+  ADD KEY `idx_usuarios_correo` (`correo`);
+
+ALTER TABLE `usuarios`
+  ADD KEY `idx_usuarios_token_activacion` (`token_activacion`);
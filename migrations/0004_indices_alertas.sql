@@ -0,0 +1,6 @@
+-- Dashboard: WHERE tipo IN (...) ORDER BY fecha DESC LIMIT 10
+ALTER TABLE `alertas`
+  ADD KEY `idx_alertas_tipo_fecha` (`tipo`, `fecha`);
+
+ALTER TABLE `alertas`
+  ADD KEY `idx_alertas_fecha` (`fecha`);
@@ -0,0 +1,3 @@
+-- Historial de pagos paginado por día
+ALTER TABLE `pagos_restaurante`
+  ADD KEY `idx_pagos_fecha_hora` (`fecha`, `hora`);
@@ -0,0 +1,18 @@
+-- Búsquedas por prefijo (LIKE 'x%' y rangos numéricos) de services/filtros.py
+ALTER TABLE `pedidos`
+  ADD KEY `idx_pedidos_telefono` (`telefono`);
+
+ALTER TABLE `reservas`
+  ADD KEY `idx_reservas_nombre` (`nombre`);
+
+ALTER TABLE `reservas`
+  ADD KEY `idx_reservas_documento` (`documento`);
+
+ALTER TABLE `reservas`
+  ADD KEY `idx_reservas_telefono` (`telefono`);
+
+ALTER TABLE `usuarios`
+  ADD KEY `idx_usuarios_nombre` (`nombre`);
+
+ALTER TABLE `usuarios`
+  ADD KEY `idx_usuarios_apellido` (`apellido`);
@@ -0,0 +1,12 @@
+-- Resumen diario de ventas, mantenido por services/ventas_diarias.py
+-- (llenar con: flask --app app ventas reconstruir)
+CREATE TABLE `ventas_diarias` (
+  `fecha` date NOT NULL,
+  `metodo_pago` varchar(50) NOT NULL DEFAULT '',
+  `tipo_entrega` varchar(20) NOT NULL DEFAULT '',
+  `estado` varchar(20) NOT NULL DEFAULT '',
+  `num_pedidos` int(11) NOT NULL DEFAULT 0,
+  `total` bigint(20) NOT NULL DEFAULT 0,
+  PRIMARY KEY (`fecha`, `metodo_pago`, `tipo_entrega`, `estado`),
+  KEY `idx_ventas_diarias_estado_fecha` (`estado`, `fecha`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_general_ci;
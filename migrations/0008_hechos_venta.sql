@@ -0,0 +1,18 @@
+-- Hechos de venta unificados (pedidos en línea + pagos de mesa), solo inserción.
+-- Llenar el histórico con: flask --app app ventas cargar-hechos
+CREATE TABLE `hechos_venta` (
+  `id_hecho` bigint(20) NOT NULL AUTO_INCREMENT,
+  `canal` enum('online','mesa') NOT NULL,
+  `id_origen` int(11) NOT NULL,
+  `id_producto` int(11) NOT NULL,
+  `cantidad` int(11) NOT NULL,
+  `precio_unitario` bigint(20) NOT NULL DEFAULT 0,
+  `fecha` date NOT NULL,
+  `hora` time NOT NULL,
+  `registrado_en` datetime NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  PRIMARY KEY (`id_hecho`),
+  KEY `idx_hechos_producto_fecha` (`id_producto`, `fecha`),
+  KEY `idx_hechos_canal_fecha` (`canal`, `fecha`),
+  KEY `idx_hechos_fecha` (`fecha`),
+  KEY `idx_hechos_origen` (`canal`, `id_origen`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_general_ci;
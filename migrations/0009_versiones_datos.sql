@@ -0,0 +1,9 @@
+-- Versión por tabla para invalidar cachés entre workers (services/cache.py)
+CREATE TABLE `versiones_datos` (
+  `tabla` varchar(64) NOT NULL,
+  `version` bigint(20) NOT NULL DEFAULT 0,
+  PRIMARY KEY (`tabla`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_general_ci;
+
+INSERT IGNORE INTO `versiones_datos` (`tabla`, `version`) VALUES
+  ('pedidos', 0), ('productos', 0), ('categorias', 0);
@@ -0,0 +1,3 @@
+-- Tablas que también invalidan el snapshot del dashboard (services/dashboard.py)
+INSERT IGNORE INTO `versiones_datos` (`tabla`, `version`) VALUES
+  ('mesas', 0), ('reservas', 0), ('pagos_restaurante', 0);
@@ -0,0 +1,9 @@
+-- Un correo por cuenta. Antes de aplicarla, `db migrar` verifica que no
+-- haya correos repetidos (services/migraciones.py: VERIFICACIONES) y se
+-- detiene listándolos si los hay.
+ALTER TABLE `usuarios`
+  ADD UNIQUE KEY `uq_usuarios_correo` (`correo`);
+
+-- El índice simple de 0003 queda redundante
+ALTER TABLE `usuarios`
+  DROP KEY `idx_usuarios_correo`;
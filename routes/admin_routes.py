@@ -3,8 +3,21 @@ from werkzeug.security import check_password_hash, generate_password_hash
 from __init__ import mysql
 import MySQLdb.cursors
 
+from services.paginacion import arg_entero, arg_fecha, conteo_aproximado, pagina_keyset
+from services import catalogo, dashboard, hechos_venta, imagenes, ventas_diarias
+from services.cache import invalidar
+
 admin_bp = Blueprint('admin', __name__)
 
+# Listados paginados
+LIMITE_ADMIN = 50
+LIMITE_ADMIN_MAXIMO = 200
+
+ESTADOS_RESERVA = ('Pendiente', 'Confirmada', 'Completada')
+ESTADOS_PEDIDO = ('pendiente', 'en preparacion', 'entregado', 'cancelado')
+ESTADOS_USUARIO = ('activo', 'inactivo')
+ROLES_USUARIO = ('cliente', 'empleado', 'administrador')
+
 # ===============================
 # VERIFICACIÓN DE ADMINISTRADOR
 # ===============================
@@ -18,6 +31,25 @@ def verificar_admin():
     
     return True, None
 
+
+def _filtros_admin(prefijo='', estado=None, rol=None, desde=None, hasta=None):
+    """Arma el WHERE de los listados admin; `estado`/`rol` son (valor, permitidos)"""
+    filtros = " WHERE 1=1"
+    params = []
+
+    for columna, filtro in (('estado', estado), ('rol', rol)):
+        if filtro and filtro[0] in filtro[1]:
+            filtros += f" AND {prefijo}{columna} = %s"
+            params.append(filtro[0])
+    if desde:
+        filtros += f" AND {prefijo}fecha >= %s"
+        params.append(desde)
+    if hasta:
+        filtros += f" AND {prefijo}fecha <= %s"
+        params.append(hasta)
+
+    return filtros, params
+
 # ===============================
 # DASHBOARD
 # ===============================
@@ -28,36 +60,38 @@ def admin_dashboard():
         flash(mensaje, 'danger')
         return redirect(url_for('auth.login'))
     
-    # ✅ Obtener alertas de stock bajo
-    cur = mysql.connection.cursor(MySQLdb.cursors.DictCursor)
-    cur.execute("""
-        SELECT * FROM alertas 
-        WHERE tipo IN ('stock', 'producto')
-        ORDER BY fecha DESC 
-        LIMIT 10
-    """)
-    alertas = cur.fetchall()
-    
-    # ✅ Contar productos con stock bajo
-    cur.execute("""
-        SELECT COUNT(*) as total FROM productos 
-        WHERE cantidad < 5 AND cantidad > 0 AND estado = 'Disponible'
-    """)
-    stock_bajo = cur.fetchone()['total']
-    
-    # ✅ Contar productos sin stock
-    cur.execute("""
-        SELECT COUNT(*) as total FROM productos 
-        WHERE cantidad = 0 AND estado = 'Disponible'
-    """)
-    sin_stock = cur.fetchone()['total']
-    
-    cur.close()
-    
-    return render_template('admin2.html', 
-                         alertas=alertas,
-                         stock_bajo=stock_bajo,
-                         sin_stock=sin_stock)
+    kpis, _ = dashboard.snapshot()
+    return render_template('admin2.html',
+                         kpis=kpis,
+                         alertas=kpis['alertas'],
+                         stock_bajo=kpis['stock_bajo'],
+                         sin_stock=kpis['sin_stock'])
+
+# ===============================
+# API: INDICADORES DEL DASHBOARD
+# ===============================
+@admin_bp.route("/admin/api/dashboard", methods=["GET"])
+def api_dashboard_admin():
+    es_admin, mensaje = verificar_admin()
+    if not es_admin:
+        return jsonify({"error": True, "mensaje": mensaje}), 403
+
+    kpis, etag = dashboard.snapshot()
+    resp = jsonify(kpis)
+    resp.set_etag(etag)
+    resp.headers['Cache-Control'] = 'private, no-cache'
+    return resp.make_conditional(request)
+
+# ===============================
+# API: ESTADÍSTICAS DEL POOL DE CONEXIONES
+# ===============================
+@admin_bp.route("/admin/api/pool", methods=["GET"])
+def api_pool_admin():
+    es_admin, mensaje = verificar_admin()
+    if not es_admin:
+        return jsonify({"error": True, "mensaje": mensaje}), 403
+
+    return jsonify(mysql.stats())
 
 # ===============================
 # API: PERFIL ADMINISTRADOR
@@ -92,6 +126,7 @@ def api_actualizar_perfil_admin():
         data["nombre"], data["apellido"], data["telefono"],
         data["direccion"], data["correo"], session["id_usuario"]
     ))
+    invalidar('usuarios')  # nombres en el reporte de ventas cacheado
     mysql.connection.commit()
     cur.close()
 
@@ -135,19 +170,11 @@ def admin_productos():
         flash(mensaje, 'danger')
         return redirect(url_for('auth.login'))
 
-    cur = mysql.connection.cursor(MySQLdb.cursors.DictCursor)
-    
     # ✅ Mostrar TODOS los productos (disponibles y no disponibles)
-    cur.execute("""
-        SELECT p.id_producto, p.nombre, p.cantidad, p.descripcion, p.precio, 
-               p.imagen, p.estado, c.nombre_categoria, p.cod_categoria
-        FROM productos p
-        LEFT JOIN categorias c ON p.cod_categoria = c.id_categoria
-        ORDER BY p.estado DESC, p.cantidad ASC
-    """)
-    productos = cur.fetchall()
-    
+    productos = catalogo.obtener().para_admin
+
     # ✅ Obtener alertas de stock
+    cur = mysql.connection.cursor(MySQLdb.cursors.DictCursor)
     cur.execute("""
         SELECT * FROM alertas 
         WHERE tipo = 'stock'
@@ -188,8 +215,10 @@ def agregar_producto():
                 request.form['cod_categoria'],
                 request.form.get('imagen', '')
             ))
+            invalidar('productos')
             mysql.connection.commit()
             cur.close()
+            imagenes.generar_para_producto(request.form.get('imagen', ''))
 
             flash(f"✅ Producto '{nombre}' agregado correctamente", "success")
             return redirect(url_for('admin.admin_productos'))
@@ -233,7 +262,9 @@ def editar_producto(id_producto):
                 request.form.get('imagen', ''),
                 id_producto
             ))
+            invalidar('productos')
             mysql.connection.commit()
+            imagenes.generar_para_producto(request.form.get('imagen', ''))
             flash(f"✅ Producto '{nombre}' actualizado correctamente", "success")
             return redirect(url_for('admin.admin_productos'))
             
@@ -269,6 +300,7 @@ def toggle_producto(id_producto):
             nuevo_estado = 'No disponible' if producto['estado'] == 'Disponible' else 'Disponible'
             cur.execute("UPDATE productos SET estado = %s WHERE id_producto = %s", 
                        (nuevo_estado, id_producto))
+            invalidar('productos')
             mysql.connection.commit()
             
             emoji = '✅' if nuevo_estado == 'Disponible' else '🔴'
@@ -301,6 +333,7 @@ def eliminar_producto(id_producto):
             flash("⚠️ Producto no encontrado", "warning")
         else:
             cur.execute("DELETE FROM productos WHERE id_producto = %s", (id_producto,))
+            invalidar('productos')
             mysql.connection.commit()
             flash(f"🗑️ Producto '{producto['nombre']}' eliminado permanentemente", "info")
         
@@ -321,11 +354,31 @@ def admin_reservas():
         flash(mensaje, 'danger')
         return redirect(url_for('auth.login'))
 
-    cur = mysql.connection.cursor()
-    cur.execute("SELECT * FROM reservas ORDER BY fecha DESC")
-    reservas = cur.fetchall()
+    filtro_estado = request.args.get('estado', '')
+    desde = arg_fecha('desde')
+    hasta = arg_fecha('hasta')
+
+    filtros, params = _filtros_admin(
+        estado=(filtro_estado, ESTADOS_RESERVA), desde=desde, hasta=hasta
+    )
+
+    cur = mysql.connection.cursor(MySQLdb.cursors.DictCursor)
+    pagina = pagina_keyset(
+        cur,
+        """
+        SELECT id_reserva, nombre, telefono, fecha, hora, cant_personas, estado
+        FROM reservas
+        """ + filtros,
+        params,
+        [('fecha', 'fecha'), ('id_reserva', 'id_reserva')],
+        arg_entero('limite', LIMITE_ADMIN, 1, LIMITE_ADMIN_MAXIMO),
+        request.args.get('despues')
+    )
+    total, aproximado = conteo_aproximado(cur, 'reservas', filtros if params else "", params)
     cur.close()
-    return render_template('admin_reservas.html', reservas=reservas)
+    return render_template('admin_reservas.html', reservas=pagina['filas'], pagina=pagina,
+                           total=total, aproximado=aproximado, estados=ESTADOS_RESERVA,
+                           filtro_estado=filtro_estado, desde=desde or '', hasta=hasta or '')
 
 # ===============================
 # PEDIDOS
@@ -337,18 +390,35 @@ def admin_pedidos():
         flash(mensaje, 'danger')
         return redirect(url_for('auth.login'))
 
-    cur = mysql.connection.cursor()
-    cur.execute("""
+    filtro_estado = request.args.get('estado', '')
+    desde = arg_fecha('desde')
+    hasta = arg_fecha('hasta')
+
+    # Mismos filtros con y sin alias: la página une con usuarios, el conteo no
+    filtros = dict(estado=(filtro_estado, ESTADOS_PEDIDO), desde=desde, hasta=hasta)
+    filtros_pagina, params = _filtros_admin(prefijo='p.', **filtros)
+    filtros, _ = _filtros_admin(**filtros)
+
+    cur = mysql.connection.cursor(MySQLdb.cursors.DictCursor)
+    pagina = pagina_keyset(
+        cur,
+        """
         SELECT p.id_pedido, u.nombre, u.apellido, p.fecha, p.hora, 
                p.total, p.estado, p.tipo_entrega
         FROM pedidos p
         LEFT JOIN usuarios u ON p.cod_usuario = u.id_usuario
-        ORDER BY p.fecha DESC, p.hora DESC
-    """)
-    pedidos = cur.fetchall()
+        """ + filtros_pagina,
+        params,
+        [('p.fecha', 'fecha'), ('p.hora', 'hora'), ('p.id_pedido', 'id_pedido')],
+        arg_entero('limite', LIMITE_ADMIN, 1, LIMITE_ADMIN_MAXIMO),
+        request.args.get('despues')
+    )
+    total, aproximado = conteo_aproximado(cur, 'pedidos', filtros if params else "", params)
     cur.close()
 
-    return render_template('admin_pedidos.html', pedidos=pedidos)
+    return render_template('admin_pedidos.html', pedidos=pagina['filas'], pagina=pagina,
+                           total=total, aproximado=aproximado, estados=ESTADOS_PEDIDO,
+                           filtro_estado=filtro_estado, desde=desde or '', hasta=hasta or '')
 
 
 @admin_bp.route('/admin/pedidos/estado/<int:id_pedido>/<string:nuevo_estado>')
@@ -360,7 +430,8 @@ def cambiar_estado_pedido(id_pedido, nuevo_estado):
 
     try:
         cur = mysql.connection.cursor()
-        cur.execute("UPDATE pedidos SET estado=%s WHERE id_pedido=%s", (nuevo_estado, id_pedido))
+        anterior = ventas_diarias.cambiar_estado(cur, id_pedido, nuevo_estado)
+        hechos_venta.registrar_cambio_estado(cur, id_pedido, anterior, nuevo_estado)
         mysql.connection.commit()
         cur.close()
 
@@ -386,18 +457,10 @@ def admin_inventario():
         flash(mensaje, 'danger')
         return redirect(url_for('auth.login'))
     
-    cur = mysql.connection.cursor(MySQLdb.cursors.DictCursor)
-    
     # ✅ Productos con alertas de stock
-    cur.execute("""
-        SELECT p.id_producto, p.nombre, p.cantidad, p.descripcion, p.precio, 
-               p.imagen, p.estado, c.nombre_categoria, p.cod_categoria
-        FROM productos p
-        LEFT JOIN categorias c ON p.cod_categoria = c.id_categoria
-        ORDER BY p.cantidad ASC
-    """)
-    productos = cur.fetchall()
+    productos = catalogo.obtener().por_stock
 
+    cur = mysql.connection.cursor(MySQLdb.cursors.DictCursor)
     cur.execute("""
         SELECT i.id_insumo, i.nombre, i.cantidad, i.precio, i.fecha_vencimiento, i.lote,
                s.nombre_subcategoria, i.subcategoria_id
@@ -552,6 +615,7 @@ def agregar_mesa():
             INSERT INTO mesas (numero_mesa, capacidad, estado)
             VALUES (%s, %s, 'Disponible')
         """, (numero_mesa, capacidad))
+        invalidar('mesas')
         mysql.connection.commit()
         cur.close()
 
@@ -574,6 +638,7 @@ def cambiar_estado_mesa(id_mesa):
 
     nuevo_estado = 'Disponible' if mesa['estado'] == 'Ocupada' else 'Ocupada'
     cur.execute("UPDATE mesas SET estado=%s WHERE id_mesa=%s", (nuevo_estado, id_mesa))
+    invalidar('mesas')
     mysql.connection.commit()
     cur.close()
 
@@ -597,6 +662,7 @@ def eliminar_mesa(id_mesa):
         
         if mesa:
             cur.execute("DELETE FROM mesas WHERE id_mesa=%s", (id_mesa,))
+            invalidar('mesas')
             mysql.connection.commit()
             flash(f"🗑️ Mesa #{mesa['numero_mesa']} eliminada correctamente", "info")
         else:
@@ -618,12 +684,34 @@ def admin_usuarios():
         flash(mensaje, 'danger')
         return redirect(url_for('auth.login'))
 
-    cur = mysql.connection.cursor()
-    cur.execute("SELECT * FROM usuarios")
-    usuarios = cur.fetchall()
+    filtro_rol = request.args.get('rol', '')
+    filtro_estado = request.args.get('estado', '')
+
+    filtros, params = _filtros_admin(
+        rol=(filtro_rol, ROLES_USUARIO), estado=(filtro_estado, ESTADOS_USUARIO)
+    )
+
+    # Solo las columnas que muestra la vista: nada de contraseñas ni tokens
+    cur = mysql.connection.cursor(MySQLdb.cursors.DictCursor)
+    pagina = pagina_keyset(
+        cur,
+        """
+        SELECT id_usuario, nombre, apellido, correo, rol, estado
+        FROM usuarios
+        """ + filtros,
+        params,
+        [('id_usuario', 'id_usuario')],
+        arg_entero('limite', LIMITE_ADMIN, 1, LIMITE_ADMIN_MAXIMO),
+        request.args.get('despues'),
+        descendente=False
+    )
+    total, aproximado = conteo_aproximado(cur, 'usuarios', filtros if params else "", params)
     cur.close()
 
-    return render_template('asignarol.html', usuarios=usuarios)
+    return render_template('asignarol.html', usuarios=pagina['filas'], pagina=pagina,
+                           total=total, aproximado=aproximado, roles=ROLES_USUARIO,
+                           estados=ESTADOS_USUARIO, filtro_rol=filtro_rol,
+                           filtro_estado=filtro_estado)
 
 
 @admin_bp.route('/admin/usuarios/estado/<int:id_usuario>/<string:nuevo_estado>')
@@ -25,6 +25,8 @@ def login():
                 flash("⚠️ Cuenta inactiva. Revisa tu correo para activarla", "warning")
                 return redirect(url_for('auth.login'))
 
+            # Identificador de sesión nuevo al autenticarse (evita fijación de sesión)
+            session.regenerar()
             session['logueado'] = True
             session['id_usuario'] = user['id_usuario']
             session['nombre'] = user['nombre']
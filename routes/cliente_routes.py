@@ -4,8 +4,19 @@ import MySQLdb.cursors
 from datetime import datetime, date
 from werkzeug.security import check_password_hash, generate_password_hash
 
+from services.pedidos import adjuntar_detalles
+from services.paginacion import recortar_pagina
+from services.stock import (
+    StockInsuficiente, bloquear_productos, describir_faltante, descontar_stock,
+    sumar_cantidades, validar_stock
+)
+from services import carrito, catalogo, hechos_venta, ventas_diarias
+from services.cache import invalidar
+
 cliente_bp = Blueprint('cliente', __name__)
 
+PEDIDOS_POR_PAGINA = 10
+
 # ==================== RESERVAR ====================
 @cliente_bp.route('/cliente/reservar', methods=['GET', 'POST'])
 def cliente_reservar():
@@ -49,6 +60,7 @@ def cliente_reservar():
                 INSERT INTO reservas (nombre, documento, fecha, hora, cant_personas, tipo_evento, comentarios, telefono, id_usuario, estado)
                 VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, 'Pendiente')
             """, (nombre, documento, fecha, hora, cant_personas, tipo_evento, comentarios, telefono, id_usuario))
+            invalidar('reservas')
             mysql.connection.commit()
             cur.close()
 
@@ -71,25 +83,8 @@ def cliente_productos():
         return redirect(url_for('auth.login'))
 
     try:
-        cur = mysql.connection.cursor(MySQLdb.cursors.DictCursor)
-        # ✅ Solo productos activos/disponibles
-        cur.execute("""
-            SELECT 
-                p.id_producto,
-                p.nombre,
-                p.precio,
-                p.descripcion,
-                p.imagen,
-                p.cantidad,
-                c.nombre_categoria
-            FROM productos p
-            LEFT JOIN categorias c ON p.cod_categoria = c.id_categoria
-            WHERE p.estado = 'Disponible' AND p.cantidad > 0
-        """)
-        productos = cur.fetchall()
-        cur.close()
-
-        return render_template('cliente_productos.html', productos=productos)
+        # ✅ Solo productos activos/disponibles (desde el catálogo en memoria)
+        return render_template('cliente_productos.html', productos=catalogo.obtener().disponibles)
 
     except Exception as e:
         print(f"Error al cargar productos: {e}")
@@ -98,56 +93,21 @@ def cliente_productos():
 
 
 # ==================== AGREGAR AL CARRITO ====================
+# Respaldo sin JavaScript; la página usa la API JSON de abajo
 @cliente_bp.route('/agregar_carrito/<int:id_producto>', methods=['POST', 'GET'])
 def agregar_carrito(id_producto):
     try:
         cantidad = int(request.form.get('cantidad', 1))
-
-        cur = mysql.connection.cursor(MySQLdb.cursors.DictCursor)
-        cur.execute("SELECT * FROM productos WHERE id_producto = %s", (id_producto,))
-        producto = cur.fetchone()
-        cur.close()
-
-        if not producto:
-            flash("⚠️ Producto no encontrado", "warning")
+        if cantidad < 1:
+            flash("⚠️ La cantidad debe ser mayor a cero", "warning")
             return redirect(url_for('cliente.cliente_productos'))
 
-        # ✅ Validar stock disponible
-        if producto['cantidad'] < cantidad:
-            flash(f"⚠️ Stock insuficiente. Solo hay {producto['cantidad']} unidad(es) disponibles de {producto['nombre']}", "warning")
-            return redirect(url_for('cliente.cliente_productos'))
-
-        # ✅ Validar estado del producto
-        if producto['estado'] != 'Disponible':
-            flash(f"⚠️ {producto['nombre']} no está disponible actualmente", "warning")
-            return redirect(url_for('cliente.cliente_productos'))
+        resultado = carrito.cambiar(session, id_producto, cantidad, sumar=True)
+        flash(f"✅ {resultado['linea']['nombre']} agregado al carrito ({cantidad} unidad/es)", "success")
+        return redirect(url_for('cliente.cliente_productos'))
 
-        carrito = session.get('carrito', [])
-        
-        # Verificar si ya existe en el carrito
-        existe = False
-        for item in carrito:
-            if item['id_producto'] == id_producto:
-                # ✅ Validar stock total (carrito + nueva cantidad)
-                nueva_cantidad = item['cantidad'] + cantidad
-                if nueva_cantidad > producto['cantidad']:
-                    flash(f"⚠️ Stock insuficiente. Solo hay {producto['cantidad']} unidad(es) disponibles de {producto['nombre']}", "warning")
-                    return redirect(url_for('cliente.cliente_productos'))
-                
-                item['cantidad'] = nueva_cantidad
-                existe = True
-                break
-        
-        if not existe:
-            carrito.append({
-                'id_producto': producto['id_producto'],
-                'nombre': producto['nombre'],
-                'precio': producto['precio'],
-                'cantidad': cantidad
-            })
-
-        session['carrito'] = carrito
-        flash(f"✅ {producto['nombre']} agregado al carrito ({cantidad} unidad/es)", "success")
+    except carrito.ErrorCarrito as e:
+        flash(str(e), "warning")
         return redirect(url_for('cliente.cliente_productos'))
 
     except Exception as e:
@@ -163,22 +123,13 @@ def cliente_carrito():
         flash("⚠️ Debes iniciar sesión como cliente", "warning")
         return redirect(url_for('auth.login'))
 
-    carrito = session.get('carrito', [])
-    total = sum(item['precio'] * item['cantidad'] for item in carrito)
-
-    cur = mysql.connection.cursor(MySQLdb.cursors.DictCursor)
-    cur.execute("""
-        SELECT p.* 
-        FROM productos p
-        LEFT JOIN categorias c ON p.cod_categoria = c.id_categoria
-        WHERE c.nombre_categoria = 'Acompañamientos' AND p.estado = 'Disponible' AND p.cantidad > 0
-    """)
-    acompanamientos = cur.fetchall()
-    cur.close()
+    cat = catalogo.obtener()
+    lineas, total = carrito.lineas(session, cat)
+    acompanamientos = cat.disponibles_de('Acompañamientos')
 
     return render_template(
         'cliente_carrito.html',
-        carrito=carrito,
+        carrito=lineas,
         total=total,
         acompanamientos=acompanamientos
     )
@@ -187,31 +138,105 @@ def cliente_carrito():
 # ==================== ELIMINAR DEL CARRITO ====================
 @cliente_bp.route("/carrito/eliminar/<int:id_producto>")
 def eliminar_carrito(id_producto):
-    carrito = session.get("carrito", [])
-    producto_eliminado = None
-    
-    for item in carrito:
-        if item["id_producto"] == id_producto:
-            producto_eliminado = item['nombre']
-            break
-    
-    nuevo_carrito = [item for item in carrito if item["id_producto"] != id_producto]
-    session["carrito"] = nuevo_carrito
+    items = carrito.cantidades(session)
 
-    if producto_eliminado:
-        flash(f"🗑️ {producto_eliminado} eliminado del carrito", "info")
+    if items.pop(id_producto, None):
+        carrito.guardar(session, items)
+        producto = catalogo.obtener().por_id.get(id_producto)
+        nombre = producto['nombre'] if producto else f"Producto #{id_producto}"
+        flash(f"🗑️ {nombre} eliminado del carrito", "info")
     else:
         flash("⚠️ Producto no encontrado en el carrito", "warning")
     
     return redirect(url_for("cliente.cliente_carrito"))
 
 
+# ==================== API DEL CARRITO (JSON) ====================
+# Agregar/cambiar/quitar sin recargar la página: cada respuesta trae solo la
+# línea que cambió y los totales. El stock se valida contra el catálogo en memoria.
+def _cliente_logueado():
+    return session.get('rol') == 'cliente'
+
+
+def _cantidad_pedida(por_defecto=None):
+    """`cantidad` del cuerpo JSON (o del formulario); None si no es un entero >= 0"""
+    datos = request.get_json(silent=True) or request.form
+    try:
+        cantidad = int(datos.get('cantidad', por_defecto))
+    except (TypeError, ValueError):
+        return None
+    return cantidad if cantidad >= 0 else None
+
+
+def _cambiar_carrito(id_producto, cantidad, sumar=False, mensaje=None):
+    try:
+        resultado = carrito.cambiar(session, id_producto, cantidad, sumar=sumar)
+    except carrito.NoEncontrado as e:
+        return jsonify({"error": str(e)}), 404
+    except carrito.ErrorCarrito as e:
+        return jsonify({"error": str(e)}), 409
+    if mensaje:
+        resultado["mensaje"] = mensaje.format(**(resultado["linea"] or {}))
+    return jsonify(resultado)
+
+
+@cliente_bp.route('/cliente/api/carrito', methods=['GET'])
+def api_carrito():
+    if not _cliente_logueado():
+        return jsonify({"error": "No logueado"}), 401
+
+    cat = catalogo.obtener()
+    lineas, total = carrito.lineas(session, cat)
+    for linea in lineas:
+        linea['subtotal'] = linea['precio'] * linea['cantidad']
+    return jsonify({
+        "lineas": lineas,
+        "total": total,
+        "unidades": sum(linea['cantidad'] for linea in lineas)
+    })
+
+
+@cliente_bp.route('/cliente/api/carrito/<int:id_producto>', methods=['POST'])
+def api_agregar_carrito(id_producto):
+    """Suma `cantidad` (1 por defecto) a la línea del producto"""
+    if not _cliente_logueado():
+        return jsonify({"error": "No logueado"}), 401
+
+    cantidad = _cantidad_pedida(1)
+    if not cantidad:
+        return jsonify({"error": "⚠️ La cantidad debe ser mayor a cero"}), 400
+
+    return _cambiar_carrito(id_producto, cantidad, sumar=True,
+                            mensaje=f"✅ {{nombre}} agregado al carrito ({cantidad} unidad/es)")
+
+
+@cliente_bp.route('/cliente/api/carrito/<int:id_producto>', methods=['PUT', 'PATCH'])
+def api_actualizar_carrito(id_producto):
+    """Fija la cantidad de la línea; 0 la quita"""
+    if not _cliente_logueado():
+        return jsonify({"error": "No logueado"}), 401
+
+    cantidad = _cantidad_pedida()
+    if cantidad is None:
+        return jsonify({"error": "⚠️ Cantidad inválida"}), 400
+
+    return _cambiar_carrito(id_producto, cantidad)
+
+
+@cliente_bp.route('/cliente/api/carrito/<int:id_producto>', methods=['DELETE'])
+def api_eliminar_carrito(id_producto):
+    if not _cliente_logueado():
+        return jsonify({"error": "No logueado"}), 401
+
+    return _cambiar_carrito(id_producto, 0, mensaje="🗑️ Producto eliminado del carrito")
+
+
 # ==================== CONFIRMAR PEDIDO ====================
 @cliente_bp.route("/pedido/confirmar", methods=["POST"])
 def hacer_pedido():
-    carrito = session.get("carrito", [])
-    
-    if not carrito:
+    items = carrito.cantidades(session)
+
+    if not items:
         flash("⚠️ Tu carrito está vacío", "warning")
         return redirect(url_for("cliente.cliente_productos"))
 
@@ -235,45 +260,41 @@ def hacer_pedido():
         direccion = None
         telefono = None
 
-    total = sum(item["precio"] * item["cantidad"] for item in carrito)
     metodo_pago = request.form.get("metodo_pago", "efectivo")
     id_usuario = session.get("id_usuario")
 
+    try:
+        ids_acomp = [int(id_acomp) for id_acomp in acompanamientos_ids]
+    except (TypeError, ValueError):
+        flash("⚠️ Los acompañamientos seleccionados no son válidos", "warning")
+        return redirect(url_for("cliente.cliente_carrito"))
+
+    # carrito.cantidades() ya descarta líneas inválidas o en cero
+    lineas = list(items.items())
+
+    requeridos = sumar_cantidades(lineas + [(id_acomp, 1) for id_acomp in ids_acomp])
+
     try:
         cur = mysql.connection.cursor(MySQLdb.cursors.DictCursor)
 
-        # ✅ VALIDAR STOCK ANTES DE CONFIRMAR
-        stock_insuficiente = []
-        
-        # Validar productos del carrito
-        for item in carrito:
-            cur.execute("SELECT nombre, cantidad, estado FROM productos WHERE id_producto = %s", (item["id_producto"],))
-            producto = cur.fetchone()
-            
-            if not producto:
-                stock_insuficiente.append(f"{item['nombre']} (no encontrado)")
-            elif producto['estado'] != 'Disponible':
-                stock_insuficiente.append(f"{item['nombre']} (no disponible)")
-            elif producto["cantidad"] < item["cantidad"]:
-                stock_insuficiente.append(f"{item['nombre']} (solo quedan {producto['cantidad']} unidades)")
-        
-        # Validar acompañamientos
-        for id_acomp in acompanamientos_ids:
-            cur.execute("SELECT nombre, cantidad, estado FROM productos WHERE id_producto = %s", (int(id_acomp),))
-            acomp = cur.fetchone()
-            
-            if not acomp:
-                stock_insuficiente.append(f"Acompañamiento ID {id_acomp} (no encontrado)")
-            elif acomp['estado'] != 'Disponible':
-                stock_insuficiente.append(f"{acomp['nombre']} (no disponible)")
-            elif acomp["cantidad"] < 1:
-                stock_insuficiente.append(f"{acomp['nombre']} (sin stock)")
-        
-        if stock_insuficiente:
-            flash(f"❌ Stock insuficiente: {', '.join(stock_insuficiente)}. Intenta de nuevo más tarde", "danger")
+        # ✅ UNA SOLA LECTURA BLOQUEADA DE TODOS LOS PRODUCTOS
+        productos = bloquear_productos(cur, requeridos)
+        faltantes = validar_stock(productos, requeridos)
+
+        if faltantes:
+            mysql.connection.rollback()
             cur.close()
+            detalle = ", ".join(describir_faltante(f) for f in faltantes)
+            flash(f"❌ Stock insuficiente: {detalle}. Intenta de nuevo más tarde", "danger")
             return redirect(url_for("cliente.cliente_carrito"))
 
+        # ✅ PRECIOS DEL SERVIDOR, NO LOS DE LA SESIÓN
+        detalles = [
+            (id_producto, cantidad, productos[id_producto]["precio"] or 0)
+            for id_producto, cantidad in lineas
+        ] + [(id_acomp, 1, 0) for id_acomp in ids_acomp]
+        total = sum(cantidad * precio for _, cantidad, precio in detalles)
+
         # ✅ CREAR PEDIDO
         cur.execute("""
             INSERT INTO pedidos (
@@ -287,45 +308,35 @@ def hacer_pedido():
 
         id_pedido = cur.lastrowid
 
-        # ✅ INSERTAR PRODUCTOS Y REDUCIR STOCK
-        for item in carrito:
-            cur.execute("""
-                INSERT INTO detalle_pedido (
-                    cod_pedido, cod_producto, cantidad, precio_unitario
-                ) VALUES (%s, %s, %s, %s)
-            """, (id_pedido, item["id_producto"], item["cantidad"], item["precio"]))
-            
-            # ✅ REDUCIR STOCK
-            cur.execute("""
-                UPDATE productos 
-                SET cantidad = cantidad - %s 
-                WHERE id_producto = %s
-            """, (item["cantidad"], item["id_producto"]))
+        # ✅ INSERTAR DETALLES EN LOTE (productos + acompañamientos)
+        cur.executemany("""
+            INSERT INTO detalle_pedido (
+                cod_pedido, cod_producto, cantidad, precio_unitario
+            ) VALUES (%s, %s, %s, %s)
+        """, [(id_pedido, id_producto, cantidad, precio) for id_producto, cantidad, precio in detalles])
 
-        # ✅ INSERTAR ACOMPAÑAMIENTOS Y REDUCIR STOCK
-        for id_acomp in acompanamientos_ids:
-            cur.execute("""
-                INSERT INTO detalle_pedido (
-                    cod_pedido, cod_producto, cantidad, precio_unitario
-                ) VALUES (%s, %s, 1, 0)
-            """, (id_pedido, int(id_acomp)))
-            
-            # ✅ REDUCIR STOCK DE ACOMPAÑAMIENTO
-            cur.execute("""
-                UPDATE productos 
-                SET cantidad = cantidad - 1 
-                WHERE id_producto = %s
-            """, (int(id_acomp),))
+        # ✅ DESCUENTO CONDICIONAL DE STOCK EN UNA SOLA SENTENCIA
+        descontar_stock(cur, requeridos)
+
+        # ✅ RESUMEN DIARIO DE VENTAS (se suma después del commit)
+        ventas_diarias.registrar_pedido(cur, id_pedido)
+        hechos_venta.registrar_pedido(cur, id_pedido)
+        invalidar('pedidos')
 
         mysql.connection.commit()
         cur.close()
 
-        session.pop("carrito", None)
+        carrito.vaciar(session)
         
         tipo_texto = "domicilio" if tipo_entrega == "domicilio" else "mesa"
         flash(f"✅ Pedido #{id_pedido} confirmado para {tipo_texto}. Total: ${total:,.0f}", "success")
         return redirect(url_for("dashboard.cliente_dashboard"))
 
+    except StockInsuficiente as e:
+        mysql.connection.rollback()
+        flash(f"❌ Stock insuficiente: {e}. Intenta de nuevo más tarde", "danger")
+        return redirect(url_for("cliente.cliente_carrito"))
+
     except Exception as e:
         mysql.connection.rollback()
         flash(f"❌ Error al procesar el pedido: {str(e)}", "danger")
@@ -362,54 +373,72 @@ def cliente_mis_pedidos():
         flash("⚠️ Debes iniciar sesión como cliente", "warning")
         return redirect(url_for('auth.login'))
 
-    id_usuario = session.get('id_usuario')
-    cur = mysql.connection.cursor(MySQLdb.cursors.DictCursor)
+    pedidos, siguiente = _pagina_mis_pedidos(session.get('id_usuario'), None)
+    return render_template('mis_pedidos.html', pedidos=pedidos, siguiente=siguiente)
 
-    cur.execute("""
-        SELECT 
-            pe.id_pedido,
-            pe.tipo_entrega,
-            pe.fecha,
-            pe.hora,
-            pe.metodo_pago,
-            pe.total,
-            pe.estado,
-            u.nombre AS nombre_usuario
-        FROM pedidos pe
-        LEFT JOIN usuarios u ON pe.cod_usuario = u.id_usuario
-        WHERE pe.cod_usuario = %s
-        ORDER BY pe.id_pedido DESC
-    """, (id_usuario,))
-    pedidos = cur.fetchall()
 
-    pedidos_final = []
-    for pedido in pedidos:
-        cur.execute("""
-            SELECT 
-                dp.cod_producto,
-                p.nombre AS nombre_producto,
-                dp.cantidad,
-                dp.precio_unitario
-            FROM detalle_pedido dp
-            LEFT JOIN productos p ON dp.cod_producto = p.id_producto
-            WHERE dp.cod_pedido = %s
-        """, (pedido["id_pedido"],))
-        productos = cur.fetchall()
-
-        pedidos_final.append({
-            "id_pedido": pedido["id_pedido"],
-            "fecha": pedido["fecha"],
-            "hora": pedido["hora"],
-            "total": pedido["total"],
-            "estado": pedido["estado"],
-            "tipo_entrega": pedido["tipo_entrega"],
-            "metodo_pago": pedido["metodo_pago"],
-            "nombre_usuario": pedido.get("nombre_usuario"),
-            "productos": productos
-        })
+@cliente_bp.route('/mis_pedidos/api')
+def api_mis_pedidos():
+    """Siguiente página de "Mis pedidos" en JSON, para la carga al hacer scroll"""
+    if 'rol' not in session or session['rol'] != 'cliente':
+        return jsonify({"error": "No logueado"}), 401
+
+    despues = request.args.get('despues', type=int)
+    pedidos, siguiente = _pagina_mis_pedidos(session.get('id_usuario'), despues)
+
+    return jsonify({
+        "pedidos": [_pedido_json(p) for p in pedidos],
+        "siguiente": siguiente
+    })
+
+
+def _pagina_mis_pedidos(id_usuario, despues):
+    """Una página de pedidos del cliente (keyset sobre id_pedido) con sus líneas en lote"""
+    query = """
+        SELECT id_pedido, tipo_entrega, fecha, hora, metodo_pago, total, estado
+        FROM pedidos
+        WHERE cod_usuario = %s
+    """
+    params = [id_usuario]
+    if despues:
+        query += " AND id_pedido < %s"
+        params.append(despues)
+    query += " ORDER BY id_pedido DESC LIMIT %s"
+    params.append(PEDIDOS_POR_PAGINA + 1)
 
+    cur = mysql.connection.cursor(MySQLdb.cursors.DictCursor)
+    cur.execute(query, params)
+    pedidos, siguiente = recortar_pagina(cur.fetchall(), PEDIDOS_POR_PAGINA, ['id_pedido'])
+    adjuntar_detalles(cur, pedidos)
     cur.close()
-    return render_template('mis_pedidos.html', pedidos=pedidos_final)
+
+    # El usuario ya está en sesión: no hace falta unir con `usuarios`
+    nombre_usuario = session.get('nombre')
+    for pedido in pedidos:
+        pedido['nombre_usuario'] = nombre_usuario
+
+    return pedidos, siguiente
+
+
+def _pedido_json(pedido):
+    return {
+        "id_pedido": pedido["id_pedido"],
+        "fecha": pedido["fecha"].isoformat() if pedido["fecha"] else None,
+        "hora": str(pedido["hora"]) if pedido["hora"] is not None else None,
+        "total": pedido["total"],
+        "estado": pedido["estado"],
+        "tipo_entrega": pedido["tipo_entrega"],
+        "metodo_pago": pedido["metodo_pago"],
+        "nombre_usuario": pedido["nombre_usuario"],
+        "productos": [
+            {
+                "nombre": d["nombre"],
+                "cantidad": d["cantidad"],
+                "precio_unitario": d["precio_unitario"]
+            }
+            for d in pedido["productos"]
+        ]
+    }
 
 
 # ==================== API: PERFIL ====================
@@ -452,6 +481,7 @@ def api_guardar_perfil():
         data['nombre'], data['apellido'], data['telefono'],
         data['direccion'], data['correo'], user_id
     ))
+    invalidar('usuarios')  # nombres en el reporte de ventas cacheado
 
     mysql.connection.commit()
     cur.close()
@@ -12,13 +12,7 @@ def cliente_dashboard():
                            nombre=session.get('nombre'))
 
 
-# ================== DASHBOARD ADMINISTRADOR ==================
-@dashboard_bp.route('/admin/dashboard')
-def admin_dashboard():
-    if 'rol' not in session or session['rol'] not in ['admin', 'administrador']:
-        flash("No tienes acceso a esta sección", "warning")
-        return redirect(url_for('auth.login'))
-    return render_template('admin2.html', nombre=session.get('nombre'))
+# El dashboard de administrador lo sirve admin_routes.admin_dashboard (con indicadores)
 
 
 # ================== CLIENTE: Rutas adicionales ==================
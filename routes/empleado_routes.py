@@ -1,15 +1,37 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash, session, jsonify
+from flask import Blueprint, Response, render_template, request, redirect, url_for, flash, session, jsonify
 from flask_mysqldb import MySQL, MySQLdb
 from MySQLdb import IntegrityError
 import MySQLdb.cursors
+from collections import defaultdict
 from datetime import date, datetime
 import json
 from werkzeug.security import check_password_hash, generate_password_hash
 
 from __init__ import mysql
+from services.pedidos import adjuntar_detalles, placeholders
+from services.filtros import filtro_busqueda_pago, filtro_busqueda_pedido, filtro_busqueda_reserva
+from services.stock import (
+    StockInsuficiente, bloquear_productos, descontar_stock, sumar_cantidades, validar_stock
+)
+from services.paginacion import arg_entero, arg_fecha, condicion_keyset, leer_cursor, recortar_pagina
+from services import catalogo, hechos_venta, ventas_diarias
+from services.cache import invalidar
 
 empleado_bp = Blueprint('empleado', __name__)
 
+# Pedidos pendientes que muestra el tablero de órdenes (los más antiguos primero)
+LIMITE_TABLERO = 100
+LIMITE_MAXIMO = 500
+
+# Categoría que no se ofrece en la calculadora de mesas
+ID_ACOMPANAMIENTOS = 6
+
+# Tamaño de página del historial de órdenes
+LIMITE_HISTORIAL = 50
+
+# Días por página del historial de pagos
+DIAS_HISTORIAL_PAGOS = 7
+
 # ===============================
 # VERIFICACIÓN DE EMPLEADO
 # ===============================
@@ -60,94 +82,145 @@ def orden_mesa(mesa_id):
         flash(mensaje, 'danger')
         return redirect(url_for('auth.login'))
 
-    cur = mysql.connection.cursor(MySQLdb.cursors.DictCursor)
-
     if request.method == 'POST':
-        productos_json = request.form.get('productos', '[]')
-        total = float(request.form.get('total', 0))
+        # La calculadora envía JSON; el formulario oculto queda como respaldo sin JS
+        es_json = request.is_json
+        if es_json:
+            productos = (request.get_json(silent=True) or {}).get('productos', [])
+        else:
+            try:
+                productos = json.loads(request.form.get('productos', '[]'))
+            except json.JSONDecodeError:
+                productos = []
 
         try:
-            productos = json.loads(productos_json)
-        except json.JSONDecodeError:
-            productos = []
-
-        if len(productos) == 0 or total <= 0:
-            flash("⚠️ No se seleccionaron productos válidos o el total es 0", "warning")
-            return redirect(url_for('empleado.orden_mesa', mesa_id=mesa_id))
-
-        # ✅ VALIDAR STOCK ANTES DE CONFIRMAR
-        stock_insuficiente = []
-        for p in productos:
-            cur.execute("SELECT nombre, cantidad, estado FROM productos WHERE id_producto = %s", (p['id_producto'],))
-            producto = cur.fetchone()
-            
-            if not producto:
-                stock_insuficiente.append(f"ID {p['id_producto']} (no encontrado)")
-            elif producto['estado'] != 'Disponible':
-                stock_insuficiente.append(f"{producto['nombre']} (no disponible)")
-            elif producto['cantidad'] < p['cantidad']:
-                stock_insuficiente.append(f"{producto['nombre']} (solo quedan {producto['cantidad']} unidades)")
-        
-        if stock_insuficiente:
-            flash(f"❌ Stock insuficiente: {', '.join(stock_insuficiente)}", "danger")
-            cur.close()
+            lineas = [(int(p['id_producto']), int(p['cantidad'])) for p in productos]
+        except (KeyError, TypeError, ValueError):
+            lineas = []
+
+        if not lineas or any(cantidad <= 0 for _, cantidad in lineas):
+            mensaje_error = "⚠️ No se seleccionaron productos válidos"
+            if es_json:
+                return jsonify({"success": False, "msg": mensaje_error}), 400
+            flash(mensaje_error, "warning")
             return redirect(url_for('empleado.orden_mesa', mesa_id=mesa_id))
 
         try:
-            fecha = datetime.now().date()
-            hora = datetime.now().strftime("%H:%M:%S")
-
-            # Insertar pago
-            cur.execute("""
-                INSERT INTO pagos_restaurante (id_mesa, fecha, hora, total)
-                VALUES (%s, %s, %s, %s)
-            """, (mesa_id, fecha, hora, total))
-            id_pago_restaurante = cur.lastrowid
-
-            # Insertar productos y reducir stock
-            for p in productos:
-                cur.execute("""
-                    INSERT INTO detalle_pedido_restaurante 
-                    (id_pago_restaurante, id_producto_em, cantidad, precio_unitario)
-                    VALUES (%s, %s, %s, %s)
-                """, (
-                    id_pago_restaurante,
-                    p['id_producto'],
-                    p['cantidad'],
-                    p['precio']
-                ))
-                
-                # ✅ REDUCIR STOCK
-                cur.execute("""
-                    UPDATE productos 
-                    SET cantidad = cantidad - %s 
-                    WHERE id_producto = %s
-                """, (p['cantidad'], p['id_producto']))
+            id_pago_restaurante, total = _registrar_pago_mesa(mesa_id, lineas)
 
-            mysql.connection.commit()
-            cur.close()
+        except StockInsuficiente as e:
+            mysql.connection.rollback()
+            if es_json:
+                return jsonify({
+                    "success": False,
+                    "msg": f"❌ Stock insuficiente: {e}",
+                    "faltantes": e.faltantes
+                }), 409
+            flash(f"❌ Stock insuficiente: {e}", "danger")
+            return redirect(url_for('empleado.orden_mesa', mesa_id=mesa_id))
 
-            flash(f"✅ Pago registrado correctamente. Mesa {mesa_id} - Total: ${total:,.0f}", "success")
-            return redirect(url_for('empleado.mesas_empleado'))
-            
         except Exception as e:
             mysql.connection.rollback()
-            flash(f"❌ Error al registrar pago: {str(e)}", "danger")
             print(f"Error: {e}")
+            if es_json:
+                return jsonify({"success": False, "msg": f"❌ Error al registrar pago: {str(e)}"}), 500
+            flash(f"❌ Error al registrar pago: {str(e)}", "danger")
             return redirect(url_for('empleado.orden_mesa', mesa_id=mesa_id))
 
-    # ✅ Solo productos disponibles con stock
-    cur.execute("SELECT * FROM categorias WHERE id_categoria != 6")
-    categorias = cur.fetchall()
-    cur.execute("""
-        SELECT * FROM productos 
-        WHERE cod_categoria != 6 
-        AND estado = 'Disponible' 
-        AND cantidad > 0
-    """)
-    productos = cur.fetchall()
-    cur.close()
-    return render_template('calculadora.html', mesa=mesa_id, categorias=categorias, productos=productos)
+        mensaje_ok = f"✅ Pago registrado correctamente. Mesa {mesa_id} - Total: ${total:,.0f}"
+        if es_json:
+            return jsonify({
+                "success": True,
+                "msg": mensaje_ok,
+                "id_pago": id_pago_restaurante,
+                "total": total,
+                "redirect": url_for('empleado.mesas_empleado')
+            })
+        flash(mensaje_ok, "success")
+        return redirect(url_for('empleado.mesas_empleado'))
+
+    # El menú lo carga la página desde /empleado/api/catalogo (con ETag);
+    # los acompañamientos no se venden sueltos en mesa
+    return render_template('calculadora.html', mesa=mesa_id, categoria_excluida=ID_ACOMPANAMIENTOS)
+
+
+# ===============================
+# API: CATÁLOGO PARA LA CALCULADORA
+# ===============================
+@empleado_bp.route('/empleado/api/catalogo', methods=['GET'])
+def api_catalogo():
+    """Productos disponibles y categorías.
+
+    `?campos=nombre,precio` proyecta los campos, `?categoria=1&categoria=2`
+    filtra. Responde 304 si el `If-None-Match` coincide con la versión vigente.
+    """
+    es_empleado, mensaje = verificar_empleado()
+    if not es_empleado:
+        return jsonify({"error": mensaje}), 403
+
+    try:
+        campos = catalogo.proyeccion(request.args.get('campos', ''))
+    except ValueError as e:
+        return jsonify({"error": f"Campos no válidos: {e}"}), 400
+    try:
+        categorias = tuple(sorted({int(c) for c in request.args.getlist('categoria')})) or None
+    except ValueError:
+        return jsonify({"error": "La categoría debe ser numérica"}), 400
+
+    cat = catalogo.obtener()
+    etag = cat.etag(campos, categorias)
+    if request.if_none_match.contains(etag):
+        resp = Response(status=304)
+    else:
+        resp = Response(cat.json(campos, categorias), mimetype='application/json')
+    resp.set_etag(etag)
+    resp.headers['Cache-Control'] = 'private, no-cache'
+    return resp
+
+def _registrar_pago_mesa(mesa_id, lineas):
+    """Registra el pago de una mesa en una transacción con número fijo de consultas.
+
+    Bloquea y valida todos los productos de una vez, recalcula el total con
+    los precios de la base de datos y descuenta el stock condicionalmente.
+    Lanza `StockInsuficiente` con el detalle por producto si algo falta.
+    """
+    requeridos = sumar_cantidades(lineas)
+
+    cur = mysql.connection.cursor(MySQLdb.cursors.DictCursor)
+    try:
+        productos = bloquear_productos(cur, requeridos)
+        faltantes = validar_stock(productos, requeridos)
+        if faltantes:
+            raise StockInsuficiente(faltantes)
+
+        detalles = [
+            (id_producto, cantidad, productos[id_producto]['precio'] or 0)
+            for id_producto, cantidad in requeridos.items()
+        ]
+        total = sum(cantidad * precio for _, cantidad, precio in detalles)
+
+        ahora = datetime.now()
+        cur.execute("""
+            INSERT INTO pagos_restaurante (id_mesa, fecha, hora, total)
+            VALUES (%s, %s, %s, %s)
+        """, (mesa_id, ahora.date(), ahora.strftime("%H:%M:%S"), total))
+        id_pago_restaurante = cur.lastrowid
+
+        cur.executemany("""
+            INSERT INTO detalle_pedido_restaurante 
+            (id_pago_restaurante, id_producto, cantidad, precio_unitario)
+            VALUES (%s, %s, %s, %s)
+        """, [(id_pago_restaurante, id_producto, cantidad, precio)
+              for id_producto, cantidad, precio in detalles])
+
+        descontar_stock(cur, requeridos)
+        hechos_venta.registrar_pago_mesa(cur, id_pago_restaurante)
+        invalidar('pagos_restaurante')
+        mysql.connection.commit()
+    finally:
+        cur.close()
+
+    return id_pago_restaurante, total
 
 @empleado_bp.route('/empleado/historial_pagos', methods=['GET'])
 def historial_pagos_restaurante():
@@ -156,50 +229,80 @@ def historial_pagos_restaurante():
         flash(mensaje, 'danger')
         return redirect(url_for('auth.login'))
 
-    cur = mysql.connection.cursor()
     query = request.args.get("query", "").strip()
+    dias_por_pagina = arg_entero('dias', DIAS_HISTORIAL_PAGOS, 1, 90)
+    despues = arg_fecha('despues')
 
-    if query:
-        cur.execute("""
-            SELECT * FROM pagos_restaurante
-            WHERE CAST(id_pago_restaurante AS CHAR) LIKE %s
-               OR DATE_FORMAT(fecha, '%%Y-%%m-%%d') LIKE %s
-               OR hora LIKE %s
-            ORDER BY fecha DESC, hora DESC
-        """, (f"%{query}%", f"%{query}%", f"%{query}%"))
-    else:
-        cur.execute("SELECT * FROM pagos_restaurante ORDER BY fecha DESC, hora DESC")
+    filtros = " WHERE 1=1"
+    params = []
 
-    pagos = cur.fetchall()
+    if query:
+        filtro = filtro_busqueda_pago(query)
+        if filtro is None:
+            flash("⚠️ Busca por ID, fecha (YYYY-MM-DD), mes (YYYY-MM) u hora (HH:MM)", "warning")
+            return render_template('historial_pagos_restaurante.html', dias=[], query=query,
+                                   dias_por_pagina=dias_por_pagina, siguiente=None)
+        sql, valores = filtro
+        filtros += " AND " + sql
+        params.extend(valores)
 
-    historial_por_fecha = {}
+    cur = mysql.connection.cursor(MySQLdb.cursors.DictCursor)
 
-    for pago in pagos:
+    # 1) Página de días con su conteo y total calculados en SQL
+    query_dias = """
+        SELECT fecha, COUNT(*) AS num_pagos, SUM(total) AS total_dia
+        FROM pagos_restaurante
+    """ + filtros
+    params_dias = list(params)
+    if despues:
+        query_dias += " AND fecha < %s"
+        params_dias.append(despues)
+    query_dias += " GROUP BY fecha ORDER BY fecha DESC LIMIT %s"
+    params_dias.append(dias_por_pagina + 1)
+
+    cur.execute(query_dias, params_dias)
+    dias, siguiente = recortar_pagina(cur.fetchall(), dias_por_pagina, ['fecha'])
+
+    if dias:
+        # 2) Pagos de esos días
         cur.execute("""
-            SELECT d.*, p.nombre
-            FROM detalle_pedido_restaurante d
-            JOIN productos p ON d.id_producto = p.id_producto
-            WHERE d.id_pago_restaurante = %s
-        """, (pago["id_pago_restaurante"],))
-        detalles = cur.fetchall()
-
-        pago["detalles"] = detalles
-
-        fecha = pago["fecha"].strftime("%Y-%m-%d")
-        if fecha not in historial_por_fecha:
-            historial_por_fecha[fecha] = []
-        historial_por_fecha[fecha].append(pago)
+            SELECT * FROM pagos_restaurante
+        """ + filtros + """
+            AND fecha >= %s AND fecha <= %s
+            ORDER BY fecha DESC, hora DESC
+        """, params + [dias[-1]['fecha'], dias[0]['fecha']])
+        pagos = cur.fetchall()
+
+        # 3) Detalles de todos esos pagos en una sola consulta
+        detalles = defaultdict(list)
+        if pagos:
+            ids = [p['id_pago_restaurante'] for p in pagos]
+            cur.execute(f"""
+                SELECT d.*, p.nombre
+                FROM detalle_pedido_restaurante d
+                JOIN productos p ON d.id_producto = p.id_producto
+                WHERE d.id_pago_restaurante IN ({placeholders(ids)})
+            """, ids)
+            for d in cur.fetchall():
+                detalles[d['id_pago_restaurante']].append(d)
+
+        pagos_por_dia = defaultdict(list)
+        for pago in pagos:
+            pago['detalles'] = detalles.get(pago['id_pago_restaurante'], [])
+            pagos_por_dia[pago['fecha']].append(pago)
+
+        for dia in dias:
+            dia['pagos'] = pagos_por_dia.get(dia['fecha'], [])
 
     cur.close()
     return render_template(
         'historial_pagos_restaurante.html',
-        historial_por_fecha=historial_por_fecha,
-        historial=pagos
+        dias=dias,
+        query=query,
+        dias_por_pagina=dias_por_pagina,
+        siguiente=siguiente
     )
 
-    cur.close()
-    return render_template('historial_pagos_restaurante.html', historial=historial)
-
 # ===============================
 # REGISTRAR PEDIDO
 # ===============================
@@ -214,68 +317,10 @@ def registrar_pedido():
         flash("✅ Pedido registrado correctamente", "success")
         return redirect(url_for('empleado.ordenes_empleado'))
     
-    cur = mysql.connection.cursor()
-
-    # Obtener categorías
-    cur.execute("SELECT id_categoria, nombre_categoria FROM categorias ORDER BY nombre_categoria")
-    categorias_raw = cur.fetchall()
-
-    categorias = []
-    for c in categorias_raw:
-        if isinstance(c, dict):
-            categorias.append({
-                'id_categoria': c.get('id_categoria'),
-                'nombre_categoria': c.get('nombre_categoria')
-            })
-        else:
-            categorias.append({
-                'id_categoria': c[0],
-                'nombre_categoria': c[1]
-            })
-
-    # ✅ Solo productos disponibles con stock
-    cur.execute("""
-        SELECT 
-            p.id_producto, 
-            p.nombre, 
-            p.precio, 
-            p.cod_categoria AS id_categoria, 
-            p.estado,
-            p.cantidad,
-            c.nombre_categoria
-        FROM productos p
-        LEFT JOIN categorias c ON p.cod_categoria = c.id_categoria
-        WHERE p.estado = 'Disponible' AND p.cantidad > 0
-        ORDER BY c.nombre_categoria, p.nombre
-    """)
-    productos_raw = cur.fetchall()
-
-    productos = []
-    for p in productos_raw:
-        if isinstance(p, dict):
-            productos.append({
-                'id_producto': p.get('id_producto'),
-                'nombre': p.get('nombre'),
-                'precio': p.get('precio'),
-                'id_categoria': p.get('id_categoria'),
-                'nombre_categoria': p.get('nombre_categoria'),
-                'estado': p.get('estado', 'Disponible'),
-                'cantidad': p.get('cantidad', 0)
-            })
-        else:
-            productos.append({
-                'id_producto': p[0],
-                'nombre': p[1],
-                'precio': p[2],
-                'id_categoria': p[3],
-                'estado': p[4] if len(p) > 4 else 'Disponible',
-                'cantidad': p[5] if len(p) > 5 else 0,
-                'nombre_categoria': p[6] if len(p) > 6 else ''
-            })
-
-    cur.close()
-
-    return render_template("registrar_empleado.html", productos=productos, categorias=categorias)
+    # ✅ Solo productos disponibles con stock, ya ordenados por categoría y nombre
+    cat = catalogo.obtener()
+    return render_template("registrar_empleado.html",
+                           productos=cat.disponibles, categorias=cat.categorias_por_nombre)
 
 # ===============================
 # ACTUALIZAR ESTADO PRODUCTO
@@ -301,6 +346,7 @@ def actualizar_estado_producto():
         cur.execute("""
             UPDATE productos SET estado = %s WHERE id_producto = %s
         """, (nuevo_estado, id_producto))
+        invalidar('productos')
         mysql.connection.commit()
         cur.close()
         
@@ -325,51 +371,40 @@ def ordenes_empleado():
         return redirect(url_for('auth.login'))
     
     search_query = request.args.get('search_query', '').strip()
+    limite = arg_entero('limite', LIMITE_TABLERO, 1, LIMITE_MAXIMO)
 
-    cur = mysql.connection.cursor(MySQLdb.cursors.DictCursor)
-    
-    if search_query:
-        cur.execute("""
-            SELECT * FROM pedidos
-            WHERE (cod_usuario LIKE %s OR telefono LIKE %s OR estado LIKE %s)
-            AND estado IN ('pendiente', 'entregado')
-            ORDER BY fecha DESC, hora DESC
-        """, (f"%{search_query}%", f"%{search_query}%", f"%{search_query}%"))
-    else:
-        cur.execute("""
-            SELECT * FROM pedidos
-            WHERE estado IN ('pendiente', 'entregado')
-            ORDER BY fecha DESC, hora DESC
-        """)
-    
-    pedidos = cur.fetchall()
-    ordenes = []
+    # Sin ventana de tiempo: los pendientes son un conjunto acotado, y los más
+    # viejos son los que cocina más necesita ver (idx_pedidos_estado_fecha)
+    where = "estado = 'pendiente'"
+    params = []
 
-    for pedido in pedidos:
-        cur.execute("""
-            SELECT dp.cod_producto, dp.cantidad, dp.precio_unitario, p.nombre
-            FROM detalle_pedido dp
-            JOIN productos p ON dp.cod_producto = p.id_producto
-            WHERE dp.cod_pedido = %s
-        """, (pedido['id_pedido'],))
-        detalles = cur.fetchall()
-
-        productos = []
-        for d in detalles:
-            subtotal = float(d['cantidad']) * float(d['precio_unitario'])
-            productos.append({
-                'nombre': d['nombre'],
-                'cantidad': d['cantidad'],
-                'precio_unitario': float(d['precio_unitario']),
-                'subtotal': subtotal
-            })
-
-        pedido['productos'] = productos
-        ordenes.append(pedido)
+    if search_query:
+        busqueda = filtro_busqueda_pedido(search_query)
+        if busqueda is None:
+            busqueda = ("1=0", [])
+        where += " AND " + busqueda[0]
+        params.extend(busqueda[1])
 
+    cur = mysql.connection.cursor(MySQLdb.cursors.DictCursor)
+    cur.execute(f"""
+        SELECT * FROM pedidos WHERE {where}
+        ORDER BY fecha ASC, hora ASC, id_pedido ASC
+        LIMIT %s
+    """, params + [limite + 1])
+    ordenes = list(cur.fetchall())
+
+    # Si no caben todos, se avisa cuántos quedan en vez de cortarlos en silencio
+    pendientes_ocultos = 0
+    if len(ordenes) > limite:
+        ordenes = ordenes[:limite]
+        cur.execute(f"SELECT COUNT(*) AS total FROM pedidos WHERE {where}", params)
+        pendientes_ocultos = cur.fetchone()['total'] - limite
+
+    ordenes = adjuntar_detalles(cur, ordenes)
     cur.close()
     
-    return render_template('ordenes_empleado.html', ordenes=ordenes, search_query=search_query)
+    return render_template('ordenes_empleado.html', ordenes=ordenes, search_query=search_query,
+                           limite=limite, pendientes_ocultos=pendientes_ocultos)
 
 
 # ===============================
@@ -385,7 +420,8 @@ def actualizar_estado(id_pedido):
     nuevo_estado = data.get('estado')
 
     cur = mysql.connection.cursor()
-    cur.execute("UPDATE pedidos SET estado=%s WHERE id_pedido=%s", (nuevo_estado, id_pedido))
+    anterior = ventas_diarias.cambiar_estado(cur, id_pedido, nuevo_estado)
+    hechos_venta.registrar_cambio_estado(cur, id_pedido, anterior, nuevo_estado)
     mysql.connection.commit()
     cur.close()
 
@@ -411,56 +447,66 @@ def historial_ordenes_empleado():
         flash(mensaje, 'danger')
         return redirect(url_for('auth.login'))
 
-    cur = mysql.connection.cursor(MySQLdb.cursors.DictCursor)
     search_query = request.args.get('search_query', '').strip()
-
+    desde = arg_fecha('desde')
+    hasta = arg_fecha('hasta')
+    limite = arg_entero('limite', LIMITE_HISTORIAL, 1, LIMITE_MAXIMO)
+    cursor = leer_cursor(request.args.get('despues'), 3)
+
+    filtros = " WHERE estado IN ('entregado', 'cancelado')"
+    params = []
+
+    if desde:
+        filtros += " AND fecha >= %s"
+        params.append(desde)
+    if hasta:
+        filtros += " AND fecha <= %s"
+        params.append(hasta)
     if search_query:
-        cur.execute("""
-            SELECT * FROM pedidos
-            WHERE estado IN ('entregado', 'cancelado')
-              AND (cod_usuario LIKE %s OR telefono LIKE %s OR estado LIKE %s)
-            ORDER BY fecha DESC, hora DESC
-        """, (
-            f"%{search_query}%",
-            f"%{search_query}%",
-            f"%{search_query}%"
-        ))
-    else:
-        cur.execute("""
-            SELECT * FROM pedidos
-            WHERE estado IN ('entregado', 'cancelado')
-            ORDER BY fecha DESC, hora DESC
-        """)
-
-    pedidos = cur.fetchall()
-    ordenes = []
+        busqueda = filtro_busqueda_pedido(search_query)
+        if busqueda is None:
+            busqueda = ("1=0", [])
+        filtros += " AND " + busqueda[0]
+        params.extend(busqueda[1])
 
-    for pedido in pedidos:
-        cur.execute("""
-            SELECT dp.cod_producto, dp.cantidad, dp.precio_unitario, p.nombre
-            FROM detalle_pedido dp
-            JOIN productos p ON dp.cod_producto = p.id_producto
-            WHERE dp.cod_pedido = %s
-        """, (pedido['id_pedido'],))
-
-        detalles = cur.fetchall()
-
-        productos = []
-        for d in detalles:
-            subtotal = float(d['cantidad']) * float(d['precio_unitario'])
-            productos.append({
-                'nombre': d['nombre'],
-                'cantidad': d['cantidad'],
-                'precio_unitario': float(d['precio_unitario']),
-                'subtotal': subtotal
-            })
-
-        pedido['productos'] = productos
-        ordenes.append(pedido)
+    cur = mysql.connection.cursor(MySQLdb.cursors.DictCursor)
 
+    # Conteo por agregado, sin traer las filas
+    cur.execute(f"""
+        SELECT COUNT(*) AS total,
+               COALESCE(SUM(estado = 'entregado'), 0) AS entregadas,
+               COALESCE(SUM(estado = 'cancelado'), 0) AS canceladas
+        FROM pedidos
+        {filtros}
+    """, params)
+    conteo = cur.fetchone()
+
+    # Página actual por keyset sobre (fecha, hora, id_pedido)
+    query = "SELECT * FROM pedidos" + filtros
+    params_pagina = list(params)
+    if cursor:
+        condicion, params_cursor = condicion_keyset(['fecha', 'hora', 'id_pedido'], cursor)
+        query += " AND " + condicion
+        params_pagina.extend(params_cursor)
+    query += " ORDER BY fecha DESC, hora DESC, id_pedido DESC LIMIT %s"
+    params_pagina.append(limite + 1)
+
+    cur.execute(query, params_pagina)
+    ordenes, siguiente = recortar_pagina(cur.fetchall(), limite, ['fecha', 'hora', 'id_pedido'])
+    adjuntar_detalles(cur, ordenes)
     cur.close()
 
-    return render_template('historial_ordenes_em.html', ordenes=ordenes, search_query=search_query)
+    return render_template(
+        'historial_ordenes_em.html',
+        ordenes=ordenes,
+        search_query=search_query,
+        desde=desde or '',
+        hasta=hasta or '',
+        limite=limite,
+        conteo=conteo,
+        siguiente=siguiente,
+        es_primera=cursor is None
+    )
 
 # ===============================
 # RESERVAS
@@ -494,15 +540,18 @@ def buscar_reservas():
         flash(mensaje, 'danger')
         return redirect(url_for('auth.login'))
     
-    search_query = request.args.get('search_query', '')
-    
+    search_query = request.args.get('search_query', '').strip()
+    busqueda = filtro_busqueda_reserva(search_query)
+    if busqueda is None:
+        return redirect(url_for('empleado.reservas_empleado'))
+
     cur = mysql.connection.cursor()
     cur.execute("""
         SELECT * FROM reservas
-        WHERE (nombre LIKE %s OR documento LIKE %s OR telefono LIKE %s)
+        WHERE """ + busqueda[0] + """
         AND estado IN ('Pendiente', 'Confirmada')
         ORDER BY fecha ASC, hora ASC
-    """, (f'%{search_query}%', f'%{search_query}%', f'%{search_query}%'))
+    """, busqueda[1])
     reservas = cur.fetchall()
     cur.close()
     
@@ -554,6 +603,7 @@ def agregar_reserva():
             ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, 'Pendiente')
         """, (nombre, documento, telefono, fecha, hora,
               cant_personas, tipo_evento, comentarios, id_usuario))
+        invalidar('reservas')
         mysql.connection.commit()
         flash(f"✅ Reserva creada para {nombre} el {fecha} ({cant_personas} personas)", "success")
 
@@ -613,7 +663,7 @@ def editar_reserva(id_reserva):
             request.form["id_usuario"],
             id_reserva
         ))
-        
+        invalidar('reservas')
         mysql.connection.commit()
         flash(f"✅ Reserva de {nombre} actualizada correctamente", "success")
         
@@ -644,6 +694,7 @@ def eliminar_reserva(id_reserva):
         
         if reserva:
             cur.execute("DELETE FROM reservas WHERE id_reserva=%s", (id_reserva,))
+            invalidar('reservas')
             mysql.connection.commit()
             flash(f"🗑️ Reserva de {reserva['nombre']} ({reserva['fecha']}) eliminada", "info")
         else:
@@ -675,6 +726,7 @@ def cambiar_estado_reserva(id_reserva):
     try:
         cur = mysql.connection.cursor()
         cur.execute("UPDATE reservas SET estado = %s WHERE id_reserva = %s", (nuevo_estado, id_reserva))
+        invalidar('reservas')
         mysql.connection.commit()
         cur.close()
         
@@ -759,6 +811,7 @@ def api_actualizar_perfil_empleado():
         data["nombre"], data["apellido"], data["telefono"],
         data["direccion"], data["correo"], session["id_usuario"]
     ))
+    invalidar('usuarios')  # nombres en el reporte de ventas cacheado
     mysql.connection.commit()
     cur.close()
 
@@ -1,20 +1,17 @@
-from flask import Blueprint, render_template, send_file, request, session, redirect, url_for, flash
-import pandas as pd
-from fpdf import FPDF
-from io import BytesIO
-import mysql.connector
-from datetime import datetime
+from flask import Blueprint, render_template, send_file, request, session, redirect, url_for, flash, Response, stream_with_context, jsonify, abort
+from datetime import datetime, timedelta
 
-# =====================
-# CONEXIÓN DIRECTA
-# =====================
-def obtener_conexion():
-    return mysql.connector.connect(
-        host="localhost",
-        user="root",
-        password="",
-        database="parrilla51"
-    )
+from __init__ import mysql
+from services import exportes, filtros, hechos_venta, trabajos, ventas_diarias
+from services.cache import cache_reportes, cacheado
+from services.exportes import Columna
+from services.paginacion import arg_fecha
+
+# Filas del listado en pantalla; los totales salen del resumen diario
+LIMITE_LISTADO_VENTAS = 200
+
+# Rango por defecto del reporte combinado (en línea + mesas)
+DIAS_VENTAS_COMBINADAS = 30
 
 # =====================
 # VERIFICACIÓN DE ADMINISTRADOR
@@ -35,199 +32,375 @@ def verificar_admin():
 reportes_bp = Blueprint("reportes", __name__)
 
 # =====================
-# REPORTES DE VENTAS
+# FILTROS COMPARTIDOS (PANTALLA Y EXPORTACIONES)
 # =====================
-@reportes_bp.route("/ventas", methods=["GET", "POST"])
-def reportes_ventas():
-    es_admin, mensaje = verificar_admin()
-    if not es_admin:
-        flash(mensaje, 'danger')
-        return redirect(url_for('auth.login'))
-    
-    conexion = obtener_conexion()
-    cursor = conexion.cursor(dictionary=True)
-
-    # Valores por defecto
-    busqueda = ""
-    filtro_mes = ""
-    filtro_estado = ""
-
-    # Si vienen datos por POST
-    if request.method == "POST":
-        busqueda = request.form.get("busqueda", "").strip()
-        filtro_mes = request.form.get("mes", "")
-        filtro_estado = request.form.get("estado", "")
-
-    # Construir la consulta base
-    query = """
-        SELECT p.id_pedido, u.nombre, u.apellido, p.fecha, p.hora, p.total, 
-               p.estado, p.metodo_pago, p.tipo_entrega
+FILTROS_STOCK = {
+    "bajo": "p.cantidad < 5",
+    "sin_stock": "p.cantidad = 0",
+    "disponible": "p.cantidad >= 5",
+}
+
+
+def _filtros_ventas():
+    """Filtros del reporte de ventas: del formulario (POST) o de la URL (exportaciones)"""
+    return {
+        "busqueda": request.values.get("busqueda", "").strip(),
+        "mes": request.values.get("mes", "").strip(),
+        "estado": request.values.get("estado", "").strip(),
+    }
+
+
+def _desde_ventas(f):
+    """`(FROM ... WHERE ..., params)` del reporte de ventas para los filtros `f`"""
+    condicion, params = filtros.combinar(
+        filtros.filtro_busqueda_venta(f["busqueda"]),
+        filtros.filtro_mes("p.fecha", f["mes"]),
+        filtros.igual("p.estado", f["estado"]) if f["estado"] else None,
+    )
+    sql = """
         FROM pedidos p
         INNER JOIN usuarios u ON p.cod_usuario = u.id_usuario
         WHERE 1=1
     """
-    params = []
+    if condicion:
+        sql += " AND " + condicion
+    return sql, params
+
+
+def consulta_ventas(f, columnas, limite=None):
+    """SELECT del reporte de ventas ya filtrado y ordenado: `(query, params)`"""
+    desde, params = _desde_ventas(f)
+    query = "SELECT " + columnas + desde + " ORDER BY p.fecha DESC, p.hora DESC"
+    if limite:
+        query += " LIMIT %s"
+        params = params + [limite]
+    return query, params
+
+
+def _filtros_inventario():
+    """Filtros del reporte de inventario: del formulario (POST) o de la URL"""
+    f = {
+        "busqueda": request.values.get("busqueda", "").strip(),
+        "categoria": request.values.get("categoria", "").strip(),
+        "stock": request.values.get("stock", "").strip(),
+    }
+    if not f["categoria"].isdigit():
+        f["categoria"] = ""
+    if f["stock"] not in FILTROS_STOCK:
+        f["stock"] = ""
+    return f
+
+
+def _desde_inventario(f):
+    """`(FROM ... WHERE ..., params)` del reporte de inventario para los filtros `f`"""
+    sql = """
+        FROM productos p
+        LEFT JOIN categorias c ON p.cod_categoria = c.id_categoria
+        WHERE 1=1
+    """
+    # El catálogo es pequeño: aquí sí se busca por contenido
+    condicion, params = filtros.combinar(
+        filtros.cualquiera(
+            filtros.contiene("p.nombre", f["busqueda"]),
+            filtros.contiene("p.descripcion", f["busqueda"]),
+        ) if f["busqueda"] else None,
+        filtros.igual("p.cod_categoria", int(f["categoria"])) if f["categoria"] else None,
+        (FILTROS_STOCK[f["stock"]], []) if f["stock"] else None,
+    )
+    if condicion:
+        sql += " AND " + condicion
+    return sql, params
 
-    # Aplicar filtros
-    if busqueda:
-        query += " AND (u.nombre LIKE %s OR u.apellido LIKE %s OR CAST(p.id_pedido AS CHAR) LIKE %s)"
-        busqueda_param = f"%{busqueda}%"
-        params.extend([busqueda_param, busqueda_param, busqueda_param])
 
-    if filtro_mes:
-        query += " AND DATE_FORMAT(p.fecha, '%%Y-%%m') = %s"
-        params.append(filtro_mes)
+def consulta_inventario(f, columnas):
+    """SELECT del reporte de inventario ya filtrado y ordenado: `(query, params)`"""
+    desde, params = _desde_inventario(f)
+    return "SELECT " + columnas + desde + " ORDER BY p.cantidad ASC", params
 
-    if filtro_estado:
-        query += " AND p.estado = %s"
-        params.append(filtro_estado)
 
-    query += " ORDER BY p.fecha DESC, p.hora DESC"
+def _parametros_url(f):
+    """Filtros no vacíos, para repetirlos en los enlaces de exportación"""
+    return {clave: valor for clave, valor in f.items() if valor}
 
-    cursor.execute(query, params)
-    pedidos = cursor.fetchall()
-    
-    # Calcular estadísticas
-    total_ventas = sum(p['total'] for p in pedidos if p['total'])
-    total_pedidos = len(pedidos)
+
+# =====================
+# REPORTES DE VENTAS
+# =====================
+def _calcular_reporte_ventas(f):
+    query, params = consulta_ventas(f, """
+        p.id_pedido, u.nombre, u.apellido, p.fecha, p.hora, p.total,
+        p.estado, p.metodo_pago, p.tipo_entrega
+    """, limite=LIMITE_LISTADO_VENTAS)
+
+    with mysql.cursor() as cursor:
+        cursor.execute(query, params)
+        pedidos = cursor.fetchall()
+
+        # Estadísticas y gráficas desde el resumen diario
+        resumen = ventas_diarias.resumen(cursor, mes=f["mes"], estado=f["estado"])
+
+        # La búsqueda por cliente no está en el resumen: se agrega sobre pedidos
+        if f["busqueda"]:
+            desde, params = _desde_ventas(f)
+            cursor.execute(
+                "SELECT COUNT(*) AS total_pedidos, COALESCE(SUM(p.total), 0) AS total_ventas" + desde,
+                params
+            )
+            fila = cursor.fetchone()
+            resumen['total_pedidos'] = int(fila['total_pedidos'])
+            resumen['total_ventas'] = int(fila['total_ventas'])
+
+    return {'pedidos': pedidos, 'resumen': resumen}
+
+
+@reportes_bp.route("/ventas", methods=["GET", "POST"])
+def reportes_ventas():
+    es_admin, mensaje = verificar_admin()
+    if not es_admin:
+        flash(mensaje, 'danger')
+        return redirect(url_for('auth.login'))
     
-    cursor.close()
-    conexion.close()
+    f = _filtros_ventas()
+
+    # Recargas con los mismos filtros se sirven de la caché hasta que cambie `pedidos`
+    reporte = cacheado(cache_reportes, "ventas", ("pedidos", "usuarios"), f, lambda: _calcular_reporte_ventas(f))
+    resumen = reporte['resumen']
+    total_ventas = resumen['total_ventas']
+    total_pedidos = resumen['total_pedidos']
 
     return render_template(
         "reportes_ventas.html",
-        pedidos=pedidos,
-        busqueda=busqueda,
-        filtro_mes=filtro_mes,
-        filtro_estado=filtro_estado,
+        pedidos=reporte['pedidos'],
+        busqueda=f["busqueda"],
+        filtro_mes=f["mes"],
+        filtro_estado=f["estado"],
+        filtros_url=_parametros_url(f),
         total_ventas=total_ventas,
-        total_pedidos=total_pedidos
+        total_pedidos=total_pedidos,
+        ventas_por_dia=resumen['por_dia'],
+        ventas_por_metodo=resumen['por_metodo'],
+        limite_listado=LIMITE_LISTADO_VENTAS
     )
 
 # =====================
-# REPORTES DE INVENTARIO
+# VENTAS COMBINADAS (EN LÍNEA + MESAS)
 # =====================
-@reportes_bp.route("/inventario", methods=["GET", "POST"])
-def reportes_inventario():
+@reportes_bp.route("/ventas/combinadas")
+def reportes_ventas_combinadas():
     es_admin, mensaje = verificar_admin()
     if not es_admin:
         flash(mensaje, 'danger')
         return redirect(url_for('auth.login'))
-    
-    conexion = obtener_conexion()
-    cursor = conexion.cursor(dictionary=True)
-
-    # Valores por defecto
-    busqueda = ""
-    filtro_categoria = ""
-    filtro_stock = ""
-
-    # Si vienen datos por POST
-    if request.method == "POST":
-        busqueda = request.form.get("busqueda", "").strip()
-        filtro_categoria = request.form.get("categoria", "")
-        filtro_stock = request.form.get("stock", "")
-
-    # Construir la consulta base
-    query = """
-        SELECT p.id_producto, p.nombre, p.cantidad, p.precio, p.descripcion,
-               c.nombre_categoria, p.fecha_vencimiento, p.fecha_lote
-        FROM productos p
-        LEFT JOIN categorias c ON p.cod_categoria = c.id_categoria
-        WHERE 1=1
-    """
-    params = []
 
-    # Aplicar filtros
-    if busqueda:
-        query += " AND (p.nombre LIKE %s OR p.descripcion LIKE %s)"
-        busqueda_param = f"%{busqueda}%"
-        params.extend([busqueda_param, busqueda_param])
+    hasta = arg_fecha("hasta") or datetime.now().date()
+    desde = arg_fecha("desde") or hasta - timedelta(days=DIAS_VENTAS_COMBINADAS - 1)
+    if desde > hasta:
+        desde, hasta = hasta, desde
+    canal = request.args.get("canal", "")
+    if canal not in (hechos_venta.CANAL_ONLINE, hechos_venta.CANAL_MESA):
+        canal = ""
+
+    with mysql.cursor() as cursor:
+        filas = hechos_venta.ingresos_por_dia(cursor, desde, hasta)
+        productos = hechos_venta.mezcla_productos(cursor, desde, hasta, canal=canal or None)
+
+    # Una fila por día con ambos canales lado a lado
+    dias = {}
+    totales = {hechos_venta.CANAL_ONLINE: 0, hechos_venta.CANAL_MESA: 0}
+    for fila in filas:
+        dia = dias.setdefault(fila['fecha'], {'fecha': fila['fecha'], 'online': 0, 'mesa': 0})
+        dia[fila['canal']] = int(fila['ingresos'] or 0)
+        totales[fila['canal']] += int(fila['ingresos'] or 0)
+    dias = list(dias.values())
+    for dia in dias:
+        dia['total'] = dia['online'] + dia['mesa']
 
-    if filtro_categoria:
-        query += " AND c.id_categoria = %s"
-        params.append(filtro_categoria)
-
-    if filtro_stock == "bajo":
-        query += " AND p.cantidad < 5"
-    elif filtro_stock == "sin_stock":
-        query += " AND p.cantidad = 0"
-    elif filtro_stock == "disponible":
-        query += " AND p.cantidad >= 5"
+    return render_template(
+        "reportes_ventas_combinadas.html",
+        dias=dias,
+        productos=productos,
+        total_online=totales[hechos_venta.CANAL_ONLINE],
+        total_mesa=totales[hechos_venta.CANAL_MESA],
+        desde=desde,
+        hasta=hasta,
+        canal=canal
+    )
 
-    query += " ORDER BY p.cantidad ASC"
+# =====================
+# REPORTES DE INVENTARIO
+# =====================
+def _calcular_reporte_inventario(f):
+    query, params = consulta_inventario(f, """
+        p.id_producto, p.nombre, p.cantidad, p.precio, p.descripcion,
+        c.nombre_categoria, p.fecha_vencimiento, p.fecha_lote
+    """)
 
-    cursor.execute(query, params)
-    productos = cursor.fetchall()
-    
-    # Obtener categorías para el filtro
-    cursor.execute("SELECT id_categoria, nombre_categoria FROM categorias ORDER BY nombre_categoria")
-    categorias = cursor.fetchall()
+    with mysql.cursor() as cursor:
+        cursor.execute(query, params)
+        productos = cursor.fetchall()
+        
+        # Obtener categorías para el filtro
+        cursor.execute("SELECT id_categoria, nombre_categoria FROM categorias ORDER BY nombre_categoria")
+        categorias = cursor.fetchall()
     
     # Calcular estadísticas
-    total_productos = len(productos)
-    productos_bajo_stock = sum(1 for p in productos if p['cantidad'] and p['cantidad'] < 5)
-    productos_sin_stock = sum(1 for p in productos if p['cantidad'] == 0)
-    valor_inventario = sum(p['cantidad'] * p['precio'] for p in productos if p['cantidad'] and p['precio'])
+    return {
+        'productos': productos,
+        'categorias': categorias,
+        'total_productos': len(productos),
+        'productos_bajo_stock': sum(1 for p in productos if p['cantidad'] and p['cantidad'] < 5),
+        'productos_sin_stock': sum(1 for p in productos if p['cantidad'] == 0),
+        'valor_inventario': sum(p['cantidad'] * p['precio'] for p in productos if p['cantidad'] and p['precio']),
+    }
+
+
+@reportes_bp.route("/inventario", methods=["GET", "POST"])
+def reportes_inventario():
+    es_admin, mensaje = verificar_admin()
+    if not es_admin:
+        flash(mensaje, 'danger')
+        return redirect(url_for('auth.login'))
     
-    cursor.close()
-    conexion.close()
+    f = _filtros_inventario()
+    reporte = cacheado(cache_reportes, "inventario", ("productos", "categorias"), f,
+                       lambda: _calcular_reporte_inventario(f))
 
     return render_template(
         "reportes_inventario.html",
-        productos=productos,
-        categorias=categorias,
-        busqueda=busqueda,
-        filtro_categoria=filtro_categoria,
-        filtro_stock=filtro_stock,
-        total_productos=total_productos,
-        productos_bajo_stock=productos_bajo_stock,
-        productos_sin_stock=productos_sin_stock,
-        valor_inventario=valor_inventario
+        busqueda=f["busqueda"],
+        filtro_categoria=f["categoria"],
+        filtro_stock=f["stock"],
+        filtros_url=_parametros_url(f),
+        **reporte
     )
 
 # =====================
-# EXPORTAR VENTAS A EXCEL
+# TRABAJOS DE EXPORTACIÓN (SEGUNDO PLANO)
 # =====================
-@reportes_bp.route("/ventas/exportar_excel")
-def exportar_ventas_excel():
+def _quiere_json():
+    return request.accept_mimetypes.best == "application/json" or request.args.get("formato") == "json"
+
+
+def _estado_json(meta):
+    return {
+        "id": meta["id"],
+        "estado": meta["estado"],
+        "filas": meta.get("filas", 0),
+        "error": meta.get("error"),
+        "descarga": url_for("reportes.descargar_trabajo", id_trabajo=meta["id"])
+                    if meta["estado"] == trabajos.ESTADO_LISTO else None,
+    }
+
+
+def _encolar_exportacion(spec):
+    """Encola la exportación y responde de inmediato (JSON 202 o página de espera)"""
+    try:
+        meta = trabajos.encolar(spec, session.get("id_usuario"))
+    except trabajos.ColaLlena:
+        if _quiere_json():
+            return jsonify({"error": "Hay demasiadas exportaciones en curso"}), 429
+        flash("⚠️ Hay demasiadas exportaciones en curso, intenta en unos minutos", "warning")
+        return redirect(request.referrer or url_for("reportes.reportes_ventas"))
+
+    if _quiere_json():
+        return jsonify(_estado_json(meta)), 202
+    return redirect(url_for("reportes.ver_trabajo", id_trabajo=meta["id"]))
+
+
+def _trabajo_del_usuario(id_trabajo):
+    meta = trabajos.leer(id_trabajo)
+    if meta is None or meta.get("id_usuario") != session.get("id_usuario"):
+        abort(404)
+    return meta
+
+
+@reportes_bp.route("/trabajos/<id_trabajo>")
+def ver_trabajo(id_trabajo):
     es_admin, mensaje = verificar_admin()
     if not es_admin:
         flash(mensaje, 'danger')
         return redirect(url_for('auth.login'))
-    
-    conexion = obtener_conexion()
-    query = """
-        SELECT p.id_pedido AS 'ID Pedido', 
-               CONCAT(u.nombre, ' ', u.apellido) AS 'Cliente',
-               p.fecha AS 'Fecha', 
-               p.hora AS 'Hora',
-               p.total AS 'Total', 
-               p.estado AS 'Estado',
-               p.metodo_pago AS 'Método de Pago',
-               p.tipo_entrega AS 'Tipo de Entrega'
-        FROM pedidos p
-        INNER JOIN usuarios u ON p.cod_usuario = u.id_usuario
-        ORDER BY p.fecha DESC
-    """
-    df = pd.read_sql(query, conexion)
-    conexion.close()
 
-    output = BytesIO()
-    with pd.ExcelWriter(output, engine="openpyxl") as writer:
-        df.to_excel(writer, index=False, sheet_name="Ventas")
-    output.seek(0)
+    meta = _trabajo_del_usuario(id_trabajo)
+    return render_template("reportes_trabajo.html", trabajo=_estado_json(meta),
+                           nombre_descarga=meta["nombre_descarga"])
+
+
+@reportes_bp.route("/trabajos/<id_trabajo>/estado")
+def estado_trabajo(id_trabajo):
+    es_admin, mensaje = verificar_admin()
+    if not es_admin:
+        return jsonify({"error": mensaje}), 403
+
+    return jsonify(_estado_json(_trabajo_del_usuario(id_trabajo)))
+
+
+@reportes_bp.route("/trabajos/<id_trabajo>/descargar")
+def descargar_trabajo(id_trabajo):
+    es_admin, mensaje = verificar_admin()
+    if not es_admin:
+        flash(mensaje, 'danger')
+        return redirect(url_for('auth.login'))
+
+    meta = _trabajo_del_usuario(id_trabajo)
+    if meta["estado"] != trabajos.ESTADO_LISTO:
+        flash("⏳ La exportación todavía no está lista", "warning")
+        return redirect(url_for("reportes.ver_trabajo", id_trabajo=id_trabajo))
 
     return send_file(
-        output,
+        trabajos.ruta_archivo(meta),
         as_attachment=True,
-        download_name=f"reporte_ventas_{datetime.now().strftime('%Y%m%d')}.xlsx",
-        mimetype="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+        download_name=meta["nombre_descarga"],
+        mimetype=exportes.MIMETYPE_XLSX if meta["formato"] == "xlsx" else exportes.MIMETYPE_PDF
     )
 
+# =====================
+# EXPORTAR VENTAS A EXCEL
+# =====================
+COLUMNAS_VENTAS_EXCEL = [
+    Columna("ID Pedido", "id_pedido", "entero", 11),
+    Columna("Cliente", "cliente", "texto", 30),
+    Columna("Fecha", "fecha", "fecha", 12),
+    Columna("Hora", "hora", "hora", 10),
+    Columna("Total", "total", "moneda", 14),
+    Columna("Estado", "estado", "texto", 15),
+    Columna("Método de Pago", "metodo_pago", "texto", 16),
+    Columna("Tipo de Entrega", "tipo_entrega", "texto", 16),
+]
+
+
+@reportes_bp.route("/ventas/exportar_excel")
+def exportar_ventas_excel():
+    es_admin, mensaje = verificar_admin()
+    if not es_admin:
+        flash(mensaje, 'danger')
+        return redirect(url_for('auth.login'))
+    
+    query, params = consulta_ventas(_filtros_ventas(), """
+        p.id_pedido, CONCAT(u.nombre, ' ', u.apellido) AS cliente,
+        p.fecha, p.hora, p.total, p.estado, p.metodo_pago, p.tipo_entrega
+    """)
+    return _encolar_exportacion({
+        "formato": "xlsx", "query": query, "params": params,
+        "columnas": COLUMNAS_VENTAS_EXCEL, "titulo": "Ventas",
+        "nombre_descarga": exportes.nombre_archivo("reporte_ventas", "xlsx"),
+    })
+
 # =====================
 # EXPORTAR INVENTARIO A EXCEL
 # =====================
+COLUMNAS_INVENTARIO_EXCEL = [
+    Columna("ID", "id_producto", "entero", 8),
+    Columna("Producto", "nombre", "texto", 30),
+    Columna("Cantidad", "cantidad", "entero", 10),
+    Columna("Precio", "precio", "moneda", 12),
+    Columna("Categoría", "nombre_categoria", "texto", 20),
+    Columna("Descripción", "descripcion", "texto", 40),
+    Columna("Fecha Vencimiento", "fecha_vencimiento", "fecha", 17),
+    Columna("Fecha Lote", "fecha_lote", "fecha", 12),
+]
+
+
 @reportes_bp.route("/inventario/exportar_excel")
 def exportar_inventario_excel():
     es_admin, mensaje = verificar_admin()
@@ -235,38 +408,140 @@ def exportar_inventario_excel():
         flash(mensaje, 'danger')
         return redirect(url_for('auth.login'))
     
-    conexion = obtener_conexion()
-    query = """
-        SELECT p.id_producto AS 'ID',
-               p.nombre AS 'Producto',
-               p.cantidad AS 'Cantidad',
-               p.precio AS 'Precio',
-               c.nombre_categoria AS 'Categoría',
-               p.descripcion AS 'Descripción',
-               p.fecha_vencimiento AS 'Fecha Vencimiento',
-               p.fecha_lote AS 'Fecha Lote'
-        FROM productos p
-        LEFT JOIN categorias c ON p.cod_categoria = c.id_categoria
-        ORDER BY p.cantidad ASC
-    """
-    df = pd.read_sql(query, conexion)
-    conexion.close()
+    query, params = consulta_inventario(_filtros_inventario(), """
+        p.id_producto, p.nombre, p.cantidad, p.precio, c.nombre_categoria,
+        p.descripcion, p.fecha_vencimiento, p.fecha_lote
+    """)
+    return _encolar_exportacion({
+        "formato": "xlsx", "query": query, "params": params,
+        "columnas": COLUMNAS_INVENTARIO_EXCEL, "titulo": "Inventario",
+        "nombre_descarga": exportes.nombre_archivo("reporte_inventario", "xlsx"),
+    })
 
-    output = BytesIO()
-    with pd.ExcelWriter(output, engine="openpyxl") as writer:
-        df.to_excel(writer, index=False, sheet_name="Inventario")
-    output.seek(0)
+# =====================
+# EXPORTACIONES CSV (BI)
+# =====================
+# Parámetros comunes: `gzip=1` comprime al vuelo; `since_id=N` trae solo
+# filas con ID mayor a N y `since=AAAA-MM-DD` solo desde esa fecha. Las
+# filas salen en orden de ID, así el último ID recibido es el próximo since_id.
+def _marca_agua(columna_id, columna_fecha=None):
+    condiciones = []
+    since_id = request.args.get("since_id", "").strip()
+    if since_id.isdigit():
+        condiciones.append((f"{columna_id} > %s", [int(since_id)]))
+    since = arg_fecha("since")
+    if since and columna_fecha:
+        condiciones.append((f"{columna_fecha} >= %s", [since]))
+    return condiciones
+
+
+def _consulta_csv(columnas, desde, params, columna_id, columna_fecha=None):
+    condicion, params_marca = filtros.combinar(*_marca_agua(columna_id, columna_fecha))
+    if condicion:
+        desde += " AND " + condicion
+    return "SELECT " + columnas + desde + f" ORDER BY {columna_id} ASC", list(params) + params_marca
+
+
+def _respuesta_csv(nombre, claves, query, params):
+    """Respuesta que empieza a enviar bytes de inmediato y lee las filas por lotes"""
+    comprimir = request.args.get("gzip", "").lower() in ("1", "true", "si")
+    cuerpo = exportes.generar_csv(claves, exportes.iterar_filas(query, params), comprimir=comprimir)
+    respuesta = Response(
+        stream_with_context(cuerpo),
+        content_type=exportes.MIMETYPE_GZIP if comprimir else exportes.MIMETYPE_CSV
+    )
+    extension = "csv.gz" if comprimir else "csv"
+    respuesta.headers["Content-Disposition"] = f'attachment; filename="{exportes.nombre_archivo(nombre, extension)}"'
+    # Evita que un proxy (nginx) acumule la respuesta completa antes de reenviarla
+    respuesta.headers["X-Accel-Buffering"] = "no"
+    return respuesta
 
-    return send_file(
-        output,
-        as_attachment=True,
-        download_name=f"reporte_inventario_{datetime.now().strftime('%Y%m%d')}.xlsx",
-        mimetype="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+@reportes_bp.route("/ventas/exportar_csv")
+def exportar_ventas_csv():
+    es_admin, mensaje = verificar_admin()
+    if not es_admin:
+        flash(mensaje, 'danger')
+        return redirect(url_for('auth.login'))
+
+    claves = ["id_pedido", "cod_usuario", "cliente", "fecha", "hora", "total",
+              "estado", "metodo_pago", "tipo_entrega"]
+    desde, params = _desde_ventas(_filtros_ventas())
+    query, params = _consulta_csv("""
+        p.id_pedido, p.cod_usuario, CONCAT(u.nombre, ' ', u.apellido) AS cliente,
+        p.fecha, p.hora, p.total, p.estado, p.metodo_pago, p.tipo_entrega
+    """, desde, params, "p.id_pedido", "p.fecha")
+    return _respuesta_csv("pedidos", claves, query, params)
+
+
+@reportes_bp.route("/ventas/lineas/exportar_csv")
+def exportar_lineas_csv():
+    es_admin, mensaje = verificar_admin()
+    if not es_admin:
+        flash(mensaje, 'danger')
+        return redirect(url_for('auth.login'))
+
+    claves = ["id_detalle", "id_pedido", "fecha", "id_producto", "producto",
+              "cantidad", "precio_unitario", "subtotal"]
+    query, params = _consulta_csv("""
+        d.id_detalle, d.cod_pedido AS id_pedido, p.fecha, d.cod_producto AS id_producto,
+        pr.nombre AS producto, d.cantidad, d.precio_unitario,
+        d.cantidad * d.precio_unitario AS subtotal
+    """, """
+        FROM detalle_pedido d
+        INNER JOIN pedidos p ON p.id_pedido = d.cod_pedido
+        LEFT JOIN productos pr ON pr.id_producto = d.cod_producto
+        WHERE 1=1
+    """, [], "d.id_detalle", "p.fecha")
+    return _respuesta_csv("lineas_pedido", claves, query, params)
+
+
+@reportes_bp.route("/pagos_mesa/exportar_csv")
+def exportar_pagos_mesa_csv():
+    es_admin, mensaje = verificar_admin()
+    if not es_admin:
+        flash(mensaje, 'danger')
+        return redirect(url_for('auth.login'))
+
+    claves = ["id_pago_restaurante", "id_mesa", "fecha", "hora", "total"]
+    query, params = _consulta_csv(
+        "id_pago_restaurante, id_mesa, fecha, hora, total",
+        " FROM pagos_restaurante WHERE 1=1",
+        [], "id_pago_restaurante", "fecha"
     )
+    return _respuesta_csv("pagos_mesa", claves, query, params)
+
+
+@reportes_bp.route("/inventario/exportar_csv")
+def exportar_inventario_csv():
+    es_admin, mensaje = verificar_admin()
+    if not es_admin:
+        flash(mensaje, 'danger')
+        return redirect(url_for('auth.login'))
+
+    claves = ["id_producto", "nombre", "cantidad", "precio", "id_categoria",
+              "nombre_categoria", "estado", "fecha_vencimiento", "fecha_lote"]
+    desde, params = _desde_inventario(_filtros_inventario())
+    query, params = _consulta_csv("""
+        p.id_producto, p.nombre, p.cantidad, p.precio, p.cod_categoria AS id_categoria,
+        c.nombre_categoria, p.estado, p.fecha_vencimiento, p.fecha_lote
+    """, desde, params, "p.id_producto")
+    return _respuesta_csv("inventario", claves, query, params)
 
 # =====================
 # EXPORTAR VENTAS A PDF
 # =====================
+COLUMNAS_VENTAS_PDF = [
+    Columna("Pedido", "id_pedido", "entero", 16),
+    Columna("Cliente", "cliente", "texto", 48),
+    Columna("Fecha", "fecha", "fecha", 20),
+    Columna("Hora", "hora", "hora", 16),
+    Columna("Estado", "estado", "texto", 26),
+    Columna("Método", "metodo_pago", "texto", 34),
+    Columna("Total", "total", "moneda", 30),
+]
+
+
 @reportes_bp.route('/ventas/exportar_pdf')
 def exportar_ventas_pdf():
     es_admin, mensaje = verificar_admin()
@@ -274,64 +549,31 @@ def exportar_ventas_pdf():
         flash(mensaje, 'danger')
         return redirect(url_for('auth.login'))
     
-    conexion = obtener_conexion()
-    cursor = conexion.cursor(dictionary=True)
-    cursor.execute("""
-        SELECT p.id_pedido, u.nombre, u.apellido, p.fecha, p.hora, p.total, 
-               p.estado, p.metodo_pago
-        FROM pedidos p
-        INNER JOIN usuarios u ON p.cod_usuario = u.id_usuario
-        ORDER BY p.fecha DESC
+    query, params = consulta_ventas(_filtros_ventas(), """
+        p.id_pedido, CONCAT(u.nombre, ' ', u.apellido) AS cliente, p.fecha, p.hora,
+        p.total, p.estado, p.metodo_pago
     """)
-    pedidos = cursor.fetchall()
-    cursor.close()
-    conexion.close()
-
-    # Crear PDF
-    pdf = FPDF()
-    pdf.add_page()
-    pdf.set_font("Arial", 'B', 16)
-    pdf.cell(0, 10, "Reporte de Ventas - Parrilla 51", ln=True, align="C")
-    pdf.set_font("Arial", size=10)
-    pdf.cell(0, 10, f"Generado: {datetime.now().strftime('%d/%m/%Y %H:%M')}", ln=True, align="C")
-    pdf.ln(5)
-
-    total_general = 0
-    pdf.set_font("Arial", 'B', 10)
-    
-    for pedido in pedidos:
-        texto = (
-            f"Pedido #{pedido['id_pedido']} | "
-            f"{pedido['nombre']} {pedido['apellido']} | "
-            f"Fecha: {pedido['fecha']} {pedido['hora']} | "
-            f"Total: ${pedido['total']:,.0f} | "
-            f"Estado: {pedido['estado']}"
-        )
-        pdf.set_font("Arial", size=9)
-        pdf.multi_cell(0, 6, texto.encode('latin-1', 'replace').decode('latin-1'))
-        pdf.ln(2)
-        total_general += pedido['total'] if pedido['total'] else 0
-
-    pdf.ln(5)
-    pdf.set_font("Arial", 'B', 12)
-    pdf.cell(0, 10, f"Total General: ${total_general:,.0f}", ln=True, align="R")
-
-    # Generar PDF en memoria
-    salida = BytesIO()
-    pdf_bytes = pdf.output(dest='S').encode('latin1')
-    salida.write(pdf_bytes)
-    salida.seek(0)
 
-    return send_file(
-        salida,
-        as_attachment=True,
-        download_name=f"reporte_ventas_{datetime.now().strftime('%Y%m%d')}.pdf",
-        mimetype="application/pdf"
-    )
+    return _encolar_exportacion({
+        "formato": "pdf", "query": query, "params": params,
+        "columnas": COLUMNAS_VENTAS_PDF, "titulo": "Reporte de Ventas", "sumar": ["total"],
+        "nombre_descarga": exportes.nombre_archivo("reporte_ventas", "pdf"),
+    })
 
 # =====================
 # EXPORTAR INVENTARIO A PDF
 # =====================
+COLUMNAS_INVENTARIO_PDF = [
+    Columna("ID", "id_producto", "entero", 12),
+    Columna("Producto", "nombre", "texto", 56),
+    Columna("Categoría", "nombre_categoria", "texto", 34),
+    Columna("Stock", "estado_stock", "texto", 24),
+    Columna("Cantidad", "cantidad", "entero", 18),
+    Columna("Precio", "precio", "moneda", 22),
+    Columna("Valor", "valor", "moneda", 24),
+]
+
+
 @reportes_bp.route('/inventario/exportar_pdf')
 def exportar_inventario_pdf():
     es_admin, mensaje = verificar_admin()
@@ -339,61 +581,16 @@ def exportar_inventario_pdf():
         flash(mensaje, 'danger')
         return redirect(url_for('auth.login'))
     
-    conexion = obtener_conexion()
-    cursor = conexion.cursor(dictionary=True)
-    cursor.execute("""
-        SELECT p.id_producto, p.nombre, p.cantidad, p.precio, c.nombre_categoria
-        FROM productos p
-        LEFT JOIN categorias c ON p.cod_categoria = c.id_categoria
-        ORDER BY p.cantidad ASC
+    query, params = consulta_inventario(_filtros_inventario(), """
+        p.id_producto, p.nombre, COALESCE(c.nombre_categoria, 'N/A') AS nombre_categoria,
+        CASE WHEN p.cantidad = 0 THEN 'SIN STOCK'
+             WHEN p.cantidad < 5 THEN 'STOCK BAJO' ELSE '' END AS estado_stock,
+        p.cantidad, p.precio, COALESCE(p.cantidad * p.precio, 0) AS valor
     """)
-    productos = cursor.fetchall()
-    cursor.close()
-    conexion.close()
-
-    # Crear PDF
-    pdf = FPDF()
-    pdf.add_page()
-    pdf.set_font("Arial", 'B', 16)
-    pdf.cell(0, 10, "Reporte de Inventario - Parrilla 51", ln=True, align="C")
-    pdf.set_font("Arial", size=10)
-    pdf.cell(0, 10, f"Generado: {datetime.now().strftime('%d/%m/%Y %H:%M')}", ln=True, align="C")
-    pdf.ln(5)
-
-    valor_total = 0
-    
-    for producto in productos:
-        stock_status = ""
-        if producto['cantidad'] == 0:
-            stock_status = "[SIN STOCK]"
-        elif producto['cantidad'] < 5:
-            stock_status = "[STOCK BAJO]"
-        
-        texto = (
-            f"{stock_status} ID: {producto['id_producto']} | "
-            f"{producto['nombre']} | "
-            f"Stock: {producto['cantidad']} | "
-            f"Precio: ${producto['precio']:,.0f} | "
-            f"Categoria: {producto['nombre_categoria'] or 'N/A'}"
-        )
-        pdf.set_font("Arial", size=9)
-        pdf.multi_cell(0, 6, texto.encode('latin-1', 'replace').decode('latin-1'))
-        pdf.ln(2)
-        valor_total += (producto['cantidad'] * producto['precio']) if producto['cantidad'] and producto['precio'] else 0
-
-    pdf.ln(5)
-    pdf.set_font("Arial", 'B', 12)
-    pdf.cell(0, 10, f"Valor Total del Inventario: ${valor_total:,.0f}", ln=True, align="R")
-
-    # Generar PDF en memoria
-    salida = BytesIO()
-    pdf_bytes = pdf.output(dest='S').encode('latin1')
-    salida.write(pdf_bytes)
-    salida.seek(0)
 
-    return send_file(
-        salida,
-        as_attachment=True,
-        download_name=f"reporte_inventario_{datetime.now().strftime('%Y%m%d')}.pdf",
-        mimetype="application/pdf"
-    )
\ No newline at end of file
+    return _encolar_exportacion({
+        "formato": "pdf", "query": query, "params": params,
+        "columnas": COLUMNAS_INVENTARIO_PDF, "titulo": "Reporte de Inventario", "sumar": ["valor"],
+        "etiqueta_total": "Valor total del inventario",
+        "nombre_descarga": exportes.nombre_archivo("reporte_inventario", "pdf"),
+    })
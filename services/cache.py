@@ -0,0 +1,176 @@
+"""
+Caché en memoria de resultados, invalidada por versión de datos.
+
+Cada tabla "cacheable" tiene un contador en `versiones_datos` que sube
+después de cada escritura (`invalidar`). Las llaves de la caché incluyen
+esas versiones, así una escritura hecha en cualquier worker deja
+inalcanzables las entradas viejas de todos los demás con una sola lectura
+por llave primaria.
+
+El contador nunca se toca dentro de la transacción de la escritura: es una
+fila por tabla, y bloquearla hasta el commit pondría en fila todos los
+checkouts y cobros de mesa. Un incremento perdido solo alarga lo que dura
+un dato viejo, y eso ya lo acota el TTL de cada caché.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+import MySQLdb
+from flask import current_app
+
+from __init__ import mysql
+from services.pedidos import placeholders
+
+
+# =====================
+# VERSIONES DE DATOS
+# =====================
+def versiones(cur, tablas):
+    """Tupla con la versión actual de cada tabla (0 si aún no tiene fila)"""
+    cur.execute(f"""
+        SELECT tabla, version FROM versiones_datos
+        WHERE tabla IN ({placeholders(tablas)})
+    """, list(tablas))
+    actuales = {fila['tabla']: fila['version'] for fila in cur.fetchall()}
+    return tuple(actuales.get(tabla, 0) for tabla in tablas)
+
+
+class _SubirVersiones:
+    """Tarea `al_confirmar`: sube las versiones en la misma conexión, ya confirmada su transacción"""
+
+    def __init__(self, tablas):
+        self.tablas = set(tablas)
+
+    def __call__(self, conn):
+        cur = conn.cursor()
+        try:
+            cur.executemany("""
+                INSERT INTO versiones_datos (tabla, version) VALUES (%s, 1)
+                ON DUPLICATE KEY UPDATE version = version + 1
+            """, [(tabla,) for tabla in sorted(self.tablas)])
+            conn.commit()
+        except MySQLdb.Error as e:
+            conn.rollback()
+            current_app.logger.warning("No se subió la versión de %s: %s", sorted(self.tablas), e)
+        finally:
+            cur.close()
+
+
+def invalidar(*tablas, conn=None):
+    """Marca las tablas como modificadas en la transacción en curso de `conn`.
+
+    La versión sube justo después del commit, en la misma conexión (por
+    defecto la del request) y en una sentencia corta; si la transacción se
+    revierte no sube nada.
+    """
+    conn = conn or mysql.connection
+    for tarea in conn.al_confirmar:
+        if isinstance(tarea, _SubirVersiones):
+            tarea.tablas.update(tablas)
+            return
+    conn.al_confirmar.append(_SubirVersiones(tablas))
+
+
+# =====================
+# CACHÉ LRU CON TTL Y SINGLE-FLIGHT
+# =====================
+class _Vuelo:
+    """Cálculo en curso de una llave; los demás hilos esperan su resultado"""
+
+    def __init__(self):
+        self.evento = threading.Event()
+        self.valor = None
+        self.error = None
+
+
+class CacheLRU:
+    """Caché acotada por número de entradas (LRU) y por tiempo (TTL), segura entre hilos.
+
+    Si varias peticiones piden la misma llave ausente al mismo tiempo, solo
+    una calcula; el resto espera ese resultado (hasta `espera` segundos).
+    """
+
+    def __init__(self, max_entradas=128, ttl=300, espera=30):
+        self.max_entradas = max_entradas
+        self.ttl = ttl
+        self.espera = espera
+        self._datos = OrderedDict()  # llave -> (expira, valor)
+        self._en_vuelo = {}
+        self._lock = threading.Lock()
+        self.aciertos = 0
+        self.fallos = 0
+        self.compartidos = 0
+
+    def obtener(self, llave, calcular):
+        with self._lock:
+            entrada = self._datos.get(llave)
+            if entrada and entrada[0] > time.monotonic():
+                self._datos.move_to_end(llave)
+                self.aciertos += 1
+                return entrada[1]
+            vuelo = self._en_vuelo.get(llave)
+            lider = vuelo is None
+            if lider:
+                vuelo = self._en_vuelo[llave] = _Vuelo()
+                self.fallos += 1
+            else:
+                self.compartidos += 1
+
+        if not lider:
+            if vuelo.evento.wait(self.espera):
+                if vuelo.error is not None:
+                    raise vuelo.error
+                return vuelo.valor
+            return calcular()
+
+        try:
+            vuelo.valor = calcular()
+            with self._lock:
+                self._datos[llave] = (time.monotonic() + self.ttl, vuelo.valor)
+                self._datos.move_to_end(llave)
+                while len(self._datos) > self.max_entradas:
+                    self._datos.popitem(last=False)
+            return vuelo.valor
+        except Exception as e:
+            vuelo.error = e
+            raise
+        finally:
+            with self._lock:
+                self._en_vuelo.pop(llave, None)
+            vuelo.evento.set()
+
+    def limpiar(self):
+        with self._lock:
+            self._datos.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entradas": len(self._datos),
+                "max_entradas": self.max_entradas,
+                "ttl": self.ttl,
+                "aciertos": self.aciertos,
+                "fallos": self.fallos,
+                "compartidos": self.compartidos,
+            }
+
+
+def normalizar(filtros):
+    """Filtros como tupla ordenada; el texto libre sin mayúsculas ni espacios repetidos"""
+    return tuple(sorted(
+        (clave, " ".join(valor.lower().split()) if isinstance(valor, str) else valor)
+        for clave, valor in filtros.items()
+    ))
+
+
+def cacheado(cache, nombre, tablas, filtros, calcular):
+    """Resultado de `calcular()` para (nombre, versiones de `tablas`, filtros normalizados)"""
+    with mysql.cursor() as cur:
+        llave = (nombre, versiones(cur, tablas), normalizar(filtros))
+    return cache.obtener(llave, calcular)
+
+
+# Resultados de las páginas de reportes (ventas, inventario)
+cache_reportes = CacheLRU(max_entradas=128, ttl=300)
+
@@ -0,0 +1,127 @@
+"""
+Carrito del cliente guardado en la sesión.
+
+En la sesión solo se guarda `{id_producto: cantidad}` (con las llaves como
+texto, por JSON); nombre y precio se toman del catálogo en memoria al
+mostrarlo, y el checkout vuelve a leer los precios de la base de datos.
+
+`cambiar()` valida contra el stock del catálogo en memoria (sin consultar
+MySQL) y devuelve solo la línea que cambió y los totales, que es lo que
+necesita la API JSON del carrito para actualizar la página en su lugar.
+"""
+from services import catalogo
+
+LLAVE = 'carrito'
+
+
+def cantidades(sesion):
+    """`{id_producto: cantidad}` del carrito; acepta el formato viejo (lista de líneas)"""
+    guardado = sesion.get(LLAVE) or {}
+    if isinstance(guardado, list):
+        pares = ((item.get('id_producto'), item.get('cantidad')) for item in guardado)
+    else:
+        pares = guardado.items()
+
+    resultado = {}
+    for id_producto, cantidad in pares:
+        try:
+            id_producto, cantidad = int(id_producto), int(cantidad)
+        except (TypeError, ValueError):
+            continue
+        if cantidad > 0:
+            resultado[id_producto] = resultado.get(id_producto, 0) + cantidad
+    return resultado
+
+
+def guardar(sesion, items):
+    if items:
+        sesion[LLAVE] = {str(id_producto): cantidad for id_producto, cantidad in items.items()}
+    else:
+        sesion.pop(LLAVE, None)
+
+
+def lineas(sesion, cat=None):
+    """Líneas para mostrar: `[{id_producto, nombre, precio, cantidad}]` y el total.
+
+    Los productos que ya no existen en el catálogo se omiten.
+    """
+    cat = cat or catalogo.obtener()
+    resultado = []
+    for id_producto, cantidad in cantidades(sesion).items():
+        producto = cat.por_id.get(id_producto)
+        if producto:
+            resultado.append({
+                'id_producto': id_producto,
+                'nombre': producto['nombre'],
+                'precio': producto['precio'] or 0,
+                'cantidad': cantidad,
+            })
+    total = sum(item['precio'] * item['cantidad'] for item in resultado)
+    return resultado, total
+
+
+def vaciar(sesion):
+    sesion.pop(LLAVE, None)
+
+
+def totales(items, cat):
+    """`(total, unidades)` de un `{id_producto: cantidad}` con precios del catálogo"""
+    total = unidades = 0
+    for id_producto, cantidad in items.items():
+        producto = cat.por_id.get(id_producto)
+        if producto:
+            total += (producto['precio'] or 0) * cantidad
+            unidades += cantidad
+    return total, unidades
+
+
+class ErrorCarrito(Exception):
+    """El cambio pedido no se puede aplicar (estado o stock); el mensaje es para el cliente"""
+
+
+class NoEncontrado(ErrorCarrito):
+    """El producto no existe en el catálogo o no está en el carrito"""
+
+
+def validar(producto, cantidad):
+    """Lanza ErrorCarrito si no se pueden dejar `cantidad` unidades de `producto`"""
+    if not producto:
+        raise NoEncontrado("⚠️ Producto no encontrado")
+    if producto['estado'] != 'Disponible':
+        raise ErrorCarrito(f"⚠️ {producto['nombre']} no está disponible actualmente")
+    if cantidad > (producto['cantidad'] or 0):
+        raise ErrorCarrito(f"⚠️ Stock insuficiente. Solo hay {producto['cantidad'] or 0} unidad(es) "
+                           f"disponibles de {producto['nombre']}")
+
+
+def cambiar(sesion, id_producto, cantidad, sumar=False, cat=None):
+    """Fija (o suma, con `sumar`) la cantidad de un producto; 0 lo quita.
+
+    Devuelve la línea cambiada (`None` si se quitó) y los totales del
+    carrito. Si lanza ErrorCarrito el carrito no se modifica.
+    """
+    cat = cat or catalogo.obtener()
+    items = cantidades(sesion)
+    producto = cat.por_id.get(id_producto)
+    if sumar:
+        cantidad += items.get(id_producto, 0)
+
+    if cantidad > 0:
+        validar(producto, cantidad)
+        items[id_producto] = cantidad
+    elif items.pop(id_producto, None) is None:
+        raise NoEncontrado("⚠️ Producto no encontrado en el carrito")
+    guardar(sesion, items)
+
+    linea = None
+    if cantidad > 0:
+        precio = producto['precio'] or 0
+        linea = {
+            'id_producto': id_producto,
+            'nombre': producto['nombre'],
+            'precio': precio,
+            'cantidad': cantidad,
+            'subtotal': precio * cantidad,
+        }
+    total, unidades = totales(items, cat)
+    return {'linea': linea, 'total': total, 'unidades': unidades}
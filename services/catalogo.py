@@ -0,0 +1,160 @@
+"""
+Catálogo de productos en memoria, versionado.
+
+Los listados (menú del cliente, carrito, calculadora de mesas, registro de
+pedidos del empleado, productos e inventario del admin) leen la misma foto
+del catálogo, ya agrupada y ordenada para cada uso. La foto se arma una vez
+por versión de `productos`/`categorias`: cualquier alta, edición, cambio de
+estado o descuento de stock llama `invalidar('productos')` y el
+siguiente request de cada worker la reconstruye.
+
+Las estructuras se comparten entre requests: son de solo lectura.
+
+`Catalogo.json()` sirve la API del catálogo (calculadora de mesas): el
+cuerpo de cada proyección/filtro se serializa una sola vez por versión y
+su ETag fuerte sale de la versión, así un cliente al día recibe 304.
+"""
+import hashlib
+import json
+from collections import defaultdict
+
+from __init__ import mysql
+from services.cache import CacheLRU, versiones
+
+TABLAS_CATALOGO = ('productos', 'categorias')
+
+# Una entrada por versión; el TTL solo cubre escrituras hechas por fuera de la app
+cache_catalogo = CacheLRU(max_entradas=2, ttl=3600)
+
+# Campos que expone la API, en el orden en que se devuelven
+CAMPOS_API = ('id_producto', 'nombre', 'precio', 'descripcion', 'imagen',
+              'cantidad', 'estado', 'id_categoria', 'nombre_categoria')
+
+# Cuerpos JSON guardados por versión (combinaciones de campos y categorías)
+MAX_CUERPOS_JSON = 64
+
+
+def proyeccion(texto):
+    """`"nombre,precio"` -> tupla en el orden de CAMPOS_API; vacío = todos.
+
+    Lanza ValueError con los campos desconocidos.
+    """
+    if not texto:
+        return CAMPOS_API
+    pedidos = {c.strip() for c in texto.split(",") if c.strip()}
+    desconocidos = pedidos - set(CAMPOS_API)
+    if desconocidos:
+        raise ValueError(", ".join(sorted(desconocidos)))
+    # id_producto siempre va: es la llave con la que el cliente agrega a la orden
+    return tuple(c for c in CAMPOS_API if c in pedidos or c == 'id_producto')
+
+
+def _disponible(producto):
+    return producto['estado'] == 'Disponible' and (producto['cantidad'] or 0) > 0
+
+
+def _llave_categoria(nombre):
+    # Como la collation de MySQL: sin distinguir mayúsculas ni espacios sobrantes
+    return (nombre or '').strip().casefold()
+
+
+def _por_cantidad(producto):
+    # Igual que ORDER BY cantidad ASC en MySQL: los NULL primero
+    return (producto['cantidad'] is not None, producto['cantidad'] or 0)
+
+
+class Catalogo:
+    """Foto del catálogo para una versión de productos y categorías"""
+
+    def __init__(self, version, categorias, productos):
+        self.version = version
+        self._json = {}
+        self.categorias = tuple(categorias)
+        self.categorias_por_nombre = tuple(
+            sorted(categorias, key=lambda c: (c['nombre_categoria'] or '').lower())
+        )
+        self.productos = tuple(productos)
+        self.por_id = {p['id_producto']: p for p in productos}
+
+        self.disponibles = tuple(sorted(
+            (p for p in productos if _disponible(p)),
+            key=lambda p: ((p['nombre_categoria'] or '').lower(), (p['nombre'] or '').lower())
+        ))
+        por_categoria = defaultdict(list)
+        por_nombre_categoria = defaultdict(list)
+        for p in self.disponibles:
+            por_categoria[p['id_categoria']].append(p)
+            por_nombre_categoria[_llave_categoria(p['nombre_categoria'])].append(p)
+        self.disponibles_por_categoria = {k: tuple(v) for k, v in por_categoria.items()}
+        self.disponibles_por_nombre_categoria = {k: tuple(v) for k, v in por_nombre_categoria.items()}
+
+        # Órdenes de los listados del admin
+        self.por_stock = tuple(sorted(productos, key=_por_cantidad))
+        self.para_admin = tuple(sorted(
+            productos, key=lambda p: (p['estado'] != 'No disponible', _por_cantidad(p))
+        ))
+
+    def disponibles_de(self, nombre_categoria):
+        return self.disponibles_por_nombre_categoria.get(_llave_categoria(nombre_categoria), ())
+
+    # =====================
+    # API JSON
+    # =====================
+    def etag(self, campos, categorias=None):
+        """ETag fuerte: misma versión, proyección y filtro => mismos bytes"""
+        llave = repr((self.version, campos, categorias)).encode()
+        return hashlib.sha1(llave).hexdigest()[:20]
+
+    def json(self, campos, categorias=None):
+        """Cuerpo JSON de los productos disponibles, serializado una vez por versión.
+
+        `campos` viene de `proyeccion()`; `categorias` es una tupla ordenada de
+        ids o None para todas.
+        """
+        llave = (campos, categorias)
+        cuerpo = self._json.get(llave)
+        if cuerpo is not None:
+            return cuerpo
+
+        if categorias is None:
+            lista_categorias = self.categorias
+            productos = self.disponibles
+        else:
+            lista_categorias = [c for c in self.categorias if c['id_categoria'] in categorias]
+            productos = [p for c in categorias for p in self.disponibles_por_categoria.get(c, ())]
+        cuerpo = json.dumps({
+            'version': "-".join(str(v) for v in self.version),
+            'categorias': [
+                {'id_categoria': c['id_categoria'], 'nombre_categoria': c['nombre_categoria']}
+                for c in lista_categorias
+            ],
+            'productos': [{campo: p[campo] for campo in campos} for p in productos],
+        }, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+        if len(self._json) >= MAX_CUERPOS_JSON:
+            self._json.clear()
+        self._json[llave] = cuerpo
+        return cuerpo
+
+
+def _cargar(cur, version):
+    cur.execute("SELECT id_categoria, nombre_categoria FROM categorias ORDER BY id_categoria")
+    categorias = [dict(c) for c in cur.fetchall()]
+
+    cur.execute("""
+        SELECT p.id_producto, p.nombre, p.cantidad, p.descripcion, p.precio,
+               p.fecha_vencimiento, p.fecha_lote, p.cod_categoria,
+               p.cod_categoria AS id_categoria, p.imagen, p.estado, c.nombre_categoria
+        FROM productos p
+        LEFT JOIN categorias c ON p.cod_categoria = c.id_categoria
+        ORDER BY p.id_producto
+    """)
+    productos = [dict(p) for p in cur.fetchall()]
+    return Catalogo(version, categorias, productos)
+
+
+def obtener():
+    """Catálogo vigente; cuesta una lectura de `versiones_datos` si ya está en memoria"""
+    with mysql.cursor() as cur:
+        version = versiones(cur, TABLAS_CATALOGO)
+        return cache_catalogo.obtener(version, lambda: _cargar(cur, version))
@@ -0,0 +1,112 @@
+"""
+Indicadores del tablero de administración.
+
+Todos los KPI salen de una sola consulta agregada (más la lista corta de
+alertas) y se guardan en una caché de TTL corto. La llave incluye la
+versión de las tablas involucradas y la fecha, así una escritura de stock,
+pedidos, mesas o reservas invalida el snapshot de inmediato y el cambio de
+día también; consultar el tablero sin cambios cuesta una lectura por llave
+primaria.
+"""
+import hashlib
+import json
+from datetime import date
+
+from __init__ import mysql
+from services.cache import CacheLRU, versiones
+from services.filtros import ESTADOS_PEDIDO
+
+TABLAS_DASHBOARD = ('pedidos', 'productos', 'mesas', 'reservas', 'pagos_restaurante')
+
+# Umbral de "stock bajo", el mismo de los triggers de alertas
+STOCK_BAJO = 5
+LIMITE_ALERTAS = 10
+
+cache_dashboard = CacheLRU(max_entradas=4, ttl=30)
+
+
+def _columnas_estados():
+    return ",\n".join(
+        f"COALESCE(SUM(CASE WHEN estado = %s THEN num_pedidos END), 0) AS estado_{i}"
+        for i in range(len(ESTADOS_PEDIDO))
+    )
+
+
+def _calcular(cur, hoy):
+    cur.execute(f"""
+        SELECT v.*, pm.*, s.*, m.*, r.*
+        FROM (
+            SELECT COALESCE(SUM(num_pedidos), 0) AS pedidos_hoy,
+                   COALESCE(SUM(CASE WHEN estado <> 'cancelado' THEN total END), 0) AS ingresos_online,
+                   {_columnas_estados()}
+            FROM ventas_diarias
+            WHERE fecha = %s
+        ) AS v
+        CROSS JOIN (
+            SELECT COUNT(*) AS pagos_mesa, COALESCE(SUM(total), 0) AS ingresos_mesa
+            FROM pagos_restaurante
+            WHERE fecha = %s
+        ) AS pm
+        CROSS JOIN (
+            SELECT COALESCE(SUM(cantidad > 0 AND cantidad < %s), 0) AS stock_bajo,
+                   COALESCE(SUM(cantidad = 0), 0) AS sin_stock
+            FROM productos
+            WHERE estado = 'Disponible'
+        ) AS s
+        CROSS JOIN (
+            SELECT COUNT(*) AS mesas_total,
+                   COALESCE(SUM(estado = 'ocupada'), 0) AS mesas_ocupadas
+            FROM mesas
+        ) AS m
+        CROSS JOIN (
+            SELECT COUNT(*) AS reservas_hoy,
+                   COALESCE(SUM(estado = 'Pendiente'), 0) AS reservas_pendientes
+            FROM reservas
+            WHERE fecha = %s
+        ) AS r
+    """, list(ESTADOS_PEDIDO) + [hoy, hoy, STOCK_BAJO, hoy])
+    fila = cur.fetchone()
+
+    cur.execute("""
+        SELECT id_alerta, mensaje, fecha, tipo FROM alertas
+        WHERE tipo IN ('stock', 'producto')
+        ORDER BY fecha DESC
+        LIMIT %s
+    """, (LIMITE_ALERTAS,))
+    alertas = [
+        dict(a, fecha=a['fecha'].strftime("%Y-%m-%d %H:%M") if a['fecha'] else None)
+        for a in cur.fetchall()
+    ]
+
+    ingresos_online = float(fila['ingresos_online'])
+    ingresos_mesa = float(fila['ingresos_mesa'])
+    return {
+        'fecha': hoy.isoformat(),
+        'ingresos_hoy': ingresos_online + ingresos_mesa,
+        'ingresos_online': ingresos_online,
+        'ingresos_mesa': ingresos_mesa,
+        'pedidos_hoy': int(fila['pedidos_hoy']),
+        'pedidos_por_estado': {
+            estado: int(fila[f'estado_{i}']) for i, estado in enumerate(ESTADOS_PEDIDO)
+        },
+        'pagos_mesa': int(fila['pagos_mesa']),
+        'stock_bajo': int(fila['stock_bajo']),
+        'sin_stock': int(fila['sin_stock']),
+        'mesas_ocupadas': int(fila['mesas_ocupadas']),
+        'mesas_total': int(fila['mesas_total']),
+        'reservas_hoy': int(fila['reservas_hoy']),
+        'reservas_pendientes': int(fila['reservas_pendientes']),
+        'alertas': alertas,
+    }
+
+
+def _con_etag(datos):
+    return datos, hashlib.sha1(json.dumps(datos, sort_keys=True).encode()).hexdigest()[:16]
+
+
+def snapshot():
+    """KPI del tablero: `(datos, etag)`; el etag es un hash del contenido"""
+    hoy = date.today()
+    with mysql.cursor() as cur:
+        llave = ('dashboard', versiones(cur, TABLAS_DASHBOARD), hoy)
+        return cache_dashboard.obtener(llave, lambda: _con_etag(_calcular(cur, hoy)))
@@ -0,0 +1,294 @@
+"""
+Pool de conexiones MySQL compartido por todos los blueprints.
+
+`PooledMySQL` reemplaza al `MySQL` de flask_mysqldb: `mysql.connection`
+sigue funcionando igual en las rutas, pero la conexión se toma de un pool
+por proceso en lugar de abrirse en cada contexto de aplicación.
+"""
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import MySQLdb
+import MySQLdb.connections
+import MySQLdb.cursors
+from flask import current_app, g, has_app_context
+from flask_mysqldb import MySQL
+
+
+class PoolAgotado(Exception):
+    """No hubo una conexión libre dentro del tiempo de espera del pool"""
+
+
+# =====================
+# CONEXIÓN
+# =====================
+class ConexionPool(MySQLdb.connections.Connection):
+    """Conexión con tareas para después del próximo commit (`al_confirmar`).
+
+    Las tareas reciben la conexión y corren con la transacción ya
+    confirmada; un rollback (también el que hace el pool al devolverla)
+    las descarta.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.al_confirmar = []
+
+    def commit(self):
+        super().commit()
+        tareas, self.al_confirmar = self.al_confirmar, []
+        for tarea in tareas:
+            tarea(self)
+
+    def rollback(self):
+        self.al_confirmar = []
+        super().rollback()
+
+
+# =====================
+# POOL DE CONEXIONES
+# =====================
+class ConnectionPool:
+    """Pool acotado de conexiones MySQLdb, seguro entre hilos."""
+
+    def __init__(self, connect_kwargs, size=5, timeout=10, ping_interval=30):
+        self.connect_kwargs = connect_kwargs
+        self.size = size
+        self.timeout = timeout
+        self.ping_interval = ping_interval
+
+        self._cond = threading.Condition()
+        self._idle = []  # [(conexion, ultimo_uso)]
+        self._creadas = 0
+        self._en_uso = 0
+        self._esperando = 0
+
+        self._checkouts = 0
+        self._espera_total = 0.0
+        self._espera_max = 0.0
+        self._reconexiones = 0
+        self._timeouts = 0
+
+    def _nueva(self):
+        return ConexionPool(**self.connect_kwargs)
+
+    @staticmethod
+    def _cerrar(conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def acquire(self):
+        """Entrega una conexión sana; espera hasta `timeout` si el pool está lleno."""
+        inicio = time.monotonic()
+        limite = inicio + self.timeout
+
+        with self._cond:
+            self._esperando += 1
+            try:
+                while not self._idle and self._creadas >= self.size:
+                    restante = limite - time.monotonic()
+                    if restante <= 0:
+                        self._timeouts += 1
+                        raise PoolAgotado(
+                            f"Sin conexiones libres tras {self.timeout}s (pool de {self.size})"
+                        )
+                    self._cond.wait(restante)
+
+                if self._idle:
+                    conn, ultimo_uso = self._idle.pop()
+                else:
+                    conn, ultimo_uso = None, 0.0
+                    self._creadas += 1
+                self._en_uso += 1
+            finally:
+                self._esperando -= 1
+
+        try:
+            conn = self._verificar(conn, ultimo_uso)
+        except Exception:
+            with self._cond:
+                self._en_uso -= 1
+                self._creadas -= 1
+                self._cond.notify()
+            raise
+
+        espera = time.monotonic() - inicio
+        with self._cond:
+            self._checkouts += 1
+            self._espera_total += espera
+            self._espera_max = max(self._espera_max, espera)
+        return conn
+
+    def _verificar(self, conn, ultimo_uso):
+        """Health-check al momento del checkout; reconecta si el servidor cortó."""
+        if conn is None:
+            return self._nueva()
+
+        if time.monotonic() - ultimo_uso >= self.ping_interval:
+            try:
+                conn.ping()
+            except MySQLdb.Error:
+                self._cerrar(conn)
+                with self._cond:
+                    self._reconexiones += 1
+                return self._nueva()
+        return conn
+
+    def release(self, conn, descartar=False):
+        """Devuelve la conexión al pool, deshaciendo cualquier transacción abierta."""
+        if not descartar:
+            try:
+                conn.rollback()
+            except MySQLdb.Error:
+                descartar = True
+
+        with self._cond:
+            self._en_uso -= 1
+            if descartar:
+                self._creadas -= 1
+            else:
+                self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+
+        if descartar:
+            self._cerrar(conn)
+
+    @contextmanager
+    def connection(self):
+        conn = self.acquire()
+        descartar = False
+        try:
+            yield conn
+        except MySQLdb.OperationalError:
+            descartar = True
+            raise
+        finally:
+            self.release(conn, descartar=descartar)
+
+    def close_all(self):
+        with self._cond:
+            idle, self._idle = self._idle, []
+            self._creadas -= len(idle)
+        for conn, _ in idle:
+            self._cerrar(conn)
+
+    def stats(self):
+        with self._cond:
+            promedio = self._espera_total / self._checkouts if self._checkouts else 0.0
+            return {
+                "tamano": self.size,
+                "abiertas": self._creadas,
+                "en_uso": self._en_uso,
+                "libres": len(self._idle),
+                "esperando": self._esperando,
+                "checkouts": self._checkouts,
+                "espera_promedio_ms": round(promedio * 1000, 3),
+                "espera_max_ms": round(self._espera_max * 1000, 3),
+                "reconexiones": self._reconexiones,
+                "timeouts": self._timeouts,
+            }
+
+
+def _connect_kwargs(config):
+    """Traduce la configuración MYSQL_* de flask_mysqldb a argumentos de MySQLdb.connect"""
+    kwargs = {}
+    mapeo = {
+        "MYSQL_HOST": "host",
+        "MYSQL_USER": "user",
+        "MYSQL_PASSWORD": "passwd",
+        "MYSQL_DB": "db",
+        "MYSQL_PORT": "port",
+        "MYSQL_UNIX_SOCKET": "unix_socket",
+        "MYSQL_CONNECT_TIMEOUT": "connect_timeout",
+        "MYSQL_READ_DEFAULT_FILE": "read_default_file",
+        "MYSQL_USE_UNICODE": "use_unicode",
+        "MYSQL_CHARSET": "charset",
+        "MYSQL_SQL_MODE": "sql_mode",
+    }
+    for clave, argumento in mapeo.items():
+        valor = config.get(clave)
+        if valor is not None:
+            kwargs[argumento] = valor
+
+    cursorclass = config.get("MYSQL_CURSORCLASS")
+    if cursorclass:
+        kwargs["cursorclass"] = getattr(MySQLdb.cursors, cursorclass)
+
+    if config.get("MYSQL_AUTOCOMMIT"):
+        kwargs["autocommit"] = True
+
+    if config.get("MYSQL_CUSTOM_OPTIONS"):
+        kwargs.update(config["MYSQL_CUSTOM_OPTIONS"])
+
+    return kwargs
+
+
+# =====================
+# EXTENSIÓN FLASK
+# =====================
+class PooledMySQL(MySQL):
+    """`MySQL` de flask_mysqldb respaldado por un `ConnectionPool` por proceso."""
+
+    def __init__(self, app=None):
+        self._pool = None
+        self._pool_pid = None
+        self._pool_lock = threading.Lock()
+        super().__init__(app)
+
+    def init_app(self, app):
+        app.config.setdefault("MYSQL_POOL_SIZE", 5)
+        app.config.setdefault("MYSQL_POOL_TIMEOUT", 10)
+        app.config.setdefault("MYSQL_POOL_PING_INTERVAL", 30)
+        super().init_app(app)
+
+    @property
+    def pool(self):
+        # Cada worker (proceso) necesita su propio pool: las conexiones no sobreviven a un fork
+        if self._pool is None or self._pool_pid != os.getpid():
+            with self._pool_lock:
+                if self._pool is None or self._pool_pid != os.getpid():
+                    config = current_app.config
+                    self._pool = ConnectionPool(
+                        _connect_kwargs(config),
+                        size=config["MYSQL_POOL_SIZE"],
+                        timeout=config["MYSQL_POOL_TIMEOUT"],
+                        ping_interval=config["MYSQL_POOL_PING_INTERVAL"],
+                    )
+                    self._pool_pid = os.getpid()
+        return self._pool
+
+    @property
+    def connection(self):
+        if not has_app_context():
+            return None
+        if "_mysql_pool_conn" not in g:
+            g._mysql_pool_conn = self.pool.acquire()
+        return g._mysql_pool_conn
+
+    def teardown(self, exception):
+        conn = g.pop("_mysql_pool_conn", None)
+        if conn is not None:
+            self.pool.release(conn, descartar=isinstance(exception, MySQLdb.OperationalError))
+
+    @contextmanager
+    def cursor(self, commit=False):
+        """Cursor que siempre se cierra; con `commit=True` confirma o revierte al salir."""
+        conn = self.connection
+        cur = conn.cursor()
+        try:
+            yield cur
+            if commit:
+                conn.commit()
+        except Exception:
+            if commit:
+                conn.rollback()
+            raise
+        finally:
+            cur.close()
+
+    def stats(self):
+        return self.pool.stats()
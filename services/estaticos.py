@@ -0,0 +1,279 @@
+"""
+Archivos estáticos con huella de contenido y caché permanente.
+
+`flask --app app estaticos construir` copia cada archivo de `static/` a
+`static/dist/` con el hash del contenido en el nombre
+(`css/global.css` -> `dist/css/global.1a2b3c4d.css`), genera variantes
+`.gz` (y `.br` si está instalado `brotli`) de los archivos de texto y
+escribe `static/dist/manifest.json`.
+
+Con el manifiesto presente, `url_for('static', filename=...)` devuelve la
+ruta con huella sin tocar las plantillas, y esos archivos se sirven con
+`Cache-Control: immutable` de un año y en la variante comprimida que el
+navegador acepte: una visita repetida no descarga nada de `static/`.
+Sin manifiesto (o en modo debug) todo funciona como el handler de Flask.
+"""
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import posixpath
+import re
+import shutil
+import threading
+
+import click
+from flask import current_app, request, send_from_directory, url_for
+
+try:
+    import brotli
+except ImportError:  # solo se generan variantes gzip
+    brotli = None
+
+CARPETA_DIST = 'dist'
+MANIFIESTO = 'manifest.json'
+# Todo lo que está aquí lleva el hash en el nombre (imagenes.py genera img/variantes)
+CARPETAS_CON_HUELLA = (CARPETA_DIST + '/', 'img/variantes/')
+
+UN_ANIO = 365 * 24 * 3600
+COMPRIMIBLES = ('.css', '.js', '.svg', '.json', '.txt', '.map', '.html')
+# Solo se guarda la variante comprimida si ahorra al menos esto
+AHORRO_MINIMO = 0.9
+CODIFICACIONES = (('br', '.br'), ('gzip', '.gz'))
+
+_URL_CSS = re.compile(r"""url\(\s*(['"]?)([^'")]+)\1\s*\)""")
+
+
+def _static():
+    return current_app.static_folder
+
+
+def _ruta_manifiesto(static):
+    return os.path.join(static, CARPETA_DIST, MANIFIESTO)
+
+
+# =====================
+# MANIFIESTO (recargado cuando cambia en disco)
+# =====================
+class _Manifiesto:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._mtime = None
+        self._datos = {}
+
+    def _cargar(self, static):
+        ruta = _ruta_manifiesto(static)
+        try:
+            mtime = os.stat(ruta).st_mtime_ns
+        except OSError:
+            self._mtime, self._datos = None, {}
+            return
+        if mtime != self._mtime:
+            with self._lock:
+                if mtime != self._mtime:
+                    try:
+                        with open(ruta, encoding='utf-8') as f:
+                            self._datos = json.load(f).get('archivos', {})
+                    except (OSError, ValueError):
+                        self._datos = {}
+                    self._mtime = mtime
+
+    def archivos(self, static):
+        self._cargar(static)
+        return self._datos
+
+
+_manifiesto = _Manifiesto()
+
+
+# =====================
+# CONSTRUCCIÓN
+# =====================
+def _hash(contenido):
+    return hashlib.sha256(contenido).hexdigest()[:10]
+
+
+def _con_huella(relativa, firma):
+    base, ext = posixpath.splitext(relativa)
+    return f"{CARPETA_DIST}/{base}.{firma}{ext}"
+
+
+def _reescribir_css(contenido, relativa, archivos):
+    """Apunta los `url(...)` relativos del CSS a las copias con huella"""
+    carpeta = posixpath.dirname(relativa)
+    destino_css = posixpath.dirname(_con_huella(relativa, ''))
+
+    def reemplazar(m):
+        comilla, url = m.group(1), m.group(2).strip()
+        if url.startswith(('data:', 'http:', 'https:', '//', '/', '#')):
+            return m.group(0)
+        ruta, sufijo = re.match(r"([^?#]*)(.*)", url).groups()
+        objetivo = posixpath.normpath(posixpath.join(carpeta, ruta))
+        if objetivo not in archivos:
+            return m.group(0)
+        nueva = posixpath.relpath(archivos[objetivo], destino_css)
+        return f"url({comilla}{nueva}{sufijo}{comilla})"
+
+    return _URL_CSS.sub(reemplazar, contenido.decode('utf-8')).encode('utf-8')
+
+
+def _comprimir(ruta, contenido):
+    escritos = [ruta]
+    variantes = [('.gz', gzip.compress(contenido, compresslevel=9, mtime=0))]
+    if brotli is not None:
+        variantes.append(('.br', brotli.compress(contenido, quality=11)))
+    for extension, comprimido in variantes:
+        if len(comprimido) < len(contenido) * AHORRO_MINIMO:
+            with open(ruta + extension, 'wb') as f:
+                f.write(comprimido)
+            escritos.append(ruta + extension)
+    return escritos
+
+
+def _copiar(origen, destino, contenido, identico):
+    if identico:
+        try:
+            os.link(origen, destino)  # sin duplicar las imágenes en disco
+            return
+        except OSError:
+            pass
+    with open(destino, 'wb') as f:
+        f.write(contenido)
+
+
+def _originales(static):
+    for raiz, carpetas, nombres in os.walk(static):
+        relativa_raiz = os.path.relpath(raiz, static).replace(os.sep, '/')
+        relativa_raiz = '' if relativa_raiz == '.' else relativa_raiz + '/'
+        # No volver a procesar lo que ya tiene huella
+        carpetas[:] = [c for c in carpetas if not (relativa_raiz + c + '/').startswith(CARPETAS_CON_HUELLA)]
+        for nombre in nombres:
+            if not nombre.startswith('.'):
+                yield relativa_raiz + nombre
+
+
+def construir(static):
+    """Genera `static/dist` y su manifiesto; devuelve `(archivos, comprimidos)`"""
+    dist = os.path.join(static, CARPETA_DIST)
+    anterior = _manifiesto.archivos(static)
+    archivos = {}
+    escritos = set()
+    comprimidos = 0
+
+    # El CSS al final: sus url(...) necesitan las huellas del resto
+    relativas = sorted(_originales(static), key=lambda r: (r.endswith('.css'), r))
+    for relativa in relativas:
+        origen = os.path.join(static, relativa)
+        with open(origen, 'rb') as f:
+            contenido = f.read()
+        if relativa.endswith('.css'):
+            contenido = _reescribir_css(contenido, relativa, archivos)
+
+        con_huella = _con_huella(relativa, _hash(contenido))
+        archivos[relativa] = con_huella
+        destino = os.path.normpath(os.path.join(static, con_huella))
+        os.makedirs(os.path.dirname(destino), exist_ok=True)
+        if not os.path.exists(destino):
+            _copiar(origen, destino, contenido, identico=not relativa.endswith('.css'))
+        if relativa.lower().endswith(COMPRIMIBLES):
+            generados = _comprimir(destino, contenido)
+            comprimidos += len(generados) - 1
+            escritos.update(generados)
+        else:
+            escritos.add(destino)
+
+    # Se conservan también las huellas del build anterior: páginas ya
+    # servidas (o cacheadas) pueden seguir pidiéndolas durante el despliegue
+    for con_huella in anterior.values():
+        for extension in ('', '.gz', '.br'):
+            escritos.add(os.path.normpath(os.path.join(static, con_huella)) + extension)
+    for raiz, _, nombres in os.walk(dist):
+        for nombre in nombres:
+            ruta = os.path.join(raiz, nombre)
+            if nombre != MANIFIESTO and ruta not in escritos:
+                os.remove(ruta)
+
+    temporal = _ruta_manifiesto(static) + f".{os.getpid()}.tmp"
+    with open(temporal, 'w', encoding='utf-8') as f:
+        json.dump({'archivos': archivos}, f, indent=1, sort_keys=True)
+    os.replace(temporal, _ruta_manifiesto(static))
+    return len(archivos), comprimidos
+
+
+def limpiar(static):
+    shutil.rmtree(os.path.join(static, CARPETA_DIST), ignore_errors=True)
+
+
+# =====================
+# URLS Y SERVIDOR
+# =====================
+def _activo(app):
+    return app.config['ESTATICOS_HUELLA'] and not app.debug
+
+
+def _url_con_huella(endpoint, values):
+    """`url_defaults`: cambia `filename` por su copia con huella"""
+    if endpoint != 'static' or 'filename' not in values or not _activo(current_app):
+        return
+    con_huella = _manifiesto.archivos(_static()).get(values['filename'])
+    if con_huella:
+        values['filename'] = con_huella
+
+
+def asset(filename):
+    """Como `url_for('static', filename=...)`; para usar desde JS o plantillas"""
+    return url_for('static', filename=filename)
+
+
+def servir_estatico(filename):
+    """Reemplaza la vista `static`: inmutable y precomprimido para lo que tiene huella"""
+    static = _static()
+    if not (_activo(current_app) and filename.startswith(CARPETAS_CON_HUELLA)):
+        return current_app.send_static_file(filename)
+
+    tipo = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    archivo, codificacion = filename, None
+    for nombre, extension in CODIFICACIONES:
+        if (request.accept_encodings[nombre] and
+                os.path.isfile(os.path.join(static, filename + extension))):
+            archivo, codificacion = filename + extension, nombre
+            break
+
+    resp = send_from_directory(static, archivo, mimetype=tipo, max_age=UN_ANIO)
+    resp.cache_control.public = True
+    resp.cache_control.immutable = True
+    if codificacion:
+        resp.headers['Content-Encoding'] = codificacion
+    if filename.lower().endswith(COMPRIMIBLES):
+        resp.vary.add('Accept-Encoding')
+    return resp
+
+
+# =====================
+# CLI
+# =====================
+@click.group("estaticos")
+def estaticos_cli():
+    """Huellas y compresión de static/"""
+
+
+@estaticos_cli.command("construir")
+def construir_cmd():
+    archivos, comprimidos = construir(_static())
+    click.echo(f"Archivos con huella: {archivos}, variantes comprimidas: {comprimidos}"
+               + ("" if brotli else " (sin brotli: pip install brotli)"))
+
+
+@estaticos_cli.command("limpiar")
+def limpiar_cmd():
+    limpiar(_static())
+    click.echo("static/dist eliminado")
+
+
+def init_app(app):
+    app.config.setdefault('ESTATICOS_HUELLA', True)
+    app.url_defaults(_url_con_huella)
+    app.view_functions['static'] = servir_estatico
+    app.add_template_global(asset)
+    app.cli.add_command(estaticos_cli)
@@ -0,0 +1,358 @@
+"""
+Motor de exportación de reportes con memoria acotada.
+
+Las filas se leen con un cursor del lado del servidor (`SSDictCursor`) en
+lotes de `LOTE_FILAS` y se escriben con el modo write-only de openpyxl a un
+archivo temporal que solo pasa a disco si crece; la respuesta envía el
+archivo por partes. Ni el resultado completo ni el libro completo quedan
+en memoria.
+"""
+import csv
+import io
+import zlib
+from collections import namedtuple
+from datetime import date, datetime, time, timedelta
+from tempfile import SpooledTemporaryFile
+
+import MySQLdb.cursors
+from fpdf import FPDF
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font, PatternFill
+from openpyxl.utils import get_column_letter
+
+from __init__ import mysql
+
+LOTE_FILAS = 2000
+
+# Hasta este tamaño el archivo temporal vive en memoria; después pasa a disco
+MAX_MEMORIA_TEMPORAL = 8 * 1024 * 1024
+
+MIMETYPE_XLSX = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+MIMETYPE_CSV = "text/csv; charset=utf-8"
+MIMETYPE_GZIP = "application/gzip"
+MIMETYPE_PDF = "application/pdf"
+
+# `clave` es la columna del SELECT; `tipo` decide la conversión y el formato.
+# `ancho` va en caracteres para Excel y en milímetros para PDF.
+Columna = namedtuple("Columna", "titulo clave tipo ancho")
+
+FORMATOS = {
+    'entero': '0',
+    'moneda': '"$"#,##0',
+    'decimal': '#,##0.00',
+    'fecha': 'yyyy-mm-dd',
+    'hora': 'hh:mm:ss',
+    'texto': '@',
+}
+
+
+# =====================
+# LECTURA POR LOTES
+# =====================
+def iterar_filas(consulta, params=(), lote=LOTE_FILAS):
+    """Recorre el resultado sin cargarlo completo.
+
+    Usa una conexión propia del pool: un cursor del lado del servidor
+    bloquea su conexión hasta que se consume, y la del request puede
+    seguir necesitándose.
+    """
+    with mysql.pool.connection() as conn:
+        yield from filas_de_conexion(conn, consulta, params, lote)
+
+
+def filas_de_conexion(conn, consulta, params=(), lote=LOTE_FILAS):
+    """Igual que `iterar_filas` pero sobre una conexión dada (trabajos en segundo plano)"""
+    cur = conn.cursor(MySQLdb.cursors.SSDictCursor)
+    try:
+        cur.execute(consulta, params)
+        while True:
+            filas = cur.fetchmany(lote)
+            if not filas:
+                break
+            yield from filas
+    finally:
+        cur.close()
+
+
+def convertir(valor, tipo):
+    """Normaliza lo que entrega MySQLdb al tipo de la columna"""
+    if valor is None:
+        return None
+    if tipo == 'hora' and isinstance(valor, timedelta):
+        # MySQLdb entrega TIME como timedelta
+        segundos = int(valor.total_seconds()) % 86400
+        return time(segundos // 3600, segundos % 3600 // 60, segundos % 60)
+    if tipo == 'entero' and not isinstance(valor, int):
+        return int(valor)
+    if tipo in ('moneda', 'decimal') and not isinstance(valor, (int, float)):
+        # DECIMAL llega como Decimal
+        return float(valor)
+    if tipo == 'fecha' and isinstance(valor, datetime):
+        return valor.date()
+    if tipo == 'texto' and not isinstance(valor, str):
+        return str(valor)
+    return valor
+
+
+# =====================
+# EXCEL
+# =====================
+def escribir_excel(columnas, filas, hoja="Reporte", destino=None):
+    """Escribe `filas` (iterable de dicts) en un .xlsx.
+
+    Sin `destino` usa un archivo temporal y lo devuelve posicionado al inicio.
+    """
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(title=hoja)
+
+    for i, columna in enumerate(columnas, start=1):
+        ws.column_dimensions[get_column_letter(i)].width = columna.ancho
+    ws.freeze_panes = "A2"
+
+    encabezado_fuente = Font(bold=True, color="FFFFFF")
+    encabezado_fondo = PatternFill("solid", fgColor="2F2F2F")
+    encabezados = []
+    for columna in columnas:
+        celda = WriteOnlyCell(ws, value=columna.titulo)
+        celda.font = encabezado_fuente
+        celda.fill = encabezado_fondo
+        encabezados.append(celda)
+    ws.append(encabezados)
+
+    # El formato de cada columna se resuelve una sola vez, no por fila
+    formatos = [FORMATOS.get(columna.tipo, 'General') for columna in columnas]
+    for fila in filas:
+        celdas = []
+        for columna, formato in zip(columnas, formatos):
+            celda = WriteOnlyCell(ws, value=convertir(fila[columna.clave], columna.tipo))
+            celda.number_format = formato
+            celdas.append(celda)
+        ws.append(celdas)
+
+    salida = destino or SpooledTemporaryFile(max_size=MAX_MEMORIA_TEMPORAL)
+    wb.save(salida)
+    salida.seek(0)
+    return salida
+
+
+def nombre_archivo(prefijo, extension):
+    return f"{prefijo}_{datetime.now().strftime('%Y%m%d')}.{extension}"
+
+
+# =====================
+# CSV EN STREAMING
+# =====================
+def _valor_csv(valor):
+    if valor is None:
+        return ""
+    if isinstance(valor, timedelta):
+        segundos = int(valor.total_seconds())
+        return f"{segundos // 3600:02d}:{segundos % 3600 // 60:02d}:{segundos % 60:02d}"
+    if isinstance(valor, (date, datetime, time)):
+        return valor.isoformat()
+    return valor
+
+
+def generar_csv(claves, filas, comprimir=False, lote=LOTE_FILAS):
+    """Genera el CSV por bloques de bytes a medida que llegan las filas.
+
+    `claves` son las columnas del SELECT, en orden; se usan tal cual como
+    encabezado (nombres estables para herramientas de BI). Con
+    `comprimir=True` cada bloque sale ya en gzip.
+    """
+    compresor = zlib.compressobj(6, zlib.DEFLATED, 31) if comprimir else None
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer, lineterminator="\n")
+
+    def vaciar():
+        datos = buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+        return compresor.compress(datos) if compresor else datos
+
+    # El encabezado sale de inmediato, antes de que llegue la primera fila
+    escritor.writerow(claves)
+    bloque = vaciar()
+    yield (bloque + compresor.flush(zlib.Z_SYNC_FLUSH)) if compresor else bloque
+
+    pendientes = 0
+    for fila in filas:
+        escritor.writerow([_valor_csv(fila[clave]) for clave in claves])
+        pendientes += 1
+        if pendientes >= lote:
+            bloque = vaciar()
+            if bloque:
+                yield bloque
+            pendientes = 0
+
+    bloque = vaciar()
+    if compresor:
+        bloque += compresor.flush()
+    if bloque:
+        yield bloque
+
+
+# =====================
+# PDF EN TABLA PAGINADA
+# =====================
+def _texto_pdf(valor, tipo):
+    """Valor formateado para las fuentes base de FPDF (latin-1)"""
+    if valor is None:
+        return ""
+    if tipo == 'moneda':
+        texto = f"${float(valor):,.0f}"
+    elif tipo == 'hora':
+        texto = _valor_csv(valor)
+    elif tipo == 'fecha':
+        texto = valor.strftime("%d/%m/%Y") if isinstance(valor, (date, datetime)) else str(valor)
+    else:
+        texto = str(valor)
+    return texto.encode("latin-1", "replace").decode("latin-1")
+
+
+class ReportePDF(FPDF):
+    """Reporte en tabla: encabezado de columnas en cada página, subtotales por
+    página y total general de las columnas indicadas en `sumar`.
+
+    Uso:
+        pdf = ReportePDF("Reporte de Ventas", columnas, sumar=["total"])
+        pdf.agregar_filas(iterar_filas(query, params))
+        archivo = pdf.terminar()
+    """
+
+    ALTO_FILA = 6
+    COLOR_ENCABEZADO = (47, 47, 47)
+    COLOR_ALTERNO = (242, 242, 242)
+
+    def __init__(self, titulo, columnas, sumar=(), orientacion="P"):
+        super().__init__(orientation=orientacion, unit="mm", format="A4")
+        self.titulo = titulo
+        self.columnas = columnas
+        self.sumar = set(sumar)
+        self.generado = datetime.now().strftime("%d/%m/%Y %H:%M")
+        self.subtotal = dict.fromkeys(self.sumar, 0)
+        self.total = dict.fromkeys(self.sumar, 0)
+        self.filas = 0
+        self._fuente_actual = None
+        self._recortes = {}
+        self._alineaciones = ["R" if c.tipo in ('entero', 'moneda', 'decimal') else "L" for c in columnas]
+
+        self.alias_nb_pages()
+        self.set_auto_page_break(False)
+        self.set_margins(10, 10, 10)
+        self.add_page()
+
+    def _fuente(self, estilo="", tamano=8):
+        # set_font solo cuando cambia: en miles de filas evita trabajo repetido
+        if self._fuente_actual != (estilo, tamano):
+            self.set_font("Arial", estilo, tamano)
+            self._fuente_actual = (estilo, tamano)
+
+    def add_page(self, *args, **kwargs):
+        super().add_page(*args, **kwargs)
+        # FPDF restaura la fuente anterior después de header(): el caché ya no aplica
+        self._fuente_actual = None
+
+    def header(self):
+        self._fuente_actual = None
+        self._fuente("B", 14)
+        self.cell(0, 8, _texto_pdf(f"{self.titulo} - Parrilla 51", 'texto'), ln=1, align="C")
+        self._fuente("", 8)
+        self.cell(0, 5, f"Generado: {self.generado}", ln=1, align="C")
+        self.ln(2)
+
+        self._fuente("B", 8)
+        self.set_fill_color(*self.COLOR_ENCABEZADO)
+        self.set_text_color(255, 255, 255)
+        for columna, alineacion in zip(self.columnas, self._alineaciones):
+            self.cell(columna.ancho, self.ALTO_FILA + 1, _texto_pdf(columna.titulo, 'texto'), border=0,
+                      align=alineacion, fill=True)
+        self.ln()
+        self.set_text_color(0, 0, 0)
+
+    def footer(self):
+        self.set_y(-12)
+        self._fuente_actual = None
+        self._fuente("", 7)
+        self.cell(0, 5, f"Página {self.page_no()}/{{nb}}".encode("latin-1", "replace").decode("latin-1"),
+                  align="C")
+
+    def _fila_totales(self, etiqueta, valores):
+        self._fuente("B", 8)
+        self.set_fill_color(*self.COLOR_ALTERNO)
+        for i, (columna, alineacion) in enumerate(zip(self.columnas, self._alineaciones)):
+            if columna.clave in valores:
+                texto = _texto_pdf(valores[columna.clave], columna.tipo)
+            elif i == 0:
+                texto = _texto_pdf(etiqueta, 'texto')
+                alineacion = "L"
+            else:
+                texto = ""
+            self.cell(columna.ancho, self.ALTO_FILA, texto, border="T", align=alineacion, fill=True)
+        self.ln()
+
+    def _ajustar(self, texto, ancho):
+        """Recorta el texto al ancho de la celda (sin saltos de línea).
+
+        Los valores se repiten mucho (clientes, estados, categorías): el
+        resultado se guarda por (texto, ancho) para medir cada uno una vez.
+        """
+        llave = (texto, ancho)
+        if llave not in self._recortes:
+            if len(self._recortes) > 5000:
+                self._recortes.clear()
+            self._recortes[llave] = self._recortar(texto, ancho)
+        return self._recortes[llave]
+
+    def _recortar(self, texto, ancho):
+        disponible = ancho - 2
+        medida = self.get_string_width(texto)
+        if medida <= disponible:
+            return texto
+        # Corte proporcional y luego ajuste fino, en vez de quitar letra por letra
+        texto = texto[:max(int(len(texto) * disponible / medida), 1)]
+        while texto and self.get_string_width(texto + "...") > disponible:
+            texto = texto[:-1]
+        return texto + "..."
+
+    def agregar_filas(self, filas):
+        # Espacio reservado al pie para la fila de subtotal y el número de página
+        limite = self.h - 12 - self.ALTO_FILA * 2
+        for fila in filas:
+            if self.get_y() + self.ALTO_FILA > limite:
+                if self.sumar:
+                    self._fila_totales("Subtotal página", self.subtotal)
+                self.subtotal = dict.fromkeys(self.sumar, 0)
+                self.add_page()
+
+            self._fuente("", 8)
+            relleno = self.filas % 2 == 1
+            if relleno:
+                self.set_fill_color(*self.COLOR_ALTERNO)
+            for columna, alineacion in zip(self.columnas, self._alineaciones):
+                texto = _texto_pdf(fila[columna.clave], columna.tipo)
+                if columna.tipo == 'texto':
+                    texto = self._ajustar(texto, columna.ancho)
+                self.cell(columna.ancho, self.ALTO_FILA, texto, align=alineacion, fill=relleno)
+            self.ln()
+
+            for clave in self.sumar:
+                valor = fila[clave] or 0
+                self.subtotal[clave] += valor
+                self.total[clave] += valor
+            self.filas += 1
+
+    def terminar(self, etiqueta_total="Total general", destino=None):
+        """Cierra la tabla y escribe el PDF en `destino` (o en un archivo temporal), posicionado al inicio"""
+        if self.sumar:
+            self._fila_totales("Subtotal página", self.subtotal)
+            self._fila_totales(f"{etiqueta_total} ({self.filas} filas)", self.total)
+        elif not self.filas:
+            self._fuente("", 9)
+            self.cell(0, 8, "Sin resultados para los filtros seleccionados", ln=1, align="C")
+
+        salida = destino or SpooledTemporaryFile(max_size=MAX_MEMORIA_TEMPORAL)
+        salida.write(self.output(dest="S").encode("latin-1"))
+        salida.seek(0)
+        return salida
@@ -0,0 +1,191 @@
+"""
+Constructores de predicados "sargables" para búsquedas y reportes.
+
+Cada función devuelve `(sql, params)` con la columna indexada a la izquierda
+y sin funciones sobre ella, para que MySQL pueda hacer un range scan.
+"""
+import re
+from datetime import date, datetime, timedelta
+
+RE_FECHA = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+RE_MES = re.compile(r"^\d{4}-\d{2}$")
+RE_HORA = re.compile(r"^\d{1,2}:\d{2}(:\d{2})?$")
+
+# Longitud máxima considerada al buscar teléfonos numéricos por prefijo
+DIGITOS_TELEFONO_MAX = 12
+
+ESTADOS_PEDIDO = ('pendiente', 'en preparacion', 'entregado', 'cancelado')
+
+
+def combinar(*filtros):
+    """Une con AND los filtros no nulos; devuelve `(sql, params)` o `("", [])`"""
+    partes = [f for f in filtros if f]
+    if not partes:
+        return "", []
+    return " AND ".join(sql for sql, _ in partes), [v for _, valores in partes for v in valores]
+
+
+def cualquiera(*filtros):
+    """Une con OR los filtros no nulos; None si no queda ninguno"""
+    partes = [f for f in filtros if f]
+    if not partes:
+        return None
+    return "(" + " OR ".join(sql for sql, _ in partes) + ")", [v for _, valores in partes for v in valores]
+
+
+def _escapar_like(texto):
+    return texto.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+# =====================
+# PREDICADOS BÁSICOS
+# =====================
+def igual(columna, valor):
+    return f"{columna} = %s", [valor]
+
+
+def en(columna, valores):
+    valores = list(valores)
+    if not valores:
+        return None
+    return f"{columna} IN ({', '.join(['%s'] * len(valores))})", valores
+
+
+def prefijo(columna, texto):
+    """`columna LIKE 'texto%'`: usa el índice, a diferencia de `'%texto%'`"""
+    return f"{columna} LIKE %s", [_escapar_like(texto) + "%"]
+
+
+def contiene(columna, texto):
+    """Búsqueda libre (no sargable); solo para tablas pequeñas como el catálogo"""
+    return f"{columna} LIKE %s", ["%" + _escapar_like(texto) + "%"]
+
+
+def prefijo_numerico(columna, digitos):
+    """Prefijo sobre una columna entera (p. ej. teléfonos BIGINT) como rangos.
+
+    `310` en una columna de hasta 12 dígitos se traduce a
+    `columna = 310 OR (columna >= 3100 AND columna < 3110) OR ...`, todo range scan.
+    """
+    base = int(digitos)
+    partes = [f"{columna} = %s"]
+    params = [base]
+    for extra in range(1, DIGITOS_TELEFONO_MAX - len(digitos) + 1):
+        factor = 10 ** extra
+        partes.append(f"({columna} >= %s AND {columna} < %s)")
+        params.extend([base * factor, (base + 1) * factor])
+    return "(" + " OR ".join(partes) + ")", params
+
+
+def rango_dia(columna, dia):
+    return f"({columna} >= %s AND {columna} < %s)", [dia, dia + timedelta(days=1)]
+
+
+def rango_mes(columna, anio, mes):
+    inicio = date(anio, mes, 1)
+    fin = date(anio + (mes == 12), mes % 12 + 1, 1)
+    return f"({columna} >= %s AND {columna} < %s)", [inicio, fin]
+
+
+def rango_hora(columna, texto):
+    """`12:30` cubre el minuto completo; `12:30:15` es igualdad exacta"""
+    partes = [int(p) for p in texto.split(":")]
+    if partes[0] > 23 or any(p > 59 for p in partes[1:]):
+        raise ValueError(f"Hora fuera de rango: {texto}")
+    if len(partes) == 3:
+        return f"{columna} = %s", [f"{partes[0]:02d}:{partes[1]:02d}:{partes[2]:02d}"]
+    inicio = timedelta(hours=partes[0], minutes=partes[1])
+    fin = inicio + timedelta(minutes=1)
+    return f"({columna} >= %s AND {columna} < %s)", [str(inicio), str(fin)]
+
+
+def filtro_mes(columna, texto):
+    """`YYYY-MM` -> `columna >= primer_dia AND columna < primer_dia_siguiente`"""
+    texto = (texto or "").strip()
+    if not RE_MES.match(texto):
+        return None
+    anio, mes = (int(p) for p in texto.split("-"))
+    try:
+        return rango_mes(columna, anio, mes)
+    except ValueError:
+        return None
+
+
+def filtro_dia(columna, texto):
+    texto = (texto or "").strip()
+    if not RE_FECHA.match(texto):
+        return None
+    try:
+        return rango_dia(columna, datetime.strptime(texto, "%Y-%m-%d").date())
+    except ValueError:
+        return None
+
+
+# =====================
+# BÚSQUEDA DE PEDIDOS (tablero e historial de órdenes)
+# =====================
+def filtro_busqueda_pedido(texto, alias=""):
+    """Número -> id de pedido/cliente exacto o prefijo de teléfono; texto -> estado.
+
+    Devuelve None si el texto no se puede interpretar.
+    """
+    texto = texto.strip().lower()
+    if texto.isdigit():
+        return cualquiera(
+            igual(f"{alias}id_pedido", int(texto)),
+            igual(f"{alias}cod_usuario", int(texto)),
+            prefijo_numerico(f"{alias}telefono", texto),
+        )
+    # El estado es un ENUM pequeño: se resuelve aquí y se consulta con IN
+    estados = [e for e in ESTADOS_PEDIDO if texto in e]
+    return en(f"{alias}estado", estados)
+
+
+# =====================
+# BÚSQUEDA DE RESERVAS
+# =====================
+def filtro_busqueda_reserva(texto):
+    """Número -> prefijo de documento/teléfono; texto -> prefijo del nombre"""
+    texto = texto.strip()
+    if not texto:
+        return None
+    if texto.isdigit():
+        return cualquiera(prefijo("documento", texto), prefijo("telefono", texto))
+    return prefijo("nombre", texto)
+
+
+# =====================
+# BÚSQUEDA DEL REPORTE DE VENTAS
+# =====================
+def filtro_busqueda_venta(texto):
+    """Número -> id de pedido exacto; texto -> prefijo de nombre o apellido"""
+    texto = texto.strip()
+    if not texto:
+        return None
+    if texto.isdigit():
+        return igual("p.id_pedido", int(texto))
+    return cualquiera(prefijo("u.nombre", texto), prefijo("u.apellido", texto))
+
+
+# =====================
+# BÚSQUEDA DE PAGOS DEL RESTAURANTE
+# =====================
+def filtro_busqueda_pago(texto):
+    """Interpreta el cuadro de búsqueda del historial de pagos.
+
+    Acepta un ID numérico, una fecha YYYY-MM-DD, un mes YYYY-MM o una hora
+    HH:MM[:SS]. Devuelve None si el texto no corresponde a ninguno.
+    """
+    texto = texto.strip()
+    try:
+        if texto.isdigit():
+            return igual("id_pago_restaurante", int(texto))
+        if RE_FECHA.match(texto):
+            return filtro_dia("fecha", texto)
+        if RE_MES.match(texto):
+            return filtro_mes("fecha", texto)
+        if RE_HORA.match(texto):
+            return rango_hora("hora", texto)
+    except ValueError:
+        return None
+    return None
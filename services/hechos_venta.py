@@ -0,0 +1,167 @@
+"""
+Hechos de venta unificados (`hechos_venta`).
+
+Una fila por producto vendido, tanto de pedidos en línea (`canal='online'`)
+como de pagos de mesa (`canal='mesa'`). La tabla solo recibe inserciones:
+cancelar un pedido agrega las mismas líneas con cantidad negativa y
+reactivarlo las vuelve a sumar, así cualquier agregado por día, canal o
+producto es un simple SUM.
+"""
+import click
+import MySQLdb
+
+from __init__ import mysql
+from services.ventas_diarias import ventas_cli
+
+CANAL_ONLINE = 'online'
+CANAL_MESA = 'mesa'
+
+_INSERTAR = """
+    INSERT INTO hechos_venta (canal, id_origen, id_producto, cantidad, precio_unitario, fecha, hora)
+"""
+
+_DESDE_PEDIDOS = """
+    SELECT 'online', p.id_pedido, d.cod_producto, d.cantidad * %s,
+           COALESCE(d.precio_unitario, 0), p.fecha, p.hora
+    FROM pedidos p
+    INNER JOIN detalle_pedido d ON d.cod_pedido = p.id_pedido
+    WHERE d.cod_producto IS NOT NULL AND p.fecha IS NOT NULL
+"""
+
+_DESDE_PAGOS_MESA = """
+    SELECT 'mesa', pr.id_pago_restaurante, d.id_producto, d.cantidad,
+           d.precio_unitario, pr.fecha, pr.hora
+    FROM pagos_restaurante pr
+    INNER JOIN detalle_pedido_restaurante d ON d.id_pago_restaurante = pr.id_pago_restaurante
+    WHERE 1=1
+"""
+
+
+# =====================
+# REGISTRO DESDE LOS CHECKOUTS
+# =====================
+def registrar_pedido(cur, id_pedido, signo=1):
+    """Copia las líneas del pedido; llamar antes del commit del checkout"""
+    cur.execute(_INSERTAR + _DESDE_PEDIDOS + " AND p.id_pedido = %s", (signo, id_pedido))
+
+
+def registrar_pago_mesa(cur, id_pago_restaurante):
+    """Copia las líneas de un pago de mesa; llamar antes del commit"""
+    cur.execute(_INSERTAR + _DESDE_PAGOS_MESA + " AND pr.id_pago_restaurante = %s",
+                (id_pago_restaurante,))
+
+
+def _unidades_netas(cur, id_pedido):
+    cur.execute("""
+        SELECT COALESCE(SUM(cantidad), 0) AS netas FROM hechos_venta
+        WHERE canal = 'online' AND id_origen = %s
+    """, (id_pedido,))
+    return cur.fetchone()['netas']
+
+
+def registrar_cambio_estado(cur, id_pedido, anterior, nuevo):
+    """Compensa las ventas de un pedido que entra o sale del estado 'cancelado'.
+
+    Solo resta si el pedido tiene ventas registradas (un pedido anterior a
+    la tabla que aún no pasó por `cargar-hechos` no tiene nada que
+    compensar) y solo suma si hoy no tiene ninguna. El llamador ya bloqueó
+    la fila del pedido, así que dos cambios de estado no se cruzan.
+    """
+    if anterior is None or (anterior == 'cancelado') == (nuevo == 'cancelado'):
+        return
+    netas = _unidades_netas(cur, id_pedido)
+    if nuevo == 'cancelado':
+        if netas > 0:
+            registrar_pedido(cur, id_pedido, signo=-1)
+    elif netas <= 0:
+        registrar_pedido(cur, id_pedido, signo=1)
+
+
+# =====================
+# CARGA DEL HISTÓRICO
+# =====================
+def cargar_historico(conn):
+    """Reconstruye el canal en línea y agrega los pagos de mesa que faltan.
+
+    Los hechos en línea se borran y se vuelven a insertar desde los pedidos
+    no cancelados (como `ventas reconstruir`): así se puede volver a correr
+    y corrige cualquier pedido con compensaciones sin su venta original.
+    Los pagos de mesa nunca se compensan, así que solo se insertan los que
+    aún no tienen hechos. Devuelve `(filas_online, filas_mesa)`.
+    """
+    cur = conn.cursor()
+    try:
+        cur.execute("DELETE FROM hechos_venta WHERE canal = 'online'")
+        cur.execute(_INSERTAR + _DESDE_PEDIDOS + " AND p.estado <> 'cancelado'", (1,))
+        online = cur.rowcount
+        cur.execute(_INSERTAR + _DESDE_PAGOS_MESA + """
+            AND NOT EXISTS (
+                SELECT 1 FROM hechos_venta h
+                WHERE h.canal = 'mesa' AND h.id_origen = pr.id_pago_restaurante
+            )
+        """)
+        mesa = cur.rowcount
+        conn.commit()
+        return online, mesa
+    except MySQLdb.Error:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+
+
+# =====================
+# LECTURA PARA REPORTES
+# =====================
+def ingresos_por_dia(cur, desde, hasta):
+    """`[{fecha, canal, unidades, ingresos}, ...]` entre dos fechas, inclusive"""
+    cur.execute("""
+        SELECT fecha, canal, SUM(cantidad) AS unidades,
+               SUM(cantidad * precio_unitario) AS ingresos
+        FROM hechos_venta
+        WHERE fecha >= %s AND fecha <= %s
+        GROUP BY fecha, canal
+        ORDER BY fecha DESC, canal
+    """, (desde, hasta))
+    return list(cur.fetchall())
+
+
+def mezcla_productos(cur, desde, hasta, canal=None, limite=20):
+    """Productos más vendidos del rango, con su participación por canal"""
+    condicion_canal = " AND canal = %s" if canal else ""
+    params = [desde, hasta] + ([canal] if canal else []) + [limite]
+    cur.execute(f"""
+        SELECT h.id_producto, COALESCE(p.nombre, CONCAT('ID ', h.id_producto)) AS nombre,
+               h.unidades, h.ingresos, h.unidades_online, h.unidades_mesa
+        FROM (
+            SELECT id_producto,
+                   SUM(cantidad) AS unidades,
+                   SUM(cantidad * precio_unitario) AS ingresos,
+                   SUM(CASE WHEN canal = 'online' THEN cantidad ELSE 0 END) AS unidades_online,
+                   SUM(CASE WHEN canal = 'mesa' THEN cantidad ELSE 0 END) AS unidades_mesa
+            FROM hechos_venta
+            WHERE fecha >= %s AND fecha <= %s{condicion_canal}
+            GROUP BY id_producto
+            HAVING SUM(cantidad) <> 0
+            ORDER BY ingresos DESC, unidades DESC
+            LIMIT %s
+        ) AS h
+        LEFT JOIN productos p ON p.id_producto = h.id_producto
+        ORDER BY h.ingresos DESC, h.unidades DESC
+    """, params)
+    return list(cur.fetchall())
+
+
+# =====================
+# CLI
+# =====================
+@click.command("cargar-hechos")
+def cargar_hechos_cmd():
+    with mysql.pool.connection() as conn:
+        online, mesa = cargar_historico(conn)
+    click.echo(f"Hechos cargados: {online} líneas en línea, {mesa} líneas de mesa")
+
+
+def init_app(app):
+    # Subcomando del grupo `ventas` que registra ventas_diarias.init_app
+    ventas_cli.add_command(cargar_hechos_cmd)
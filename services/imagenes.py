@@ -0,0 +1,287 @@
+"""
+Variantes responsivas de las fotos de `static/img`.
+
+Cada foto original genera tres anchos (miniatura, tarjeta, completa) en
+WebP y en su formato de respaldo (JPEG, o PNG si tiene transparencia),
+guardados en `static/img/variantes/` con el hash del contenido en el
+nombre. `productos.imagen` sigue guardando el nombre del original: es la
+llave lógica con la que `variantes/manifest.json` encuentra las variantes.
+
+    flask --app app imagenes generar [--forzar]
+
+Las plantillas usan `imagen_responsive('churrasco.jpg', 'tarjeta')`, que
+emite un `<picture>` con `srcset`; si la foto aún no tiene variantes (o es
+una URL externa) cae al archivo original.
+"""
+import hashlib
+import json
+import os
+import threading
+
+import click
+from flask import current_app, url_for
+from markupsafe import Markup, escape
+
+from services import trabajos
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Pillow solo hace falta para generar, no para servir
+    Image = None
+
+# Anchos en px de cada variante
+TAMANOS = {
+    'miniatura': 160,
+    'tarjeta': 480,
+    'completa': 1200,
+}
+EXTENSIONES = ('.jpg', '.jpeg', '.png', '.webp')
+CALIDAD_JPEG = 82
+CALIDAD_WEBP = 80
+
+CARPETA_VARIANTES = 'variantes'
+MANIFIESTO = 'manifest.json'
+
+# `sizes` por defecto de cada uso, para que el navegador elija el ancho
+SIZES = {
+    'miniatura': '160px',
+    'tarjeta': '(max-width: 600px) 100vw, 480px',
+    'completa': '100vw',
+}
+
+
+def _directorio_img():
+    return os.path.join(current_app.static_folder, 'img')
+
+
+def _ruta_manifiesto(directorio):
+    return os.path.join(directorio, CARPETA_VARIANTES, MANIFIESTO)
+
+
+# =====================
+# MANIFIESTO (recargado cuando cambia en disco)
+# =====================
+class _Manifiesto:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._mtime = None
+        self._datos = {}
+
+    def leer(self, directorio):
+        ruta = _ruta_manifiesto(directorio)
+        try:
+            mtime = os.stat(ruta).st_mtime_ns
+        except OSError:
+            return {}
+        if mtime != self._mtime:
+            with self._lock:
+                if mtime != self._mtime:
+                    try:
+                        with open(ruta, encoding='utf-8') as f:
+                            self._datos = json.load(f)
+                    except (OSError, ValueError):
+                        self._datos = {}
+                    self._mtime = mtime
+        return self._datos
+
+    def escribir(self, directorio, datos):
+        ruta = _ruta_manifiesto(directorio)
+        temporal = f"{ruta}.{os.getpid()}.tmp"
+        with open(temporal, 'w', encoding='utf-8') as f:
+            json.dump(datos, f, indent=1, sort_keys=True)
+        os.replace(temporal, ruta)
+
+
+_manifiesto = _Manifiesto()
+_lock_generar = threading.Lock()
+
+
+# =====================
+# GENERACIÓN
+# =====================
+def _hash_archivo(ruta):
+    h = hashlib.sha256()
+    with open(ruta, 'rb') as f:
+        for bloque in iter(lambda: f.read(1 << 16), b''):
+            h.update(bloque)
+    return h.hexdigest()[:12]
+
+
+def _guardar(imagen, ruta, formato):
+    if formato == 'webp':
+        imagen.save(ruta, 'WEBP', quality=CALIDAD_WEBP, method=4)
+    elif formato == 'png':
+        imagen.save(ruta, 'PNG')
+    else:
+        imagen.convert('RGB').save(ruta, 'JPEG', quality=CALIDAD_JPEG, optimize=True, progressive=True)
+
+
+def _generar(directorio, nombre, forzar=False):
+    """Variantes de un original; devuelve la entrada del manifiesto o None si se omitió"""
+    origen = os.path.join(directorio, nombre)
+    firma = _hash_archivo(origen)
+    actual = _manifiesto.leer(directorio).get(nombre)
+    destino = os.path.join(directorio, CARPETA_VARIANTES)
+    if (not forzar and actual and actual['hash'] == firma and all(
+            os.path.exists(os.path.join(directorio, v[formato]))
+            for v in actual['variantes'] for formato in ('webp', 'respaldo'))):
+        return None
+
+    with Image.open(origen) as original:
+        original = ImageOps.exif_transpose(original)
+        transparente = original.mode in ('RGBA', 'LA') or 'transparency' in original.info
+        respaldo = 'png' if transparente else 'jpg'
+        original = original.convert('RGBA' if transparente else 'RGB')
+        base = os.path.splitext(nombre)[0].replace('/', '_')
+
+        variantes = []
+        anchos_hechos = set()
+        for tamano, ancho in TAMANOS.items():
+            # Nunca agrandar: si el original es más chico se usa su ancho
+            ancho = min(ancho, original.width)
+            alto = round(original.height * ancho / original.width)
+            variante = {'tamano': tamano, 'ancho': ancho, 'alto': alto}
+            for formato in ('webp', respaldo):
+                archivo = f"{base}-{firma}-{ancho}w.{formato}"
+                if ancho not in anchos_hechos:
+                    reducida = original if ancho == original.width else original.resize((ancho, alto), Image.LANCZOS)
+                    _guardar(reducida, os.path.join(destino, archivo), formato)
+                variante['webp' if formato == 'webp' else 'respaldo'] = f"{CARPETA_VARIANTES}/{archivo}"
+            anchos_hechos.add(ancho)
+            variantes.append(variante)
+
+    return {'hash': firma, 'ancho': original.width, 'alto': original.height, 'variantes': variantes}
+
+
+def _archivos(entrada):
+    return {v[formato] for v in entrada['variantes'] for formato in ('webp', 'respaldo')}
+
+
+def _borrar_huerfanas(directorio, manifiesto):
+    # Las variantes anteriores de cada foto se conservan una generación más:
+    # páginas ya servidas (o cacheadas) pueden seguir pidiéndolas
+    vigentes = set()
+    for entrada in manifiesto.values():
+        vigentes |= _archivos(entrada) | set(entrada.get('anteriores', ()))
+    carpeta = os.path.join(directorio, CARPETA_VARIANTES)
+    for archivo in os.listdir(carpeta):
+        if archivo != MANIFIESTO and f"{CARPETA_VARIANTES}/{archivo}" not in vigentes:
+            os.remove(os.path.join(carpeta, archivo))
+
+
+def generar(nombres=None, forzar=False):
+    """Genera las variantes de `nombres` (o de todo `static/img`); devuelve cuántos originales procesó"""
+    if Image is None:
+        raise RuntimeError("Pillow no está instalado: pip install Pillow")
+    directorio = _directorio_img()
+    os.makedirs(os.path.join(directorio, CARPETA_VARIANTES), exist_ok=True)
+    if nombres is None:
+        nombres = sorted(
+            n for n in os.listdir(directorio)
+            if n.lower().endswith(EXTENSIONES) and os.path.isfile(os.path.join(directorio, n))
+        )
+
+    with _lock_generar:
+        manifiesto = dict(_manifiesto.leer(directorio))
+        procesados = 0
+        for nombre in nombres:
+            entrada = _generar(directorio, nombre, forzar)
+            if entrada:
+                previa = manifiesto.get(nombre)
+                if previa:
+                    entrada['anteriores'] = sorted(_archivos(previa) - _archivos(entrada))
+                manifiesto[nombre] = entrada
+                procesados += 1
+        if procesados:
+            _manifiesto.escribir(directorio, manifiesto)
+            _borrar_huerfanas(directorio, manifiesto)
+    return procesados
+
+
+def generar_para_producto(imagen):
+    """Encola las variantes de la foto de un producto recién guardado.
+
+    No demora ni falla el guardado: sin Pillow, con una URL externa o con
+    un archivo inexistente no hace nada, y mientras el trabajo corre las
+    plantillas muestran el original.
+    """
+    if not imagen or Image is None or '://' in imagen:
+        return
+    nombre = os.path.normpath(imagen)
+    if nombre.startswith('..') or os.path.isabs(nombre):
+        return
+    if not os.path.isfile(os.path.join(_directorio_img(), nombre)):
+        return
+    try:
+        trabajos.en_segundo_plano(generar, [nombre])
+    except trabajos.ColaLlena:
+        current_app.logger.warning("Cola llena: variantes de %s pendientes (flask imagenes generar)", nombre)
+
+
+# =====================
+# HELPERS DE PLANTILLA
+# =====================
+def _url(ruta):
+    return url_for('static', filename=f"img/{ruta}")
+
+
+def srcset(imagen, formato='respaldo'):
+    """`"url 160w, url 480w, ..."` de las variantes; vacío si no hay"""
+    entrada = _manifiesto.leer(_directorio_img()).get(imagen) if imagen else None
+    if not entrada:
+        return ''
+    vistos = set()
+    partes = []
+    for v in entrada['variantes']:
+        if v['ancho'] not in vistos:
+            vistos.add(v['ancho'])
+            partes.append(f"{_url(v[formato])} {v['ancho']}w")
+    return ", ".join(partes)
+
+
+def imagen_responsive(imagen, tamano='tarjeta', alt='', clase='', sizes=None, perezosa=True):
+    """`<picture>` con WebP + respaldo y `srcset`; con el original si no hay variantes"""
+    atributos = f' alt="{escape(alt)}"'
+    if clase:
+        atributos += f' class="{escape(clase)}"'
+    if perezosa:
+        atributos += ' loading="lazy" decoding="async"'
+
+    if not imagen:
+        return Markup(f'<img src="{url_for("static", filename="no-image.png")}"{atributos}>')
+    if '://' in imagen:
+        return Markup(f'<img src="{escape(imagen)}"{atributos}>')
+
+    entrada = _manifiesto.leer(_directorio_img()).get(imagen)
+    if not entrada:
+        return Markup(f'<img src="{escape(_url(imagen))}"{atributos}>')
+
+    sizes = escape(sizes or SIZES.get(tamano, SIZES['tarjeta']))
+    elegida = next((v for v in entrada['variantes'] if v['tamano'] == tamano), entrada['variantes'][-1])
+    return Markup(
+        f'<picture>'
+        f'<source type="image/webp" srcset="{escape(srcset(imagen, "webp"))}" sizes="{sizes}">'
+        f'<img src="{escape(_url(elegida["respaldo"]))}" srcset="{escape(srcset(imagen))}" sizes="{sizes}"'
+        f' width="{elegida["ancho"]}" height="{elegida["alto"]}"{atributos}>'
+        f'</picture>'
+    )
+
+
+# =====================
+# CLI
+# =====================
+@click.group("imagenes")
+def imagenes_cli():
+    """Variantes responsivas de static/img"""
+
+
+@imagenes_cli.command("generar")
+@click.option("--forzar", is_flag=True, help="Regenera aunque el original no haya cambiado")
+def generar_cmd(forzar):
+    click.echo(f"Originales procesados: {generar(forzar=forzar)}")
+
+
+def init_app(app):
+    app.add_template_global(imagen_responsive)
+    app.add_template_global(srcset, name='imagen_srcset')
+    app.cli.add_command(imagenes_cli)
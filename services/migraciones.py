@@ -0,0 +1,180 @@
+"""
+Migraciones de esquema versionadas.
+
+Cada archivo `migrations/NNNN_descripcion.sql` se aplica una sola vez, en
+orden, y queda registrado en la tabla `schema_migraciones`. Uso:
+
+    flask --app app db estado
+    flask --app app db migrar
+"""
+import hashlib
+import os
+
+import click
+import MySQLdb
+
+from __init__ import mysql
+
+MIGRACIONES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "migrations")
+
+# Errores que indican que la sentencia ya estaba aplicada (índice/columna/tabla existente)
+ERRORES_YA_APLICADO = {
+    1050,  # ER_TABLE_EXISTS_ERROR
+    1060,  # ER_DUP_FIELDNAME
+    1061,  # ER_DUP_KEYNAME
+    1091,  # ER_CANT_DROP_FIELD_OR_KEY (ya se había quitado)
+}
+
+# Datos que deben estar limpios antes de una migración: consulta que debe
+# devolver 0 filas y mensaje para quien corre `db migrar` si no es así
+VERIFICACIONES = {
+    "0011": (
+        """
+        SELECT correo, COUNT(*) AS veces FROM usuarios
+        WHERE correo IS NOT NULL
+        GROUP BY correo HAVING COUNT(*) > 1
+        ORDER BY veces DESC LIMIT 20
+        """,
+        "Hay correos repetidos en `usuarios`; deja una sola cuenta por correo "
+        "(o cambia el correo de las demás) y vuelve a correr `db migrar`",
+    ),
+}
+
+
+class MigracionBloqueada(Exception):
+    """Los datos actuales impiden aplicar la migración; no se ejecutó nada de ella"""
+
+    def __init__(self, migracion, mensaje, filas):
+        self.migracion = migracion
+        self.filas = filas
+        super().__init__(f"{migracion.archivo}: {mensaje}")
+
+
+class Migracion:
+    def __init__(self, ruta):
+        self.ruta = ruta
+        self.archivo = os.path.basename(ruta)
+        self.version, _, resto = self.archivo.partition("_")
+        self.nombre = resto.rsplit(".", 1)[0]
+        with open(ruta, encoding="utf-8") as f:
+            self.sql = f.read()
+        self.checksum = hashlib.sha256(self.sql.encode("utf-8")).hexdigest()
+
+    def sentencias(self):
+        """Divide el archivo en sentencias, ignorando comentarios `--`"""
+        lineas = [l for l in self.sql.splitlines() if not l.strip().startswith("--")]
+        return [s.strip() for s in "\n".join(lineas).split(";") if s.strip()]
+
+
+def listar_migraciones():
+    archivos = sorted(a for a in os.listdir(MIGRACIONES_DIR) if a.endswith(".sql"))
+    return [Migracion(os.path.join(MIGRACIONES_DIR, a)) for a in archivos]
+
+
+def _asegurar_tabla(cur):
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migraciones (
+            version VARCHAR(20) NOT NULL PRIMARY KEY,
+            nombre VARCHAR(150) NOT NULL,
+            checksum CHAR(64) NOT NULL,
+            aplicada_en DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+    """)
+
+
+def aplicadas(cur):
+    _asegurar_tabla(cur)
+    cur.execute("SELECT version, checksum FROM schema_migraciones")
+    return {fila["version"]: fila["checksum"] for fila in cur.fetchall()}
+
+
+def verificar(migracion, cur):
+    """Lanza MigracionBloqueada si falla la verificación previa de la migración"""
+    verificacion = VERIFICACIONES.get(migracion.version)
+    if not verificacion:
+        return
+    consulta, mensaje = verificacion
+    cur.execute(consulta)
+    filas = cur.fetchall()
+    if filas:
+        raise MigracionBloqueada(migracion, mensaje, filas)
+
+
+def aplicar(migracion, conn):
+    cur = conn.cursor()
+    try:
+        # Antes de cualquier DDL: un ALTER a medias no se puede revertir
+        verificar(migracion, cur)
+        for sentencia in migracion.sentencias():
+            try:
+                cur.execute(sentencia)
+            except MySQLdb.Error as e:
+                if not e.args or e.args[0] not in ERRORES_YA_APLICADO:
+                    raise
+        cur.execute(
+            "INSERT INTO schema_migraciones (version, nombre, checksum) VALUES (%s, %s, %s)",
+            (migracion.version, migracion.nombre, migracion.checksum)
+        )
+        conn.commit()
+    finally:
+        cur.close()
+
+
+def migrar():
+    """Aplica las migraciones pendientes; devuelve la lista de versiones aplicadas"""
+    nuevas = []
+    with mysql.pool.connection() as conn:
+        cur = conn.cursor()
+        hechas = aplicadas(cur)
+        cur.close()
+        conn.commit()
+
+        for migracion in listar_migraciones():
+            if migracion.version in hechas:
+                continue
+            aplicar(migracion, conn)
+            nuevas.append(migracion.version)
+    return nuevas
+
+
+# =====================
+# CLI
+# =====================
+@click.group("db")
+def db_cli():
+    """Migraciones del esquema de parrilla51"""
+
+
+@db_cli.command("estado")
+def estado_cmd():
+    with mysql.pool.connection() as conn:
+        cur = conn.cursor()
+        hechas = aplicadas(cur)
+        cur.close()
+        conn.commit()
+
+    for migracion in listar_migraciones():
+        if migracion.version not in hechas:
+            marca = "pendiente"
+        elif hechas[migracion.version] != migracion.checksum:
+            marca = "aplicada (archivo modificado)"
+        else:
+            marca = "aplicada"
+        click.echo(f"{migracion.archivo:45} {marca}")
+
+
+@db_cli.command("migrar")
+def migrar_cmd():
+    try:
+        nuevas = migrar()
+    except MigracionBloqueada as e:
+        detalle = "\n".join("  " + ", ".join(str(v) for v in fila.values()) for fila in e.filas)
+        raise click.ClickException(f"{e}\n{detalle}")
+    if nuevas:
+        click.echo(f"Migraciones aplicadas: {', '.join(nuevas)}")
+    else:
+        click.echo("El esquema ya está al día")
+
+
+def init_app(app):
+    app.cli.add_command(db_cli)
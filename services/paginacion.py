@@ -0,0 +1,149 @@
+"""
+Utilidades de paginación por keyset (cursor) para listados grandes.
+
+El cursor es la tupla de columnas de orden de la última fila mostrada,
+serializada como texto para viajar en la URL (`?despues=...`). Las columnas
+de orden pueden ser NULL (p. ej. `pedidos.fecha`): el NULL viaja como `~` y
+cuenta como el valor más chico, igual que en el ORDER BY de MySQL.
+"""
+from datetime import datetime
+
+from flask import request
+
+SEPARADOR = "|"
+NULO = "~"
+
+
+def arg_entero(nombre, defecto, minimo, maximo):
+    """Lee un parámetro entero de la URL, acotado a [minimo, maximo]"""
+    try:
+        valor = int(request.args.get(nombre, defecto))
+    except (TypeError, ValueError):
+        valor = defecto
+    return max(minimo, min(valor, maximo))
+
+
+def arg_fecha(nombre):
+    """Lee una fecha YYYY-MM-DD de la URL; devuelve None si falta o no es válida"""
+    valor = request.args.get(nombre, "").strip()
+    try:
+        return datetime.strptime(valor, "%Y-%m-%d").date()
+    except ValueError:
+        return None
+
+
+# =====================
+# CURSORES
+# =====================
+def codificar_cursor(valores):
+    return SEPARADOR.join(NULO if v is None else str(v) for v in valores)
+
+
+def leer_cursor(texto, n):
+    """Decodifica un cursor de `n` valores (None donde iba NULL); None si viene vacío o malformado"""
+    if not texto:
+        return None
+    partes = texto.split(SEPARADOR)
+    if len(partes) != n or not all(partes):
+        return None
+    return [None if parte == NULO else parte for parte in partes]
+
+
+def condicion_keyset(columnas, valores, descendente=True):
+    """Predicado `(c1, c2, ...) < (v1, v2, ...)` expandido en ORs.
+
+    Se escribe expandido porque MySQL/MariaDB no siempre usan el índice
+    compuesto con la comparación de tuplas. NULL es menor que cualquier
+    valor: en orden descendente va al final y en ascendente al principio.
+    """
+    partes = []
+    params = []
+    for i, columna in enumerate(columnas):
+        iguales = []
+        params_parte = []
+        for c, v in zip(columnas[:i], valores[:i]):
+            if v is None:
+                iguales.append(f"{c} IS NULL")
+            else:
+                iguales.append(f"{c} = %s")
+                params_parte.append(v)
+
+        valor = valores[i]
+        if descendente:
+            if valor is None:
+                continue  # nada es menor que NULL
+            siguiente = f"({columna} < %s OR {columna} IS NULL)"
+            params_parte.append(valor)
+        elif valor is None:
+            siguiente = f"{columna} IS NOT NULL"
+        else:
+            siguiente = f"{columna} > %s"
+            params_parte.append(valor)
+
+        partes.append("(" + " AND ".join(iguales + [siguiente]) + ")")
+        params.extend(params_parte)
+    if not partes:
+        return "1=0", []
+    return "(" + " OR ".join(partes) + ")", params
+
+
+def recortar_pagina(filas, limite, claves):
+    """Recibe `limite + 1` filas y devuelve `(pagina, cursor_siguiente)`"""
+    filas = list(filas)
+    if len(filas) <= limite:
+        return filas, None
+    pagina = filas[:limite]
+    return pagina, codificar_cursor(pagina[-1][c] for c in claves)
+
+
+# =====================
+# LISTADOS ADMINISTRATIVOS
+# =====================
+def pagina_keyset(cur, consulta, params, orden, limite, cursor_texto, descendente=True):
+    """Ejecuta una página de `consulta` (SELECT ... WHERE ..., sin ORDER BY ni LIMIT).
+
+    `orden` es `[(columna_sql, clave_en_fila), ...]`; la última columna debe
+    ser única y NOT NULL (normalmente la llave primaria) para que el cursor
+    sea estable. Las demás pueden tener NULL (`reservas.fecha`,
+    `pedidos.fecha`/`hora`): esas filas salen al final en orden descendente.
+    """
+    columnas = [columna for columna, _ in orden]
+    claves = [clave for _, clave in orden]
+    cursor = leer_cursor(cursor_texto, len(orden))
+    params = list(params)
+
+    if cursor:
+        condicion, params_cursor = condicion_keyset(columnas, cursor, descendente)
+        consulta += " AND " + condicion
+        params.extend(params_cursor)
+
+    direccion = "DESC" if descendente else "ASC"
+    consulta += " ORDER BY " + ", ".join(f"{c} {direccion}" for c in columnas) + " LIMIT %s"
+    params.append(limite + 1)
+
+    cur.execute(consulta, params)
+    filas, siguiente = recortar_pagina(cur.fetchall(), limite, claves)
+    return {"filas": filas, "siguiente": siguiente, "es_primera": cursor is None}
+
+
+def conteo_aproximado(cur, tabla, desde_where="", params=(), tope=10000):
+    """Conteo barato para mostrar junto a un listado: `(total, es_aproximado)`.
+
+    Sin filtros usa la estadística de InnoDB en information_schema; con
+    filtros cuenta exacto pero se detiene en `tope` filas.
+    """
+    if not desde_where:
+        cur.execute("""
+            SELECT TABLE_ROWS AS total FROM information_schema.TABLES
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s
+        """, (tabla,))
+        fila = cur.fetchone()
+        return (fila['total'] or 0) if fila else 0, True
+
+    cur.execute(f"""
+        SELECT COUNT(*) AS total FROM (
+            SELECT 1 FROM {tabla} {desde_where} LIMIT %s
+        ) AS t
+    """, list(params) + [tope + 1])
+    total = cur.fetchone()['total']
+    return min(total, tope), total > tope
@@ -0,0 +1,45 @@
+"""
+Consultas compartidas sobre pedidos y sus líneas de detalle.
+"""
+from collections import defaultdict
+
+
+def placeholders(valores):
+    """Marcadores `%s, %s, ...` para una cláusula IN con `len(valores)` elementos"""
+    return ", ".join(["%s"] * len(valores))
+
+
+# =====================
+# DETALLES EN LOTE
+# =====================
+def detalles_por_pedido(cur, ids_pedido):
+    """Trae en una sola consulta las líneas de varios pedidos, agrupadas por `cod_pedido`.
+
+    El subtotal se calcula en SQL; el resultado es `{id_pedido: [detalle, ...]}`.
+    Las líneas de productos ya borrados se conservan, para que cuadren con el total.
+    """
+    if not ids_pedido:
+        return {}
+
+    cur.execute(f"""
+        SELECT dp.cod_pedido, dp.cod_producto,
+               COALESCE(p.nombre, 'Producto eliminado') AS nombre, dp.cantidad,
+               dp.precio_unitario, dp.cantidad * dp.precio_unitario AS subtotal
+        FROM detalle_pedido dp
+        LEFT JOIN productos p ON dp.cod_producto = p.id_producto
+        WHERE dp.cod_pedido IN ({placeholders(ids_pedido)})
+        ORDER BY dp.cod_pedido, dp.id_detalle
+    """, tuple(ids_pedido))
+
+    detalles = defaultdict(list)
+    for d in cur.fetchall():
+        detalles[d['cod_pedido']].append(d)
+    return detalles
+
+
+def adjuntar_detalles(cur, pedidos):
+    """Agrega la lista `productos` a cada pedido con una sola consulta de detalle"""
+    detalles = detalles_por_pedido(cur, [p['id_pedido'] for p in pedidos])
+    for pedido in pedidos:
+        pedido['productos'] = detalles.get(pedido['id_pedido'], [])
+    return pedidos
@@ -0,0 +1,240 @@
+"""
+Sesiones guardadas en el servidor.
+
+La cookie solo lleva un identificador aleatorio; los datos (usuario, rol,
+carrito, mensajes flash) viven en un almacén intercambiable:
+
+- `sqlite` (por defecto): un archivo en `instance/`, compartido por todos
+  los workers de la máquina.
+- `memoria`: un diccionario del proceso; solo sirve con un único worker
+  (desarrollo, pruebas).
+
+Configuración: `SESION_ALMACEN`, `SESION_SQLITE_RUTA` y
+`PERMANENT_SESSION_LIFETIME` (inactividad máxima). Las sesiones vencidas se
+borran solas cada `SESION_LIMPIEZA_CADA` segundos o con
+
+    flask --app app sesiones limpiar
+"""
+import os
+import secrets
+import sqlite3
+import threading
+import time
+
+import click
+from flask import current_app
+from flask.sessions import SessionInterface, SessionMixin, session_json_serializer
+from werkzeug.datastructures import CallbackDict
+
+
+class SesionServidor(CallbackDict, SessionMixin):
+    """Datos de la sesión; se marcan modificados al escribir"""
+
+    def __init__(self, datos=None, sid=None, expira=None):
+        def al_cambiar(_self):
+            self.modified = True
+
+        super().__init__(datos or {}, al_cambiar)
+        self.sid = sid
+        self.expira = expira
+        self.modified = False
+        self.sid_anterior = None
+
+    def regenerar(self):
+        """Nuevo identificador conservando los datos (al iniciar sesión)"""
+        if self.sid:
+            self.sid_anterior = self.sid
+        self.sid = None
+        self.modified = True
+
+
+# =====================
+# ALMACENES
+# =====================
+class AlmacenMemoria:
+    def __init__(self):
+        self._datos = {}
+        self._lock = threading.Lock()
+
+    def cargar(self, sid):
+        with self._lock:
+            fila = self._datos.get(sid)
+        if fila is None or fila[1] < time.time():
+            return None
+        return fila
+
+    def guardar(self, sid, datos, expira):
+        with self._lock:
+            self._datos[sid] = (datos, expira)
+
+    def tocar(self, sid, expira):
+        with self._lock:
+            if sid in self._datos:
+                self._datos[sid] = (self._datos[sid][0], expira)
+
+    def borrar(self, sid):
+        with self._lock:
+            self._datos.pop(sid, None)
+
+    def limpiar_expiradas(self):
+        ahora = time.time()
+        with self._lock:
+            vencidas = [sid for sid, (_, expira) in self._datos.items() if expira < ahora]
+            for sid in vencidas:
+                del self._datos[sid]
+        return len(vencidas)
+
+
+class AlmacenSQLite:
+    """Una conexión por hilo; WAL permite leer mientras otro worker escribe"""
+
+    def __init__(self, ruta):
+        self.ruta = ruta
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(ruta)), exist_ok=True)
+        with self._conexion() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS sesiones (
+                    sid TEXT PRIMARY KEY,
+                    datos BLOB NOT NULL,
+                    expira REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_sesiones_expira ON sesiones (expira)")
+
+    def _conexion(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None or getattr(self._local, "pid", None) != os.getpid():
+            conn = sqlite3.connect(self.ruta, timeout=10, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def cargar(self, sid):
+        fila = self._conexion().execute(
+            "SELECT datos, expira FROM sesiones WHERE sid = ? AND expira >= ?", (sid, time.time())
+        ).fetchone()
+        return (fila[0], fila[1]) if fila else None
+
+    def guardar(self, sid, datos, expira):
+        with self._conexion() as conn:
+            conn.execute("""
+                INSERT INTO sesiones (sid, datos, expira) VALUES (?, ?, ?)
+                ON CONFLICT (sid) DO UPDATE SET datos = excluded.datos, expira = excluded.expira
+            """, (sid, datos, expira))
+
+    def tocar(self, sid, expira):
+        with self._conexion() as conn:
+            conn.execute("UPDATE sesiones SET expira = ? WHERE sid = ?", (expira, sid))
+
+    def borrar(self, sid):
+        with self._conexion() as conn:
+            conn.execute("DELETE FROM sesiones WHERE sid = ?", (sid,))
+
+    def limpiar_expiradas(self):
+        with self._conexion() as conn:
+            return conn.execute("DELETE FROM sesiones WHERE expira < ?", (time.time(),)).rowcount
+
+
+# =====================
+# INTERFAZ PARA FLASK
+# =====================
+class InterfazSesionServidor(SessionInterface):
+    serializer = session_json_serializer
+
+    def __init__(self, almacen, limpieza_cada=600):
+        self.almacen = almacen
+        self.limpieza_cada = limpieza_cada
+        self._ultima_limpieza = time.monotonic()
+
+    def _duracion(self, app):
+        return app.permanent_session_lifetime.total_seconds()
+
+    def open_session(self, app, request):
+        sid = request.cookies.get(self.get_cookie_name(app))
+        if sid:
+            fila = self.almacen.cargar(sid)
+            if fila is not None:
+                try:
+                    return SesionServidor(self.serializer.loads(fila[0]), sid, fila[1])
+                except ValueError:
+                    self.almacen.borrar(sid)
+        return SesionServidor()
+
+    def save_session(self, app, session, response):
+        nombre = self.get_cookie_name(app)
+        dominio = self.get_cookie_domain(app)
+        ruta = self.get_cookie_path(app)
+        self._limpiar_si_toca()
+        if session.accessed:
+            response.vary.add("Cookie")
+
+        if session.sid_anterior:
+            self.almacen.borrar(session.sid_anterior)
+
+        if not session:
+            if session.sid:
+                self.almacen.borrar(session.sid)
+                response.delete_cookie(nombre, domain=dominio, path=ruta)
+            return
+
+        ahora = time.time()
+        expira = ahora + self._duracion(app)
+        nueva = session.sid is None
+        if nueva:
+            session.sid = secrets.token_urlsafe(32)
+
+        if session.modified or nueva:
+            self.almacen.guardar(session.sid, self.serializer.dumps(dict(session)), expira)
+        elif session.expira is not None and session.expira - ahora < self._duracion(app) / 2:
+            # Sesión activa sin cambios: extender la expiración, sin reescribir los datos
+            self.almacen.tocar(session.sid, expira)
+        else:
+            return
+
+        if nueva or session.permanent:
+            response.set_cookie(
+                nombre, session.sid,
+                expires=self.get_expiration_time(app, session),
+                httponly=self.get_cookie_httponly(app),
+                domain=dominio, path=ruta,
+                secure=self.get_cookie_secure(app),
+                samesite=self.get_cookie_samesite(app),
+            )
+
+    def _limpiar_si_toca(self):
+        if time.monotonic() - self._ultima_limpieza < self.limpieza_cada:
+            return
+        self._ultima_limpieza = time.monotonic()
+        self.almacen.limpiar_expiradas()
+
+
+def crear_almacen(app):
+    tipo = app.config["SESION_ALMACEN"]
+    if tipo == "memoria":
+        return AlmacenMemoria()
+    if tipo == "sqlite":
+        return AlmacenSQLite(app.config["SESION_SQLITE_RUTA"])
+    raise ValueError(f"SESION_ALMACEN desconocido: {tipo}")
+
+
+# =====================
+# CLI
+# =====================
+@click.group("sesiones")
+def sesiones_cli():
+    """Sesiones del servidor"""
+
+
+@sesiones_cli.command("limpiar")
+def limpiar_cmd():
+    click.echo(f"Sesiones vencidas borradas: {current_app.session_interface.almacen.limpiar_expiradas()}")
+
+
+def init_app(app):
+    app.config.setdefault("SESION_ALMACEN", "sqlite")
+    app.config.setdefault("SESION_SQLITE_RUTA", os.path.join(app.instance_path, "sesiones.sqlite3"))
+    app.config.setdefault("SESION_LIMPIEZA_CADA", 600)
+    app.session_interface = InterfazSesionServidor(crear_almacen(app), app.config["SESION_LIMPIEZA_CADA"])
+    app.cli.add_command(sesiones_cli)
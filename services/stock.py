@@ -0,0 +1,106 @@
+"""
+Validación y descuento de stock por lotes, dentro de la transacción del pedido.
+
+Flujo usado por los checkouts:
+    productos = bloquear_productos(cur, ids)        # 1 SELECT ... FOR UPDATE
+    faltantes = validar_stock(productos, requeridos)
+    descontar_stock(cur, requeridos)                # 1 UPDATE condicional
+"""
+from collections import Counter
+
+from services.cache import invalidar
+from services.pedidos import placeholders
+
+
+class StockInsuficiente(Exception):
+    """El descuento condicional no alcanzó a todos los productos"""
+
+    def __init__(self, faltantes):
+        self.faltantes = faltantes
+        super().__init__(", ".join(describir_faltante(f) for f in faltantes))
+
+
+def sumar_cantidades(lineas):
+    """`[(id_producto, cantidad), ...]` -> `{id_producto: cantidad_total}`"""
+    total = Counter()
+    for id_producto, cantidad in lineas:
+        total[int(id_producto)] += int(cantidad)
+    return dict(total)
+
+
+def bloquear_productos(cur, ids):
+    """Lee y bloquea (FOR UPDATE) todos los productos referenciados en una consulta"""
+    ids = sorted(set(ids))
+    if not ids:
+        return {}
+    cur.execute(f"""
+        SELECT id_producto, nombre, precio, cantidad, estado
+        FROM productos
+        WHERE id_producto IN ({placeholders(ids)})
+        FOR UPDATE
+    """, ids)
+    return {p['id_producto']: p for p in cur.fetchall()}
+
+
+def validar_stock(productos, requeridos):
+    """Lista de faltantes `{id_producto, nombre, motivo, disponible, solicitado}`"""
+    faltantes = []
+    for id_producto, solicitado in requeridos.items():
+        producto = productos.get(id_producto)
+        if not producto:
+            faltantes.append({
+                'id_producto': id_producto, 'nombre': f"ID {id_producto}",
+                'motivo': 'no_encontrado', 'disponible': 0, 'solicitado': solicitado
+            })
+        elif producto['estado'] != 'Disponible':
+            faltantes.append({
+                'id_producto': id_producto, 'nombre': producto['nombre'],
+                'motivo': 'no_disponible', 'disponible': 0, 'solicitado': solicitado
+            })
+        elif (producto['cantidad'] or 0) < solicitado:
+            faltantes.append({
+                'id_producto': id_producto, 'nombre': producto['nombre'],
+                'motivo': 'stock_insuficiente', 'disponible': producto['cantidad'] or 0,
+                'solicitado': solicitado
+            })
+    return faltantes
+
+
+def describir_faltante(faltante):
+    if faltante['motivo'] == 'no_encontrado':
+        return f"{faltante['nombre']} (no encontrado)"
+    if faltante['motivo'] == 'no_disponible':
+        return f"{faltante['nombre']} (no disponible)"
+    if faltante['disponible'] == 0:
+        return f"{faltante['nombre']} (sin stock)"
+    return f"{faltante['nombre']} (solo quedan {faltante['disponible']} unidades)"
+
+
+def descontar_stock(cur, requeridos):
+    """Descuenta todo el pedido con un UPDATE condicional (`cantidad >= n`).
+
+    Lanza `StockInsuficiente` si alguna fila no cumplió la condición; el
+    llamador debe hacer rollback.
+    """
+    if not requeridos:
+        return
+    ids = sorted(requeridos)
+    casos = " ".join(["WHEN %s THEN %s"] * len(ids))
+    valores_caso = [v for i in ids for v in (i, requeridos[i])]
+
+    cur.execute(f"""
+        UPDATE productos
+        SET cantidad = cantidad - CASE id_producto {casos} END
+        WHERE id_producto IN ({placeholders(ids)})
+          AND cantidad >= CASE id_producto {casos} END
+    """, valores_caso + ids + valores_caso)
+
+    if cur.rowcount != len(ids):
+        cur.execute(f"""
+            SELECT id_producto, nombre, precio, cantidad, estado
+            FROM productos WHERE id_producto IN ({placeholders(ids)})
+        """, ids)
+        productos = {p['id_producto']: p for p in cur.fetchall()}
+        raise StockInsuficiente(validar_stock(productos, requeridos))
+
+    invalidar('productos', conn=cur.connection)
@@ -0,0 +1,257 @@
+"""
+Cola de trabajos de exportación en segundo plano.
+
+Las exportaciones pesadas (Excel, PDF) no se generan dentro del request:
+`encolar()` registra el trabajo y lo entrega a un pool acotado (hilos para
+Excel, procesos para el PDF, que es CPU). `en_segundo_plano()` usa el
+mismo pool de hilos para tareas internas sin estado en disco. El estado de cada trabajo vive
+en `<directorio>/<id>.json` junto al archivo generado, así cualquier worker
+de la aplicación puede responder el estado o la descarga. Los artefactos
+se borran pasado `REPORTES_TRABAJOS_TTL`.
+
+    flask --app app reportes limpiar
+"""
+import json
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import click
+import MySQLdb
+from flask import current_app
+
+from services import exportes
+from services.db_pool import _connect_kwargs
+
+ESTADO_EN_COLA = "en_cola"
+ESTADO_PROCESANDO = "procesando"
+ESTADO_LISTO = "listo"
+ESTADO_ERROR = "error"
+
+# Cada cuántas filas el trabajo informa su avance
+AVANCE_CADA = 5000
+
+
+class ColaLlena(Exception):
+    """Hay demasiados trabajos pendientes en este worker"""
+
+
+# =====================
+# ESTADO EN DISCO
+# =====================
+def _ruta_meta(directorio, id_trabajo):
+    return os.path.join(directorio, f"{id_trabajo}.json")
+
+
+def _escribir_meta(directorio, meta):
+    ruta = _ruta_meta(directorio, meta["id"])
+    temporal = f"{ruta}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(temporal, "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+    os.replace(temporal, ruta)
+
+
+def _actualizar_meta(directorio, meta, **cambios):
+    meta.update(cambios, actualizado=time.time())
+    _escribir_meta(directorio, meta)
+
+
+def leer(id_trabajo):
+    """Estado del trabajo o None si no existe (o ya expiró)"""
+    if not id_trabajo.isalnum():
+        return None
+    try:
+        with open(_ruta_meta(_directorio(), id_trabajo), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def ruta_archivo(meta):
+    return os.path.join(_directorio(), meta["archivo"])
+
+
+# =====================
+# EJECUCIÓN (hilo o proceso)
+# =====================
+def _con_avance(filas, directorio, meta):
+    for n, fila in enumerate(filas, start=1):
+        if n % AVANCE_CADA == 0:
+            _actualizar_meta(directorio, meta, filas=n)
+        yield fila
+        meta["filas"] = n
+
+
+def _ejecutar(directorio, meta, connect_kwargs, spec):
+    """Genera el artefacto. Corre en un hilo o en un proceso aparte: solo
+    recibe datos serializables y abre su propia conexión."""
+    _actualizar_meta(directorio, meta, estado=ESTADO_PROCESANDO, filas=0)
+    destino = os.path.join(directorio, meta["archivo"])
+    parcial = destino + ".parcial"
+    conn = None
+    try:
+        conn = MySQLdb.connect(**connect_kwargs)
+        filas = _con_avance(
+            exportes.filas_de_conexion(conn, spec["query"], spec["params"]), directorio, meta
+        )
+        with open(parcial, "wb") as salida:
+            if spec["formato"] == "xlsx":
+                exportes.escribir_excel(spec["columnas"], filas, hoja=spec["titulo"], destino=salida)
+            else:
+                pdf = exportes.ReportePDF(spec["titulo"], spec["columnas"], sumar=spec.get("sumar", ()))
+                pdf.agregar_filas(filas)
+                pdf.terminar(spec.get("etiqueta_total", "Total general"), destino=salida)
+        os.replace(parcial, destino)
+        _actualizar_meta(directorio, meta, estado=ESTADO_LISTO, filas=meta.get("filas", 0))
+    except Exception as e:
+        if os.path.exists(parcial):
+            os.remove(parcial)
+        _actualizar_meta(directorio, meta, estado=ESTADO_ERROR, error=str(e))
+    finally:
+        if conn is not None:
+            conn.close()
+
+
+# =====================
+# COLA
+# =====================
+class _Cola:
+    """Ejecutores por proceso, creados al primer uso (no sobreviven a un fork)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pid = None
+        self._hilos = None
+        self._procesos = None
+        self._pendientes = 0
+
+    def _ejecutores(self, config):
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._hilos = ThreadPoolExecutor(
+                        max_workers=config["REPORTES_HILOS"], thread_name_prefix="reportes"
+                    )
+                    # spawn: el hijo no hereda conexiones ni hilos del worker web
+                    self._procesos = ProcessPoolExecutor(
+                        max_workers=config["REPORTES_PROCESOS"],
+                        mp_context=multiprocessing.get_context("spawn")
+                    )
+                    self._pendientes = 0
+                    self._pid = os.getpid()
+        return self._hilos, self._procesos
+
+    def enviar(self, config, cpu, funcion, *args):
+        hilos, procesos = self._ejecutores(config)
+        with self._lock:
+            if self._pendientes >= config["REPORTES_MAX_PENDIENTES"]:
+                raise ColaLlena()
+            self._pendientes += 1
+        futuro = (procesos if cpu else hilos).submit(funcion, *args)
+        futuro.add_done_callback(self._terminado)
+        return futuro
+
+    def _terminado(self, _futuro):
+        with self._lock:
+            self._pendientes -= 1
+
+
+_cola = _Cola()
+
+
+def _directorio():
+    directorio = current_app.config["REPORTES_TRABAJOS_DIR"]
+    os.makedirs(directorio, exist_ok=True)
+    return directorio
+
+
+def encolar(spec, id_usuario):
+    """Registra y encola una exportación; devuelve el estado inicial.
+
+    `spec` = {formato: 'xlsx'|'pdf', query, params, columnas, titulo,
+    nombre_descarga, [sumar], [etiqueta_total]}. Lanza `ColaLlena`.
+    """
+    limpiar_expirados()
+    directorio = _directorio()
+    id_trabajo = uuid.uuid4().hex
+    meta = {
+        "id": id_trabajo,
+        "estado": ESTADO_EN_COLA,
+        "formato": spec["formato"],
+        "archivo": f"{id_trabajo}.{spec['formato']}",
+        "nombre_descarga": spec["nombre_descarga"],
+        "id_usuario": id_usuario,
+        "filas": 0,
+        "creado": time.time(),
+        "actualizado": time.time(),
+    }
+    _escribir_meta(directorio, meta)
+    spec = dict(spec, params=list(spec["params"]))
+    try:
+        _cola.enviar(current_app.config, spec["formato"] == "pdf", _ejecutar,
+                     directorio, meta, _connect_kwargs(current_app.config), spec)
+    except ColaLlena:
+        os.remove(_ruta_meta(directorio, id_trabajo))
+        raise
+    return meta
+
+
+def en_segundo_plano(funcion, *args):
+    """Corre `funcion(*args)` en el pool de hilos, con el contexto de la app.
+
+    Para tareas internas que no deben demorar el request (p. ej. variantes
+    de imágenes); los errores quedan en el log. Lanza `ColaLlena`.
+    """
+    app = current_app._get_current_object()
+
+    def con_contexto():
+        with app.app_context():
+            try:
+                funcion(*args)
+            except Exception:
+                app.logger.exception("Falló el trabajo en segundo plano %s", funcion.__name__)
+
+    return _cola.enviar(app.config, False, con_contexto)
+
+
+def limpiar_expirados(ttl=None):
+    """Borra estados y artefactos más viejos que el TTL; devuelve cuántos archivos borró"""
+    directorio = _directorio()
+    ttl = ttl if ttl is not None else current_app.config["REPORTES_TRABAJOS_TTL"]
+    limite = time.time() - ttl
+    borrados = 0
+    for nombre in os.listdir(directorio):
+        ruta = os.path.join(directorio, nombre)
+        try:
+            if os.path.getmtime(ruta) < limite:
+                os.remove(ruta)
+                borrados += 1
+        except OSError:
+            pass  # otro worker lo borró primero
+    return borrados
+
+
+# =====================
+# CLI
+# =====================
+@click.group("reportes")
+def reportes_cli():
+    """Trabajos de exportación de reportes"""
+
+
+@reportes_cli.command("limpiar")
+def limpiar_cmd():
+    click.echo(f"Archivos borrados: {limpiar_expirados()}")
+
+
+def init_app(app):
+    app.config.setdefault("REPORTES_TRABAJOS_DIR", os.path.join(tempfile.gettempdir(), "parrilla51_reportes"))
+    app.config.setdefault("REPORTES_TRABAJOS_TTL", 3600)
+    app.config.setdefault("REPORTES_HILOS", 2)
+    app.config.setdefault("REPORTES_PROCESOS", 2)
+    app.config.setdefault("REPORTES_MAX_PENDIENTES", 20)
+    app.cli.add_command(reportes_cli)
@@ -0,0 +1,259 @@
+"""
+Resumen diario de ventas (`ventas_diarias`).
+
+Una fila por (fecha, metodo_pago, tipo_entrega, estado) con el número de
+pedidos y la suma de `total`, así los totales del reporte no dependen del
+tamaño del historial.
+
+La suma se aplica justo después del commit del checkout o del cambio de
+estado (tarea `al_confirmar` de la conexión), no dentro de esa
+transacción: la fila del día es la misma para todos los pedidos y tenerla
+bloqueada junto con el stock pondría en fila los checkouts concurrentes.
+Si la transacción se revierte no se suma nada; si la suma falla después
+del commit queda en el log, y `verificar` / `reconstruir` lo reparan:
+
+    flask --app app ventas reconstruir [--desde AAAA-MM-DD] [--hasta AAAA-MM-DD]
+    flask --app app ventas verificar [--desde AAAA-MM-DD] [--hasta AAAA-MM-DD]
+"""
+import click
+import MySQLdb
+from flask import current_app
+
+from __init__ import mysql
+from services import filtros
+from services.cache import invalidar
+
+# Dimensiones del resumen; NULL se guarda como '' porque forman la llave primaria
+DIMENSIONES = ("metodo_pago", "tipo_entrega", "estado")
+
+
+def _sumar(cur, fecha, metodo_pago, tipo_entrega, estado, num_pedidos, total):
+    if fecha is None:
+        return
+    cur.execute("""
+        INSERT INTO ventas_diarias (fecha, metodo_pago, tipo_entrega, estado, num_pedidos, total)
+        VALUES (%s, %s, %s, %s, %s, %s)
+        ON DUPLICATE KEY UPDATE
+            num_pedidos = num_pedidos + VALUES(num_pedidos),
+            total = total + VALUES(total)
+    """, (fecha, metodo_pago or '', tipo_entrega or '', estado or '', num_pedidos, total or 0))
+
+
+def _sumar_al_confirmar(cur, *filas):
+    """Deja las sumas para justo después del commit de la conexión de `cur`"""
+    def tarea(conn):
+        cur_tarea = conn.cursor()
+        try:
+            for fila in filas:
+                _sumar(cur_tarea, *fila)
+            conn.commit()
+        except MySQLdb.Error as e:
+            conn.rollback()
+            current_app.logger.warning(
+                "ventas_diarias sin actualizar (%s); corre `flask ventas reconstruir`", e)
+        finally:
+            cur_tarea.close()
+
+    cur.connection.al_confirmar.append(tarea)
+
+
+# =====================
+# MANTENIMIENTO INCREMENTAL
+# =====================
+def registrar_pedido(cur, id_pedido):
+    """Suma un pedido recién insertado (después del commit del checkout)"""
+    cur.execute("""
+        SELECT fecha, metodo_pago, tipo_entrega, estado, total
+        FROM pedidos WHERE id_pedido = %s
+    """, (id_pedido,))
+    pedido = cur.fetchone()
+    if pedido:
+        _sumar_al_confirmar(cur, (pedido['fecha'], pedido['metodo_pago'], pedido['tipo_entrega'],
+                                  pedido['estado'], 1, pedido['total']))
+
+
+def cambiar_estado(cur, id_pedido, nuevo_estado):
+    """Cambia el estado del pedido y mueve su aporte entre filas del resumen.
+
+    Devuelve el estado anterior, o None si el pedido no existe. El llamador
+    hace el commit; el resumen se mueve después.
+    """
+    cur.execute("""
+        SELECT fecha, metodo_pago, tipo_entrega, estado, total
+        FROM pedidos WHERE id_pedido = %s
+        FOR UPDATE
+    """, (id_pedido,))
+    pedido = cur.fetchone()
+    if not pedido:
+        return None
+
+    cur.execute("UPDATE pedidos SET estado=%s WHERE id_pedido=%s", (nuevo_estado, id_pedido))
+    invalidar('pedidos', conn=cur.connection)
+    if pedido['estado'] != nuevo_estado:
+        dims = (pedido['fecha'], pedido['metodo_pago'], pedido['tipo_entrega'])
+        _sumar_al_confirmar(cur, (*dims, pedido['estado'], -1, -(pedido['total'] or 0)),
+                            (*dims, nuevo_estado, 1, pedido['total']))
+    return pedido['estado']
+
+
+# =====================
+# LECTURA PARA REPORTES
+# =====================
+def resumen(cur, mes=None, estado=None):
+    """Totales y serie por día desde el resumen: `{total_pedidos, total_ventas, por_dia, por_metodo}`"""
+    condicion, params = filtros.combinar(
+        filtros.filtro_mes("fecha", mes),
+        filtros.igual("estado", estado) if estado else None,
+    )
+    where = " WHERE " + condicion if condicion else ""
+
+    cur.execute(f"""
+        SELECT COALESCE(SUM(num_pedidos), 0) AS total_pedidos,
+               COALESCE(SUM(total), 0) AS total_ventas
+        FROM ventas_diarias{where}
+    """, params)
+    totales = cur.fetchone()
+
+    cur.execute(f"""
+        SELECT fecha, SUM(num_pedidos) AS num_pedidos, SUM(total) AS total
+        FROM ventas_diarias{where}
+        GROUP BY fecha
+        ORDER BY fecha DESC
+        LIMIT 31
+    """, params)
+    por_dia = list(cur.fetchall())
+
+    cur.execute(f"""
+        SELECT metodo_pago, SUM(num_pedidos) AS num_pedidos, SUM(total) AS total
+        FROM ventas_diarias{where}
+        GROUP BY metodo_pago
+        ORDER BY total DESC
+    """, params)
+    por_metodo = list(cur.fetchall())
+
+    return {
+        'total_pedidos': int(totales['total_pedidos']),
+        'total_ventas': int(totales['total_ventas']),
+        'por_dia': por_dia[::-1],
+        'por_metodo': por_metodo,
+    }
+
+
+# =====================
+# RECONSTRUCCIÓN Y VERIFICACIÓN
+# =====================
+def _rango(columna, desde, hasta):
+    return filtros.combinar(
+        (f"{columna} >= %s", [desde]) if desde else None,
+        (f"{columna} <= %s", [hasta]) if hasta else None,
+    )
+
+
+def _agregado_pedidos(desde, hasta):
+    condicion, params = _rango("fecha", desde, hasta)
+    where = "fecha IS NOT NULL" + (" AND " + condicion if condicion else "")
+    return f"""
+        SELECT fecha, COALESCE(metodo_pago, '') AS metodo_pago,
+               COALESCE(tipo_entrega, '') AS tipo_entrega, COALESCE(estado, '') AS estado,
+               COUNT(*) AS num_pedidos, COALESCE(SUM(total), 0) AS total
+        FROM pedidos
+        WHERE {where}
+        GROUP BY fecha, COALESCE(metodo_pago, ''), COALESCE(tipo_entrega, ''), COALESCE(estado, '')
+    """, params
+
+
+def reconstruir(conn, desde=None, hasta=None):
+    """Recalcula el rango de fechas desde `pedidos`; devuelve las filas escritas"""
+    cur = conn.cursor()
+    try:
+        condicion, params = _rango("fecha", desde, hasta)
+        cur.execute("DELETE FROM ventas_diarias" + (" WHERE " + condicion if condicion else ""), params)
+        consulta, params = _agregado_pedidos(desde, hasta)
+        cur.execute("""
+            INSERT INTO ventas_diarias (fecha, metodo_pago, tipo_entrega, estado, num_pedidos, total)
+        """ + consulta, params)
+        escritas = cur.rowcount
+        invalidar('pedidos', conn=conn)
+        conn.commit()
+        return escritas
+    except MySQLdb.Error:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+
+
+def verificar(conn, desde=None, hasta=None):
+    """Compara el resumen con `pedidos`; devuelve la lista de diferencias"""
+    cur = conn.cursor()
+    try:
+        consulta, params = _agregado_pedidos(desde, hasta)
+        cur.execute(consulta, params)
+        esperado = {
+            (f['fecha'], f['metodo_pago'], f['tipo_entrega'], f['estado']): (int(f['num_pedidos']), int(f['total']))
+            for f in cur.fetchall()
+        }
+
+        condicion, params = _rango("fecha", desde, hasta)
+        cur.execute("""
+            SELECT fecha, metodo_pago, tipo_entrega, estado, num_pedidos, total
+            FROM ventas_diarias
+        """ + (" WHERE " + condicion if condicion else ""), params)
+        actual = {
+            (f['fecha'], f['metodo_pago'], f['tipo_entrega'], f['estado']): (int(f['num_pedidos']), int(f['total']))
+            for f in cur.fetchall()
+        }
+        conn.commit()
+    finally:
+        cur.close()
+
+    diferencias = []
+    for llave in sorted(set(esperado) | set(actual), key=str):
+        # Las filas en cero (pedido que cambió de estado) equivalen a no tener fila
+        e = esperado.get(llave, (0, 0))
+        a = actual.get(llave, (0, 0))
+        if e != a:
+            diferencias.append({'llave': llave, 'esperado': e, 'resumen': a})
+    return diferencias
+
+
+# =====================
+# CLI
+# =====================
+@click.group("ventas")
+def ventas_cli():
+    """Resumen diario de ventas"""
+
+
+@ventas_cli.command("reconstruir")
+@click.option("--desde", type=click.DateTime(["%Y-%m-%d"]), default=None)
+@click.option("--hasta", type=click.DateTime(["%Y-%m-%d"]), default=None)
+def reconstruir_cmd(desde, hasta):
+    desde = desde.date() if desde else None
+    hasta = hasta.date() if hasta else None
+    with mysql.pool.connection() as conn:
+        escritas = reconstruir(conn, desde, hasta)
+    click.echo(f"Resumen reconstruido: {escritas} filas")
+
+
+@ventas_cli.command("verificar")
+@click.option("--desde", type=click.DateTime(["%Y-%m-%d"]), default=None)
+@click.option("--hasta", type=click.DateTime(["%Y-%m-%d"]), default=None)
+def verificar_cmd(desde, hasta):
+    desde = desde.date() if desde else None
+    hasta = hasta.date() if hasta else None
+    with mysql.pool.connection() as conn:
+        diferencias = verificar(conn, desde, hasta)
+
+    if not diferencias:
+        click.echo("El resumen coincide con pedidos")
+        return
+    for d in diferencias:
+        fecha, metodo, entrega, estado = d['llave']
+        click.echo(f"{fecha} {metodo or '-'}/{entrega or '-'}/{estado or '-'}: "
+                   f"pedidos {d['esperado']} resumen {d['resumen']}")
+    raise SystemExit(1)
+
+
+def init_app(app):
+    app.cli.add_command(ventas_cli)
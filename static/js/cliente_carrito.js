@@ -52,40 +52,48 @@ const canonNorm = {};
 Object.keys(canonMap).forEach(k => canonNorm[normalizar(k)] = normalizar(canonMap[k]));
 
 
-const carritoTDs = document.querySelectorAll("tbody tr td:first-child");
-const nombresEnCarrito = Array.from(carritoTDs)
-  .map(td => normalizar(td.textContent))
-  .filter(Boolean);
-
-const canonEnCarrito = new Set();
-for (const prod of nombresEnCarrito) {
-  if (canonNorm[prod]) {
-    canonEnCarrito.add(canonNorm[prod]);
-    continue;
-  }
-  for (const key of Object.keys(canonNorm)) {
-    const re = new RegExp("\\b" + escapeRegex(key) + "\\b", "i");
-    if (re.test(prod)) {
-      canonEnCarrito.add(canonNorm[key]);
-      break;
+let nombresEnCarrito = [];
+let canonEnCarrito = new Set();
+let requiereAcomp = false;
+
+// Se vuelve a llamar cada vez que cambian las líneas del carrito
+function analizarCarrito() {
+  const carritoTDs = document.querySelectorAll("tbody tr td:first-child");
+  nombresEnCarrito = Array.from(carritoTDs)
+    .map(td => normalizar(td.textContent))
+    .filter(Boolean);
+
+  canonEnCarrito = new Set();
+  for (const prod of nombresEnCarrito) {
+    if (canonNorm[prod]) {
+      canonEnCarrito.add(canonNorm[prod]);
+      continue;
+    }
+    for (const key of Object.keys(canonNorm)) {
+      const re = new RegExp("\\b" + escapeRegex(key) + "\\b", "i");
+      if (re.test(prod)) {
+        canonEnCarrito.add(canonNorm[key]);
+        break;
+      }
     }
   }
-}
 
-const hayAdicional = canonEnCarrito.size > 0;
-let hayPlato = false;
-if (!hayAdicional) hayPlato = nombresEnCarrito.length > 0;
-const requiereAcomp = hayPlato && !hayAdicional;
+  const hayAdicional = canonEnCarrito.size > 0;
+  let hayPlato = false;
+  if (!hayAdicional) hayPlato = nombresEnCarrito.length > 0;
+  requiereAcomp = hayPlato && !hayAdicional;
 
-
-if (!hayPlato && !hayAdicional) {
-  acompDiv.style.display = "none";
-} else {
-  acompDiv.style.display = "block";
-  tituloAcomp.textContent = requiereAcomp
-    ? "🍽️ Escoge 2 acompañamientos (obligatorio)"
-    : "🍽️ Acompañamientos (opcionales)";
+  if (!acompDiv) return;
+  if (!hayPlato && !hayAdicional) {
+    acompDiv.style.display = "none";
+  } else {
+    acompDiv.style.display = "block";
+    tituloAcomp.textContent = requiereAcomp
+      ? "🍽️ Escoge 2 acompañamientos (obligatorio)"
+      : "🍽️ Acompañamientos (opcionales)";
+  }
 }
+analizarCarrito();
 
 
 function actualizarAcompanamientos() {
@@ -136,7 +144,7 @@ function actualizarAcompanamientos() {
 actualizarAcompanamientos();
 
 
-form.addEventListener("submit", function (e) {
+if (form) form.addEventListener("submit", function (e) {
   e.preventDefault();
   const acompChecked = document.querySelectorAll('input[name="acompanamientos"]:checked');
   if (requiereAcomp && acompChecked.length !== 2) {
@@ -158,3 +166,74 @@ form.addEventListener("submit", function (e) {
     if (result.isConfirmed) form.submit();
   });
 });
+
+
+// =====================
+// CAMBIOS CON LA API JSON (sin recargar la página)
+// =====================
+const formatoPesos = new Intl.NumberFormat("es-CO", { maximumFractionDigits: 0 });
+
+function pesos(valor) {
+  return "$" + formatoPesos.format(valor);
+}
+
+async function cambiarLinea(fila, metodo, cuerpo) {
+  const resp = await fetch(fila.dataset.api, {
+    method: metodo,
+    headers: { "Content-Type": "application/json" },
+    body: cuerpo ? JSON.stringify(cuerpo) : undefined
+  });
+  const data = await resp.json();
+  if (!resp.ok) throw new Error(data.error || "❌ No se pudo actualizar el carrito");
+  return data;
+}
+
+function aplicarTotales(data, fila) {
+  if (data.linea) {
+    fila.querySelector(".subtotal").textContent = pesos(data.linea.subtotal);
+  } else {
+    fila.remove();
+    analizarCarrito();
+    actualizarAcompanamientos();
+  }
+  if (totalEl) totalEl.textContent = "Total: " + pesos(data.total);
+  if (!data.unidades && form) {
+    form.remove();
+    document.getElementById("carrito-vacio").style.display = "block";
+  }
+}
+
+document.querySelectorAll(".cantidad-carrito").forEach(input => {
+  input.addEventListener("change", async () => {
+    const fila = input.closest("tr");
+    const cantidad = parseInt(input.value, 10);
+    if (!(cantidad >= 1)) {
+      input.value = input.dataset.anterior;
+      return;
+    }
+    input.disabled = true;
+    try {
+      const data = await cambiarLinea(fila, "PUT", { cantidad });
+      input.dataset.anterior = data.linea.cantidad;
+      aplicarTotales(data, fila);
+    } catch (err) {
+      input.value = input.dataset.anterior;
+      Swal.fire("No se pudo cambiar la cantidad", err.message, "warning");
+    } finally {
+      input.disabled = false;
+    }
+  });
+});
+
+document.querySelectorAll(".eliminar-carrito").forEach(enlace => {
+  enlace.addEventListener("click", async e => {
+    e.preventDefault();
+    const fila = enlace.closest("tr");
+    try {
+      aplicarTotales(await cambiarLinea(fila, "DELETE"), fila);
+    } catch (err) {
+      // Sin respuesta JSON: se usa el enlace normal (recarga la página)
+      window.location.href = enlace.href;
+    }
+  });
+});
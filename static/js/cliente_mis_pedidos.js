@@ -0,0 +1,70 @@
+// Carga de "Mis pedidos" por páginas al hacer scroll
+const lista = document.getElementById("lista-pedidos");
+const cargarMas = document.getElementById("cargar-mas");
+
+function escapeHtml(texto) {
+  const div = document.createElement("div");
+  div.textContent = texto == null ? "" : String(texto);
+  return div.innerHTML;
+}
+
+function tarjetaPedido(pedido) {
+  const estadoClase = ["pendiente", "entregado", "cancelado"].includes(pedido.estado) ? pedido.estado : "";
+  const productos = pedido.productos
+    .map(p => `<li>${escapeHtml(p.nombre)} (x${p.cantidad}) – $${p.precio_unitario}</li>`)
+    .join("");
+
+  const card = document.createElement("div");
+  card.className = "card";
+  card.innerHTML = `
+    <h3>Pedido #${pedido.id_pedido}</h3>
+    <p><strong>Usuario:</strong> ${escapeHtml(pedido.nombre_usuario)}</p>
+    <p><strong>Fecha:</strong> ${escapeHtml(pedido.fecha)}</p>
+    <p><strong>Hora:</strong> ${escapeHtml(pedido.hora)}</p>
+    <p><strong>Total:</strong> $${pedido.total}</p>
+    <p><strong>Estado:</strong>
+      <span class="estado ${estadoClase}">${escapeHtml(pedido.estado)}</span>
+    </p>
+    <p><strong>Entrega:</strong> ${escapeHtml(pedido.tipo_entrega)}</p>
+    <p><strong>Pago:</strong> ${escapeHtml(pedido.metodo_pago)}</p>
+    <hr>
+    <p><strong>Productos:</strong></p>
+    <ul style="text-align: left; padding-left: 20px;">${productos}</ul>
+  `;
+  return card;
+}
+
+if (lista && cargarMas) {
+  let cargando = false;
+
+  const observer = new IntersectionObserver(async (entradas) => {
+    if (!entradas[0].isIntersecting || cargando) return;
+
+    const siguiente = cargarMas.dataset.siguiente;
+    if (!siguiente) return;
+
+    cargando = true;
+    try {
+      const resp = await fetch(`${cargarMas.dataset.url}?despues=${encodeURIComponent(siguiente)}`);
+      if (!resp.ok) throw new Error(resp.statusText);
+      const data = await resp.json();
+
+      data.pedidos.forEach(p => lista.appendChild(tarjetaPedido(p)));
+
+      if (data.siguiente) {
+        cargarMas.dataset.siguiente = data.siguiente;
+      } else {
+        observer.disconnect();
+        cargarMas.remove();
+      }
+    } catch (err) {
+      console.error("Error cargando pedidos:", err);
+      cargarMas.innerHTML = "<p>No se pudieron cargar más pedidos.</p>";
+      observer.disconnect();
+    } finally {
+      cargando = false;
+    }
+  });
+
+  observer.observe(cargarMas);
+}
@@ -23,10 +23,40 @@ window.onload = function() {
     document.getElementById("imagen-fondo").classList.remove("oculto");
 };
 
-function mostrarMensaje(e) {
-    e.preventDefault();
+function mostrarMensaje(texto, error) {
     const mensaje = document.getElementById("mensaje-agregado");
+    mensaje.textContent = texto;
+    mensaje.classList.toggle("error", !!error);
     mensaje.style.display = "block";
-    setTimeout(() => mensaje.style.display = "none", 2000);
-    e.target.submit();
+    clearTimeout(mostrarMensaje.timer);
+    mostrarMensaje.timer = setTimeout(() => mensaje.style.display = "none", 2000);
+}
+
+// Agrega con la API JSON sin recargar la página; si falla la red, envía el formulario
+async function agregarAlCarrito(e) {
+    e.preventDefault();
+    const form = e.target;
+    const boton = form.querySelector("button");
+    boton.disabled = true;
+    try {
+        const resp = await fetch(form.dataset.api, {
+            method: "POST",
+            headers: { "Content-Type": "application/json" },
+            body: JSON.stringify({ cantidad: Number(form.cantidad.value) || 1 })
+        });
+        if (resp.status === 401) {
+            form.submit();
+            return;
+        }
+        const data = await resp.json();
+        if (!resp.ok) {
+            mostrarMensaje(data.error || "❌ Error al agregar producto al carrito", true);
+            return;
+        }
+        mostrarMensaje(`${data.mensaje} · ${data.unidades} en el carrito`);
+    } catch (err) {
+        form.submit();
+    } finally {
+        boton.disabled = false;
+    }
 }